@@ -46,7 +46,7 @@ from sklearn.utils.validation import check_array
 from regain.norm import l1_od_norm
 from regain.prox import prox_logdet, soft_thresholding_od
 from regain.update_rules import update_rho
-from regain.utils import convergence
+from regain.utils import batch_pinvh, convergence
 
 try:
     # sklean >= 0.20
@@ -56,13 +56,19 @@ except ImportError:
     from sklearn.covariance import GraphLasso
 
 
-def logl(emp_cov, precision):
-    """Gaussian log-likelihood without constant term."""
-    return fast_logdet(precision) - np.sum(emp_cov * precision)
+def logl(emp_cov, precision, eigvals=None):
+    """Gaussian log-likelihood without constant term.
+
+    If the eigenvalues of `precision` are given, they are used to compute
+    its log-determinant.
+    """
+    logdet = fast_logdet(precision) if eigvals is None else \
+        np.sum(np.log(eigvals))
+    return logdet - np.sum(emp_cov * precision)
 
 
-def objective(emp_cov, x, z, alpha):
-    return -logl(emp_cov, x) + l1_od_norm(alpha * z)
+def objective(emp_cov, x, z, alpha, eigvals=None):
+    return -logl(emp_cov, x, eigvals=eigvals) + l1_od_norm(alpha * z)
 
 
 def init_precision(emp_cov, mode='empirical'):
@@ -83,7 +89,8 @@ def init_precision(emp_cov, mode='empirical'):
 def graphical_lasso(
         emp_cov, alpha=0.01, rho=1, over_relax=1, max_iter=100, verbose=False,
         tol=1e-4, rtol=1e-4, return_history=False, return_n_iter=True,
-        update_rho_options=None, compute_objective=True, init='empirical'):
+        update_rho_options=None, compute_objective=True, init='empirical',
+        warm_start=None, return_state=False):
     r"""Graphical lasso solver via ADMM.
 
     Solves the following problem:
@@ -122,6 +129,13 @@ def graphical_lasso(
     init : {'empirical', 'zeros', ndarray}, default 'empirical'
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
+    warm_start : dict, default None
+        State of a previous run, as returned with `return_state=True`.
+        Primal and dual variables, and rho, are resumed from it (`init` is
+        ignored). Useful for a sequence of close problems, such as the M
+        steps of an EM algorithm.
+    return_state : bool, default False
+        Return the final state of the solver, to be used as `warm_start`.
 
     Returns
     -------
@@ -135,12 +149,19 @@ def graphical_lasso(
         If return_history, then also a structure that contains the
         objective value, the primal and dual residual norms, and tolerances
         for the primal and dual residual norms at each iteration.
+    state : dict
+        If return_state, the state of the solver at the last iteration.
 
     """
     _, n_features = emp_cov.shape
 
-    Z = init_precision(emp_cov, mode=init)
-    U = np.zeros_like(emp_cov)
+    if warm_start is None:
+        Z = init_precision(emp_cov, mode=init)
+        U = np.zeros_like(emp_cov)
+    else:
+        Z = warm_start['Z'].copy()
+        U = warm_start['U'].copy()
+        rho = warm_start['rho']
     Z_old = np.zeros_like(Z)
 
     checks = []
@@ -149,7 +170,8 @@ def graphical_lasso(
         A = Z - U
         A += A.T
         A /= 2.
-        K = prox_logdet(emp_cov - rho * A, lamda=1. / rho)
+        K, K_eigvals = prox_logdet(
+            emp_cov - rho * A, lamda=1. / rho, return_eigen=True)
 
         # z-update with relaxation
         K_hat = over_relax * K - (1 - over_relax) * Z
@@ -159,7 +181,8 @@ def graphical_lasso(
         U += K_hat - Z
 
         # diagnostics, reporting, termination checks
-        obj = objective(emp_cov, K, Z, alpha) if compute_objective else np.nan
+        obj = objective(emp_cov, K, Z, alpha, eigvals=K_eigvals) \
+            if compute_objective else np.nan
         rnorm = np.linalg.norm(K - Z, 'fro')
         snorm = rho * np.linalg.norm(Z - Z_old, 'fro')
         check = convergence(
@@ -191,6 +214,8 @@ def graphical_lasso(
         return_list.append(checks)
     if return_n_iter:
         return_list.append(iteration_)
+    if return_state:
+        return_list.append(dict(Z=Z, U=U, rho=rho))
     return return_list
 
 
@@ -242,7 +267,8 @@ class GraphicalLasso(GraphLasso):
     Attributes
     ----------
     covariance_ : array-like, shape (n_features, n_features)
-        Estimated covariance matrix
+        Estimated covariance matrix. It is computed from `precision_` the
+        first time it is accessed.
 
     precision_ : array-like, shape (n_features, n_features)
         Estimated pseudo inverse matrix.
@@ -266,6 +292,18 @@ class GraphicalLasso(GraphLasso):
         self.compute_objective = compute_objective
         self.init = init
 
+    @property
+    def covariance_(self):
+        """Estimated covariance matrix, computed lazily from `precision_`."""
+        if getattr(self, '_covariance', None) is None:
+            self._covariance = batch_pinvh(self.precision_)
+        return self._covariance
+
+    @covariance_.setter
+    def covariance_(self, value):
+        # None resets the cache, e.g. when the estimator is fitted again
+        self._covariance = value
+
     def _fit(self, emp_cov):
         """Fit the GraphicalLasso model to X.
 
@@ -275,7 +313,8 @@ class GraphicalLasso(GraphLasso):
             Empirical covariance of data.
 
         """
-        self.precision_, self.covariance_, self.n_iter_ = graphical_lasso(
+        self.covariance_ = None
+        self.precision_, _, self.n_iter_ = graphical_lasso(
             emp_cov, alpha=self.alpha, tol=self.tol, rtol=self.rtol,
             max_iter=self.max_iter, over_relax=self.over_relax, rho=self.rho,
             verbose=self.verbose, return_n_iter=True, return_history=False,
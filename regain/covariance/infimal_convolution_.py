@@ -43,11 +43,13 @@ from regain.update_rules import update_rho
 from regain.utils import convergence
 
 
-def objective(S, R, K, L, alpha, tau):
+def objective(S, R, K, L, alpha, tau, L_eigvals=None):
     """Objective function for latent graphical lasso."""
     obj = 0.5 * squared_norm(S - R)
     obj += alpha * l1_od_norm(K)
-    obj += tau * np.linalg.norm(L, ord='nuc')
+    obj += tau * (
+        np.linalg.norm(L, ord='nuc')
+        if L_eigvals is None else np.sum(np.abs(L_eigvals)))
     return obj
 
 
@@ -117,13 +119,14 @@ def infimal_convolution(
         A = K - R - U
         A += A.T
         A /= 2.
-        L = prox_trace_indicator(A, lamda=tau / rho)
+        L, L_eigvals = prox_trace_indicator(
+            A, lamda=tau / rho, return_eigen=True)
 
         # update residuals
         U += R - K + L
 
         # diagnostics, reporting, termination checks
-        obj = objective(S, R, K, L, alpha, tau) \
+        obj = objective(S, R, K, L, alpha, tau, L_eigvals=L_eigvals) \
             if compute_objective else np.nan
         rnorm = np.linalg.norm(R - K + L)
         snorm = rho * np.linalg.norm(R - R_old)
@@ -38,7 +38,6 @@ import warnings
 from functools import partial
 
 import numpy as np
-from scipy import linalg
 from six.moves import map, range, zip
 from sklearn.cluster import AgglomerativeClustering
 from sklearn.gaussian_process import kernels
@@ -52,26 +51,31 @@ from regain.covariance.kernel_time_graphical_lasso_ import \
 from regain.covariance.kernel_time_graphical_lasso_ import precision_similarity
 from regain.prox import prox_logdet, prox_trace_indicator, soft_thresholding
 from regain.update_rules import update_rho
-from regain.utils import convergence
-from regain.validation import check_norm_prox
+from regain.utils import batch_pinvh, convergence, lag_pairs, segment_sum
+from regain.validation import check_kernel, check_norm_prox
 
 
 def objective(
-        S, n_samples, R, Z_0, Z_M, W_0, W_M, alpha, tau, kernel_psi,
-        kernel_phi, psi, phi):
-    """Objective function for latent variable time-varying graphical lasso."""
-    obj = obj_ktgl(n_samples, S, R, Z_0, Z_M, alpha, kernel_psi, psi)
-    if isinstance(tau, np.ndarray):
+        S, n_samples, R, Z_0, Z_M, W_0, W_M, alpha, tau, weights_psi,
+        weights_phi, psi, phi, R_eigvals=None, W_eigvals=None):
+    """Objective function for latent variable time-varying graphical lasso.
+
+    Z_M and W_M contain the consensus variables of the pairs of time points
+    coupled by the kernels, with their weights. Eigenvalues of R and W_0,
+    if available, avoid further decompositions.
+    """
+    obj = obj_ktgl(
+        n_samples, S, R, Z_0, Z_M, alpha, weights_psi, psi, eigvals=R_eigvals)
+    if W_eigvals is not None and np.size(tau) in (1, W_0.shape[0]):
+        # nuclear norms from the eigenvalues of the symmetric W_0
+        obj += np.sum(np.abs(np.ravel(tau)) * np.abs(W_eigvals).sum(axis=1))
+    elif isinstance(tau, np.ndarray):
         obj += sum(np.linalg.norm(t * w, ord='nuc') for t, w in zip(tau, W_0))
     else:
         obj += tau * sum(map(partial(np.linalg.norm, ord='nuc'), W_0))
 
-    for m in range(1, W_0.shape[0]):
-        # all possible markovians jumps
-        W_L, W_R = W_M[m]
-        obj += np.sum(
-            np.array(list(map(phi, W_R - W_L))) * np.diag(kernel_phi, m))
-
+    W_L, W_R = W_M
+    obj += np.dot(weights_phi, [phi(w) for w in W_R - W_L])
     return obj
 
 
@@ -80,7 +84,8 @@ def kernel_latent_time_graphical_lasso(
         max_iter=100, verbose=False, psi='laplacian', phi='laplacian',
         mode='admm', tol=1e-4, rtol=1e-4, assume_centered=False,
         n_samples=None, return_history=False, return_n_iter=True,
-        update_rho_options=None, compute_objective=True, init="empirical"):
+        update_rho_options=None, compute_objective=True, init="empirical",
+        compute_covariance=True, kernel_tol=1e-8, max_lag=None):
     r"""Time-varying latent variable graphical lasso solver.
 
     Solves the following problem via ADMM:
@@ -108,6 +113,15 @@ def kernel_latent_time_graphical_lasso(
         Relative tolerance for convergence.
     return_history : bool, optional
         Return the history of computed values.
+    compute_covariance : bool, default True
+        Choose to compute the covariance matrices, i.e. the inverse of the
+        solution. If False, None is returned in their place.
+    kernel_tol : float, default 1e-8
+        Lags of the kernels whose weights are all below `kernel_tol` are
+        not enforced, and their consensus variables are not allocated.
+    max_lag : int, default None
+        Bandwidth of the kernels, i.e., the highest lag to consider.
+        If None, it is inferred from `kernel_tol`.
 
     Returns
     -------
@@ -123,44 +137,34 @@ def kernel_latent_time_graphical_lasso(
     phi, prox_phi, phi_node_penalty = check_norm_prox(phi)
     n_times, _, n_features = emp_cov.shape
 
-    if kernel_psi is None:
-        kernel_psi = np.eye(n_times)
-    if kernel_phi is None:
-        kernel_phi = np.eye(n_times)
+    kernel_psi, lags_psi = check_kernel(
+        kernel_psi, n_times, tol=kernel_tol, max_lag=max_lag)
+    kernel_phi, lags_phi = check_kernel(
+        kernel_phi, n_times, tol=kernel_tol, max_lag=max_lag)
+
+    # all pairs of time points (left, right) coupled by the kernels
+    left_psi, right_psi = lag_pairs(n_times, lags_psi)
+    weights_psi = kernel_psi[left_psi, right_psi]
+    n_consensus_psi = 1 + np.bincount(left_psi, minlength=n_times) + \
+        np.bincount(right_psi, minlength=n_times)
+    left_phi, right_phi = lag_pairs(n_times, lags_phi)
+    weights_phi = kernel_phi[left_phi, right_phi]
+    n_consensus_phi = 1 + np.bincount(left_phi, minlength=n_times) + \
+        np.bincount(right_phi, minlength=n_times)
+    n_constraints = n_times + 2 * left_psi.size + 2 * left_phi.size
 
     Z_0 = init_precision(emp_cov, mode=init)
     W_0 = np.zeros_like(Z_0)
     X_0 = np.zeros_like(Z_0)
     R_old = np.zeros_like(Z_0)
 
-    Z_M, Z_M_old = {}, {}
-    Y_M = {}
-    W_M, W_M_old = {}, {}
-    U_M = {}
-    for m in range(1, n_times):
-        Z_L = Z_0.copy()[:-m]
-        Z_R = Z_0.copy()[m:]
-        Z_M[m] = (Z_L, Z_R)
-
-        W_L = np.zeros_like(Z_L)
-        W_R = np.zeros_like(Z_R)
-        W_M[m] = (W_L, W_R)
-
-        Y_L = np.zeros_like(Z_L)
-        Y_R = np.zeros_like(Z_R)
-        Y_M[m] = (Y_L, Y_R)
-
-        U_L = np.zeros_like(W_L)
-        U_R = np.zeros_like(W_R)
-        U_M[m] = (U_L, U_R)
+    Z_L, Z_R = Z_0[left_psi], Z_0[right_psi]
+    Y_L, Y_R = np.zeros_like(Z_L), np.zeros_like(Z_R)
+    Z_L_old, Z_R_old = np.zeros_like(Z_L), np.zeros_like(Z_R)
 
-        Z_L_old = np.zeros_like(Z_L)
-        Z_R_old = np.zeros_like(Z_R)
-        Z_M_old[m] = (Z_L_old, Z_R_old)
-
-        W_L_old = np.zeros_like(W_L)
-        W_R_old = np.zeros_like(W_R)
-        W_M_old[m] = (W_L_old, W_R_old)
+    W_L, W_R = W_0[left_phi], W_0[right_phi]
+    U_L, U_R = np.zeros_like(W_L), np.zeros_like(W_R)
+    W_L_old, W_R_old = np.zeros_like(W_L), np.zeros_like(W_R)
 
     if n_samples is None:
         n_samples = np.ones(n_times)
@@ -175,122 +179,112 @@ def kernel_latent_time_graphical_lasso(
         A += emp_cov
         # A = emp_cov / rho - A
 
-        R = np.array(
-            [prox_logdet(a, lamda=ni / rho) for a, ni in zip(A, n_samples)])
+        R = np.empty_like(A)
+        R_eigvals = np.empty(A.shape[:2])
+        for t, (a, ni) in enumerate(zip(A, n_samples)):
+            R[t], R_eigvals[t] = prox_logdet(
+                a, lamda=ni / rho, return_eigen=True)
 
         # update Z_0
         A = R + W_0 + X_0
-        for m in range(1, n_times):
-            A[:-m] += Z_M[m][0] - Y_M[m][0]
-            A[m:] += Z_M[m][1] - Y_M[m][1]
+        A += segment_sum(Z_L - Y_L, left_psi, n_times)
+        A += segment_sum(Z_R - Y_R, right_psi, n_times)
 
-        A /= n_times
-        Z_0 = soft_thresholding(A, lamda=alpha / (rho * n_times))
+        A /= n_consensus_psi[:, None, None]
+        Z_0 = soft_thresholding(
+            A, lamda=alpha / (rho * n_consensus_psi[:, None, None]))
 
         # update W_0
         A = Z_0 - R - X_0
-        for m in range(1, n_times):
-            A[:-m] += W_M[m][0] - U_M[m][0]
-            A[m:] += W_M[m][1] - U_M[m][1]
+        A += segment_sum(W_L - U_L, left_phi, n_times)
+        A += segment_sum(W_R - U_R, right_phi, n_times)
 
-        A /= n_times
+        A /= n_consensus_phi[:, None, None]
         A += A.transpose(0, 2, 1)
         A /= 2.
 
-        W_0 = np.array(
-            [prox_trace_indicator(a, lamda=tau / (rho * n_times)) for a in A])
+        W_0 = np.empty_like(A)
+        W_eigvals = np.empty(A.shape[:2])
+        for t, (a, ci) in enumerate(zip(A, n_consensus_phi)):
+            W_0[t], W_eigvals[t] = prox_trace_indicator(
+                a, lamda=tau / (rho * ci), return_eigen=True)
 
         # update residuals
         X_0 += R - Z_0 + W_0
 
-        for m in range(1, n_times):
-            # other Zs
-            Y_L, Y_R = Y_M[m]
-            A_L = Z_0[:-m] + Y_L
-            A_R = Z_0[m:] + Y_R
-            if not psi_node_penalty:
-                prox_e = prox_psi(
-                    A_R - A_L,
-                    lamda=2. * np.diag(kernel_psi, m)[:, None, None] / rho)
-                Z_L = .5 * (A_L + A_R - prox_e)
-                Z_R = .5 * (A_L + A_R + prox_e)
-            else:
-                Z_L, Z_R = prox_psi(
-                    np.concatenate((A_L, A_R), axis=1),
-                    lamda=.5 * np.diag(kernel_psi, m)[:, None, None] / rho,
-                    rho=rho, tol=tol, rtol=rtol, max_iter=max_iter)
-            Z_M[m] = (Z_L, Z_R)
-
-            # update other residuals
-            Y_L += Z_0[:-m] - Z_L
-            Y_R += Z_0[m:] - Z_R
-
-            # other Ws
-            U_L, U_R = U_M[m]
-            A_L = W_0[:-m] + U_L
-            A_R = W_0[m:] + U_R
-            if not phi_node_penalty:
-                prox_e = prox_phi(
-                    A_R - A_L,
-                    lamda=2. * np.diag(kernel_phi, m)[:, None, None] / rho)
-                W_L = .5 * (A_L + A_R - prox_e)
-                W_R = .5 * (A_L + A_R + prox_e)
-            else:
-                W_L, W_R = prox_phi(
-                    np.concatenate((A_L, A_R), axis=1),
-                    lamda=.5 * np.diag(kernel_phi, m)[:, None, None] / rho,
-                    rho=rho, tol=tol, rtol=rtol, max_iter=max_iter)
-            W_M[m] = (W_L, W_R)
+        # other Zs, for all pairs at once
+        Z_0_L, Z_0_R = Z_0[left_psi], Z_0[right_psi]
+        A_L = Z_0_L + Y_L
+        A_R = Z_0_R + Y_R
+        if not psi_node_penalty:
+            prox_e = prox_psi(
+                A_R - A_L, lamda=2. * weights_psi[:, None, None] / rho)
+            Z_L = .5 * (A_L + A_R - prox_e)
+            Z_R = .5 * (A_L + A_R + prox_e)
+        else:
+            Z_L, Z_R = prox_psi(
+                np.concatenate((A_L, A_R), axis=1),
+                lamda=.5 * weights_psi[:, None, None] / rho, rho=rho,
+                tol=tol, rtol=rtol, max_iter=max_iter)
+
+        # update other residuals
+        Y_L += Z_0_L - Z_L
+        Y_R += Z_0_R - Z_R
+
+        # other Ws, for all pairs at once
+        W_0_L, W_0_R = W_0[left_phi], W_0[right_phi]
+        A_L = W_0_L + U_L
+        A_R = W_0_R + U_R
+        if not phi_node_penalty:
+            prox_e = prox_phi(
+                A_R - A_L, lamda=2. * weights_phi[:, None, None] / rho)
+            W_L = .5 * (A_L + A_R - prox_e)
+            W_R = .5 * (A_L + A_R + prox_e)
+        else:
+            W_L, W_R = prox_phi(
+                np.concatenate((A_L, A_R), axis=1),
+                lamda=.5 * weights_phi[:, None, None] / rho, rho=rho,
+                tol=tol, rtol=rtol, max_iter=max_iter)
 
-            # update other residuals
-            U_L += W_0[:-m] - W_L
-            U_R += W_0[m:] - W_R
+        # update other residuals
+        U_L += W_0_L - W_L
+        U_R += W_0_R - W_R
 
         # diagnostics, reporting, termination checks
         rnorm = np.sqrt(
-            squared_norm(R - Z_0 + W_0) + sum(
-                squared_norm(Z_0[:-m] - Z_M[m][0]) +
-                squared_norm(Z_0[m:] - Z_M[m][1]) +
-                squared_norm(W_0[:-m] - W_M[m][0]) +
-                squared_norm(W_0[m:] - W_M[m][1]) for m in range(1, n_times)))
+            squared_norm(R - Z_0 + W_0) + squared_norm(Z_0_L - Z_L) +
+            squared_norm(Z_0_R - Z_R) + squared_norm(W_0_L - W_L) +
+            squared_norm(W_0_R - W_R))
 
         snorm = rho * np.sqrt(
-            squared_norm(R - R_old) + sum(
-                squared_norm(Z_M[m][0] - Z_M_old[m][0]) +
-                squared_norm(Z_M[m][1] - Z_M_old[m][1]) +
-                squared_norm(W_M[m][0] - W_M_old[m][0]) +
-                squared_norm(W_M[m][1] - W_M_old[m][1])
-                for m in range(1, n_times)))
+            squared_norm(R - R_old) + squared_norm(Z_L - Z_L_old) +
+            squared_norm(Z_R - Z_R_old) + squared_norm(W_L - W_L_old) +
+            squared_norm(W_R - W_R_old))
 
-        obj = objective(emp_cov, n_samples, R, Z_0, Z_M, W_0, W_M,
-                        alpha, tau, kernel_psi, kernel_phi, psi, phi) \
-            if compute_objective else np.nan
+        obj = objective(
+            emp_cov, n_samples, R, Z_0, (Z_L, Z_R), W_0, (W_L, W_R), alpha,
+            tau, weights_psi, weights_phi, psi, phi, R_eigvals=R_eigvals,
+            W_eigvals=W_eigvals) if compute_objective else np.nan
 
         check = convergence(
             obj=obj, rnorm=rnorm, snorm=snorm,
-            e_pri=n_features * np.sqrt(n_times * (2 * n_times - 1)) * tol +
-            rtol * max(
+            e_pri=n_features * np.sqrt(n_constraints) * tol + rtol * max(
                 np.sqrt(
-                    squared_norm(R) + sum(
-                        squared_norm(Z_M[m][0]) + squared_norm(Z_M[m][1]) +
-                        squared_norm(W_M[m][0]) + squared_norm(W_M[m][1])
-                        for m in range(1, n_times))),
+                    squared_norm(R) + squared_norm(Z_L) + squared_norm(Z_R) +
+                    squared_norm(W_L) + squared_norm(W_R)),
                 np.sqrt(
-                    squared_norm(Z_0 - W_0) + sum(
-                        squared_norm(Z_0[:-m]) + squared_norm(Z_0[m:]) +
-                        squared_norm(W_0[:-m]) + squared_norm(W_0[m:])
-                        for m in range(1, n_times)))),
-            e_dual=n_features * np.sqrt(n_times * (2 * n_times - 1)) * tol +
+                    squared_norm(Z_0 - W_0) + np.dot(
+                        n_consensus_psi - 1, np.sum(Z_0 ** 2, axis=(1, 2))) +
+                    np.dot(
+                        n_consensus_phi - 1, np.sum(W_0 ** 2, axis=(1, 2))))),
+            e_dual=n_features * np.sqrt(n_constraints) * tol +
             rtol * rho * np.sqrt(
-                squared_norm(X_0) + sum(
-                    squared_norm(Y_M[m][0]) + squared_norm(Y_M[m][1]) +
-                    squared_norm(U_M[m][0]) + squared_norm(U_M[m][1])
-                    for m in range(1, n_times))))
+                squared_norm(X_0) + squared_norm(Y_L) + squared_norm(Y_R) +
+                squared_norm(U_L) + squared_norm(U_R)))
 
         R_old = R.copy()
-        for m in range(1, n_times):
-            Z_M_old[m] = (Z_M[m][0].copy(), Z_M[m][1].copy())
-            W_M_old[m] = (W_M[m][0].copy(), W_M[m][1].copy())
+        Z_L_old, Z_R_old = Z_L, Z_R
+        W_L_old, W_R_old = W_L, W_R
 
         if verbose:
             print(
@@ -306,19 +300,15 @@ def kernel_latent_time_graphical_lasso(
             **(update_rho_options or {}))
         # scaled dual variables should be also rescaled
         X_0 *= rho / rho_new
-        for m in range(1, n_times):
-            Y_L, Y_R = Y_M[m]
-            Y_L *= rho / rho_new
-            Y_R *= rho / rho_new
-
-            U_L, U_R = U_M[m]
-            U_L *= rho / rho_new
-            U_R *= rho / rho_new
+        Y_L *= rho / rho_new
+        Y_R *= rho / rho_new
+        U_L *= rho / rho_new
+        U_R *= rho / rho_new
         rho = rho_new
     else:
         warnings.warn("Objective did not converge.")
 
-    covariance_ = np.array([linalg.pinvh(x) for x in Z_0])
+    covariance_ = batch_pinvh(Z_0) if compute_covariance else None
     return_list = [Z_0, W_0, covariance_]
     if return_history:
         return_list.append(checks)
@@ -383,6 +373,10 @@ class KernelLatentTimeGraphicalLasso(KernelTimeGraphicalLasso):
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
 
+    max_lag : integer, default None
+        Bandwidth of the kernels, i.e., the highest lag between time points
+        to enforce. If None, lags with negligible weight are discarded.
+
     Attributes
     ----------
     covariance_ : array-like, shape (n_times, n_features, n_features)
@@ -405,13 +399,13 @@ class KernelLatentTimeGraphicalLasso(KernelTimeGraphicalLasso):
             max_iter=100, verbose=False, assume_centered=False,
             return_history=False, update_rho_options=None,
             compute_objective=True, ker_psi_param=1, ker_phi_param=1,
-            init='empirical'):
+            init='empirical', max_lag=None):
         super(KernelLatentTimeGraphicalLasso, self).__init__(
             alpha=alpha, rho=rho, tol=tol, rtol=rtol, max_iter=max_iter,
             verbose=verbose, assume_centered=assume_centered,
             update_rho_options=update_rho_options,
             compute_objective=compute_objective, return_history=return_history,
-            psi=psi, init=init)
+            psi=psi, init=init, max_lag=max_lag)
         self.kernel_psi = kernel_psi
         self.kernel_phi = kernel_phi
         self.tau = tau
@@ -474,7 +468,8 @@ class KernelLatentTimeGraphicalLasso(KernelTimeGraphicalLasso):
             verbose=self.verbose, return_n_iter=True,
             return_history=self.return_history,
             update_rho_options=self.update_rho_options,
-            compute_objective=self.compute_objective, init=self.init)
+            compute_objective=self.compute_objective, init=self.init,
+            compute_covariance=False, max_lag=self.max_lag)
         if self.return_history:
             self.precision_, self.latent_, self.covariance_, self.history_, \
                 self.n_iter_ = out
@@ -643,7 +638,7 @@ class SimilarityLatentTimeGraphicalLasso(KernelLatentTimeGraphicalLasso):
                     return_n_iter=True, return_history=self.return_history,
                     update_rho_options=self.update_rho_options,
                     compute_objective=self.compute_objective,
-                    init=self.precision_)
+                    init=self.precision_, compute_covariance=False)
 
                 if self.return_history:
                     (
@@ -704,7 +699,8 @@ class SimilarityLatentTimeGraphicalLasso(KernelLatentTimeGraphicalLasso):
                 psi=self.psi, max_iter=self.max_iter, verbose=self.verbose,
                 return_n_iter=True, return_history=self.return_history,
                 update_rho_options=self.update_rho_options,
-                compute_objective=self.compute_objective, init=self.init)
+                compute_objective=self.compute_objective, init=self.init,
+                compute_covariance=False)
             if self.return_history:
                 (
                     self.precision_, self.latent_, self.covariance_,
@@ -37,10 +37,10 @@ from __future__ import division
 import warnings
 
 import numpy as np
-from scipy import linalg
 from six.moves import map, range, zip
 from sklearn.cluster import AgglomerativeClustering
 from sklearn.gaussian_process import kernels
+from sklearn.utils._joblib import Parallel, delayed
 from sklearn.utils.extmath import squared_norm
 from sklearn.utils.validation import check_is_fitted
 
@@ -49,25 +49,27 @@ from regain.covariance.time_graphical_lasso_ import (TimeGraphicalLasso,
 from regain.norm import l1_od_norm
 from regain.prox import prox_logdet, soft_thresholding
 from regain.update_rules import update_rho
-from regain.utils import convergence, normalize_matrix
-from regain.validation import check_norm_prox
+from regain.utils import (
+    batch_pinvh, convergence, lag_pairs, normalize_matrix, segment_sum)
+from regain.validation import check_kernel, check_norm_prox
 
 # from regain.clustering import graph_k_means
 
 
-def objective(n_samples, S, K, Z_0, Z_M, alpha, kernel, psi):
-    """Objective function for time-varying graphical lasso."""
-    obj = loss(S, K, n_samples=n_samples)
+def objective(n_samples, S, K, Z_0, Z_M, alpha, weights, psi, eigvals=None):
+    """Objective function for time-varying graphical lasso.
+
+    Z_M contains the consensus variables (Z_L, Z_R) of all the pairs of
+    time points coupled by the kernel, and `weights` their kernel values.
+    """
+    obj = loss(S, K, n_samples=n_samples, eigvals=eigvals)
     if isinstance(alpha, np.ndarray):
         obj += sum(l1_od_norm(a * z) for a, z in zip(alpha, Z_0))
     else:
         obj += alpha * sum(map(l1_od_norm, Z_0))
 
-    for m in range(1, Z_0.shape[0]):
-        # all possible markovians jumps
-        Z_L, Z_R = Z_M[m]
-        obj += np.sum(np.array(list(map(psi, Z_R - Z_L))) * np.diag(kernel, m))
-
+    Z_L, Z_R = Z_M
+    obj += np.dot(weights, [psi(z) for z in Z_R - Z_L])
     return obj
 
 
@@ -76,7 +78,8 @@ def kernel_time_graphical_lasso(
         verbose=False, psi='laplacian', tol=1e-4, rtol=1e-4,
         return_history=False, return_n_iter=True, mode='admm',
         update_rho_options=None, compute_objective=True, stop_at=None,
-        stop_when=1e-4, init="empirical"):
+        stop_when=1e-4, init="empirical", compute_covariance=True,
+        kernel_tol=1e-8, max_lag=None, warm_start=None, return_state=False):
     """Time-varying graphical lasso solver.
 
     Solves the following problem via ADMM:
@@ -92,7 +95,7 @@ def kernel_time_graphical_lasso(
         Empirical covariance of data.
     alpha, beta : float, optional
         Regularisation parameter.
-    kernel : ndarray, default None
+    kernel : ndarray or sparse matrix, default None
         Normalised temporal kernel (1 on the diagonal),
         with dimensions equal to the dimensionality of the data set.
         If None, it is interpreted as an identity matrix, where there is no
@@ -107,9 +110,34 @@ def kernel_time_graphical_lasso(
         Relative tolerance for convergence.
     return_history : bool, optional
         Return the history of computed values.
+    stop_at : float, optional
+        Stop when the objective is within a relative `stop_when` of this
+        value. The objective is then evaluated with the likelihood at Z_0 and
+        the penalty at K, otherwise with the likelihood at K and the penalty
+        at Z_0, which reuses the eigenvalues of K.
+    stop_when : float, default 1e-4
+        Relative tolerance for `stop_at`.
     init : {'empirical', 'zeros', ndarray}, default 'empirical'
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
+    compute_covariance : bool, default True
+        Choose to compute the covariance matrices, i.e. the inverse of the
+        solution. If False, None is returned in their place.
+    kernel_tol : float, default 1e-8
+        Lags of the kernel whose weights are all below `kernel_tol` are
+        not enforced, and their consensus variables are not allocated.
+    max_lag : int, default None
+        Bandwidth of the kernel, i.e., the highest lag to consider.
+        If None, it is inferred from `kernel_tol`.
+    warm_start : dict, default None
+        State of a previous run, as returned with `return_state=True`.
+        Primal and dual variables, and rho, are resumed from it (`init` is
+        ignored). The dual variables of a pair of time points whose kernel
+        weight decreased are shrunk in proportion. Pairs of time points
+        which were not coupled in the previous run are initialised as in a
+        cold start.
+    return_state : bool, default False
+        Return the final state of the solver, to be used as `warm_start`.
 
     Returns
     -------
@@ -119,33 +147,53 @@ def kernel_time_graphical_lasso(
         If return_history, then also a structure that contains the
         objective value, the primal and dual residual norms, and tolerances
         for the primal and dual residual norms at each iteration.
+    state : dict
+        If return_state, the state of the solver at the last iteration.
 
     """
     psi, prox_psi, psi_node_penalty = check_norm_prox(psi)
     n_times, _, n_features = emp_cov.shape
 
-    if kernel is None:
-        kernel = np.eye(n_times)
+    kernel, lags = check_kernel(
+        kernel, n_times, tol=kernel_tol, max_lag=max_lag)
+
+    # all pairs of time points (left, right) coupled by the kernel
+    left, right = lag_pairs(n_times, lags)
+    weights = kernel[left, right]
+    n_consensus = 1 + np.bincount(left, minlength=n_times) + \
+        np.bincount(right, minlength=n_times)
+    n_constraints = n_times + 2 * left.size
 
-    Z_0 = init_precision(emp_cov, mode=init)
+    if warm_start is None:
+        Z_0 = init_precision(emp_cov, mode=init)
+    else:
+        Z_0 = warm_start['Z_0'].copy()
+        rho = warm_start['rho']
     U_0 = np.zeros_like(Z_0)
     Z_0_old = np.zeros_like(Z_0)
 
-    Z_M, Z_M_old = {}, {}
-    U_M = {}
-    for m in range(1, n_times):
-        # all possible markovians jumps
-        Z_L = Z_0.copy()[:-m]
-        Z_R = Z_0.copy()[m:]
-        Z_M[m] = (Z_L, Z_R)
-
-        U_L = np.zeros_like(Z_L)
-        U_R = np.zeros_like(Z_R)
-        U_M[m] = (U_L, U_R)
-
-        Z_L_old = np.zeros_like(Z_L)
-        Z_R_old = np.zeros_like(Z_R)
-        Z_M_old[m] = (Z_L_old, Z_R_old)
+    Z_L, Z_R = Z_0[left], Z_0[right]
+    U_L, U_R = np.zeros_like(Z_L), np.zeros_like(Z_R)
+    Z_L_old, Z_R_old = np.zeros_like(Z_L), np.zeros_like(Z_R)
+    if warm_start is not None:
+        U_0 = warm_start['U_0'].copy()
+        # resume the pairs which were already coupled
+        position = np.full((n_times, n_times), -1, dtype=int)
+        position[warm_start['left'], warm_start['right']] = np.arange(
+            warm_start['left'].size)
+        position = position[left, right]
+        resumed = position >= 0
+        for x, name in ((Z_L, 'Z_L'), (Z_R, 'Z_R'), (U_L, 'U_L'),
+                        (U_R, 'U_R')):
+            x[resumed] = warm_start[name][position[resumed]]
+        # the duals of a pair are bounded by its weight, shrink them if the
+        # weight decreased
+        weights_old = warm_start['weights'][position[resumed]]
+        scale = np.ones(weights_old.size)
+        np.divide(weights[resumed], weights_old, out=scale,
+                  where=weights[resumed] < weights_old)
+        U_L[resumed] *= scale[:, None, None]
+        U_R[resumed] *= scale[:, None, None]
 
     if n_samples is None:
         n_samples = np.ones(n_times)
@@ -153,29 +201,29 @@ def kernel_time_graphical_lasso(
     checks = [
         convergence(
             obj=objective(
-                n_samples, emp_cov, Z_0, Z_0, Z_M, alpha, kernel, psi))
+                n_samples, emp_cov, Z_0, Z_0, (Z_L, Z_R), alpha, weights,
+                psi))
     ]
     for iteration_ in range(max_iter):
         # update K
         A = Z_0 - U_0
-        for m in range(1, n_times):
-            A[:-m] += Z_M[m][0] - U_M[m][0]
-            A[m:] += Z_M[m][1] - U_M[m][1]
+        A += segment_sum(Z_L - U_L, left, n_times)
+        A += segment_sum(Z_R - U_R, right, n_times)
 
-        A /= n_times
+        A /= n_consensus[:, None, None]
         # soft_thresholding_ = partial(soft_thresholding, lamda=alpha / rho)
         # K = np.array(map(soft_thresholding_, A))
         A += A.transpose(0, 2, 1)
         A /= 2.
 
-        A *= -rho * n_times / n_samples[:, None, None]
+        A *= -rho * (n_consensus / n_samples)[:, None, None]
         A += emp_cov
 
-        K = np.array(
-            [
-                prox_logdet(a, lamda=ni / (rho * n_times))
-                for a, ni in zip(A, n_samples)
-            ])
+        K = np.empty_like(A)
+        K_eigvals = np.empty(A.shape[:2])
+        for t, (a, ni, ci) in enumerate(zip(A, n_samples, n_consensus)):
+            K[t], K_eigvals[t] = prox_logdet(
+                a, lamda=ni / (rho * ci), return_eigen=True)
 
         # update Z_0
         A = K + U_0
@@ -186,62 +234,57 @@ def kernel_time_graphical_lasso(
         # update residuals
         U_0 += K - Z_0
 
-        # other Zs
-        for m in range(1, n_times):
-            U_L, U_R = U_M[m]
-            A_L = K[:-m] + U_L
-            A_R = K[m:] + U_R
-            if not psi_node_penalty:
-                prox_e = prox_psi(
-                    A_R - A_L,
-                    lamda=2. * np.diag(kernel, m)[:, None, None] / rho)
-                Z_L = .5 * (A_L + A_R - prox_e)
-                Z_R = .5 * (A_L + A_R + prox_e)
-            else:
-                Z_L, Z_R = prox_psi(
-                    np.concatenate((A_L, A_R), axis=1),
-                    lamda=.5 * np.diag(kernel, m)[:, None, None] / rho,
-                    rho=rho, tol=tol, rtol=rtol, max_iter=max_iter)
-            Z_M[m] = (Z_L, Z_R)
+        # other Zs, for all pairs at once
+        K_L, K_R = K[left], K[right]
+        A_L = K_L + U_L
+        A_R = K_R + U_R
+        if not psi_node_penalty:
+            prox_e = prox_psi(
+                A_R - A_L, lamda=2. * weights[:, None, None] / rho)
+            Z_L = .5 * (A_L + A_R - prox_e)
+            Z_R = .5 * (A_L + A_R + prox_e)
+        else:
+            Z_L, Z_R = prox_psi(
+                np.concatenate((A_L, A_R), axis=1),
+                lamda=.5 * weights[:, None, None] / rho, rho=rho, tol=tol,
+                rtol=rtol, max_iter=max_iter)
 
-            # update other residuals
-            U_L += K[:-m] - Z_L
-            U_R += K[m:] - Z_R
+        # update other residuals
+        U_L += K_L - Z_L
+        U_R += K_R - Z_R
 
         # diagnostics, reporting, termination checks
         rnorm = np.sqrt(
-            squared_norm(K - Z_0) + sum(
-                squared_norm(K[:-m] - Z_M[m][0]) +
-                squared_norm(K[m:] - Z_M[m][1]) for m in range(1, n_times)))
+            squared_norm(K - Z_0) + squared_norm(K_L - Z_L) +
+            squared_norm(K_R - Z_R))
 
         snorm = rho * np.sqrt(
-            squared_norm(Z_0 - Z_0_old) + sum(
-                squared_norm(Z_M[m][0] - Z_M_old[m][0]) +
-                squared_norm(Z_M[m][1] - Z_M_old[m][1])
-                for m in range(1, n_times)))
-
-        obj = objective(
-            n_samples, emp_cov, Z_0, K, Z_M, alpha, kernel, psi) \
-            if compute_objective else np.nan
+            squared_norm(Z_0 - Z_0_old) + squared_norm(Z_L - Z_L_old) +
+            squared_norm(Z_R - Z_R_old))
+
+        if not compute_objective:
+            obj = np.nan
+        elif stop_at is None:
+            obj = objective(
+                n_samples, emp_cov, K, Z_0, (Z_L, Z_R), alpha, weights, psi,
+                eigvals=K_eigvals)
+        else:
+            # likelihood at Z_0 and penalty at K, as stop_at expects
+            obj = objective(
+                n_samples, emp_cov, Z_0, K, (Z_L, Z_R), alpha, weights, psi)
 
         check = convergence(
             obj=obj, rnorm=rnorm, snorm=snorm,
-            e_pri=n_features * n_times * tol + rtol * max(
+            e_pri=n_features * np.sqrt(n_constraints) * tol + rtol * max(
                 np.sqrt(
-                    squared_norm(Z_0) + sum(
-                        squared_norm(Z_M[m][0]) + squared_norm(Z_M[m][1])
-                        for m in range(1, n_times))),
-                np.sqrt(
-                    squared_norm(K) + sum(
-                        squared_norm(K[:-m]) + squared_norm(K[m:])
-                        for m in range(1, n_times)))),
-            e_dual=n_features * n_times * tol + rtol * rho * np.sqrt(
-                squared_norm(U_0) + sum(
-                    squared_norm(U_M[m][0]) + squared_norm(U_M[m][1])
-                    for m in range(1, n_times))))
+                    squared_norm(Z_0) + squared_norm(Z_L) +
+                    squared_norm(Z_R)),
+                np.sqrt(np.dot(n_consensus, np.sum(K ** 2, axis=(1, 2))))),
+            e_dual=n_features * np.sqrt(n_constraints) * tol +
+            rtol * rho * np.sqrt(
+                squared_norm(U_0) + squared_norm(U_L) + squared_norm(U_R)))
         Z_0_old = Z_0.copy()
-        for m in range(1, n_times):
-            Z_M_old[m] = (Z_M[m][0].copy(), Z_M[m][1].copy())
+        Z_L_old, Z_R_old = Z_L, Z_R
 
         if verbose:
             print(
@@ -261,39 +304,78 @@ def kernel_time_graphical_lasso(
             **(update_rho_options or {}))
         # scaled dual variables should be also rescaled
         U_0 *= rho / rho_new
-        for m in range(1, n_times):
-            U_L, U_R = U_M[m]
-            U_L *= rho / rho_new
-            U_R *= rho / rho_new
+        U_L *= rho / rho_new
+        U_R *= rho / rho_new
         rho = rho_new
     else:
         warnings.warn("Objective did not converge.")
 
-    covariance_ = np.array([linalg.pinvh(x) for x in Z_0])
+    covariance_ = batch_pinvh(Z_0) if compute_covariance else None
     return_list = [Z_0, covariance_]
     if return_history:
         return_list.append(checks)
     if return_n_iter:
         return_list.append(iteration_ + 1)
+    if return_state:
+        return_list.append(
+            dict(
+                Z_0=Z_0, U_0=U_0, Z_L=Z_L, Z_R=Z_R, U_L=U_L, U_R=U_R,
+                left=left, right=right, weights=weights, rho=rho))
     return return_list
 
 
-def objective_kernel(theta, K, psi, kernel, times):
-    psi, _, _ = check_norm_prox(psi)
+def _kernel_matrix(kernel, theta, times, cache=None):
+    """Evaluate a kernel function with parameter theta on times.
+
+    If `cache` is a dict, kernel matrices are memoized by theta.
+    """
+    if cache is not None and theta in cache:
+        return cache[theta]
     try:
         # this works if it is a ExpSineSquared or RBF kernel
-        kernel = kernel(length_scale=theta)(times)
+        matrix = kernel(length_scale=theta)(times)
     except TypeError:
         # maybe it's a ConstantKernel
-        kernel = kernel(constant_value=theta)(times)
+        matrix = kernel(constant_value=theta)(times)
+    if cache is not None:
+        cache[theta] = matrix
+    return matrix
 
-    obj = 0
-    for m in range(1, K.shape[0]):
+
+def psi_distances(K, psi):
+    """Psi of the differences between all pairs of precision matrices.
+
+    Returns an upper triangular matrix D such that, for a given kernel,
+    the temporal penalty of K is ``np.sum(D * kernel)``.
+    """
+    n_times = K.shape[0]
+    distances = np.zeros((n_times, n_times))
+    for m in range(1, n_times):
         # all possible markovians jumps
-        obj += np.sum(
-            np.array(list(map(psi, K[m:] - K[:-m]))) * np.diag(kernel, m))
+        np.fill_diagonal(distances[:, m:], list(map(psi, K[m:] - K[:-m])))
+    return distances
 
-    return obj
+
+def update_psi_distances(distances, K, psi, changed):
+    """Update in-place the distances involving the changed precisions.
+
+    Only the rows and columns of `distances` (as computed by
+    `psi_distances`) of the time points marked in `changed` are recomputed.
+    """
+    for t in np.flatnonzero(changed):
+        dist = list(map(psi, K - K[t]))
+        distances[t, t + 1:] = dist[t + 1:]
+        distances[:t, t] = dist[:t]
+    return distances
+
+
+def objective_kernel(theta, distances, kernel, times, cache=None):
+    """Temporal penalty for the kernel with parameter theta.
+
+    `distances` are the pairwise distances of the precision matrices, as
+    computed by `psi_distances`.
+    """
+    return np.sum(distances * _kernel_matrix(kernel, theta, times, cache))
 
 
 def objective_similarity(theta, K, times, psi):
@@ -311,14 +393,10 @@ def objective_similarity(theta, K, times, psi):
     return obj
 
 
-def precision_similarity(K, psi):
-    n_times = K.shape[0]
-    kernel = np.zeros((n_times, n_times))
-    for m in range(1, n_times):
-        # all possible markovians jumps
-        dist = list(map(psi, K[m:] - K[:-m]))
-        np.fill_diagonal(kernel[m:], dist)
-        np.fill_diagonal(kernel[:, m:], dist)
+def precision_similarity(K, psi, distances=None):
+    if distances is None:
+        distances = psi_distances(K, psi)
+    kernel = distances + distances.T
 
     kernel -= np.min(kernel)
     kernel /= np.max(kernel)
@@ -336,7 +414,7 @@ class KernelTimeGraphicalLasso(TimeGraphicalLasso):
         Regularization parameter for precision matrix. The higher alpha,
         the more regularization, the sparser the inverse covariance.
 
-    kernel : ndarray, default None
+    kernel : ndarray or sparse matrix, or callable, default None
         Normalised temporal kernel (1 on the diagonal),
         with dimensions equal to the dimensionality of the data set.
         If None, it is interpreted as an identity matrix, where there is no
@@ -378,6 +456,19 @@ class KernelTimeGraphicalLasso(TimeGraphicalLasso):
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
 
+    max_lag : integer, default None
+        Bandwidth of the kernel, i.e., the highest lag between time points
+        to enforce. If None, lags with negligible weight are discarded.
+
+    ker_param_grid : array-like, default None
+        Only used if `ker_param='auto'`. If not None, the kernel parameter
+        is selected among these values at each step, instead of being
+        optimised in a continuous range.
+
+    n_jobs : int, default None
+        Number of jobs to evaluate `ker_param_grid` in parallel.
+        ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+
     Attributes
     ----------
     covariance_ : array-like, shape (n_times, n_features, n_features)
@@ -396,7 +487,8 @@ class KernelTimeGraphicalLasso(TimeGraphicalLasso):
             psi='laplacian', max_iter=100, verbose=False,
             assume_centered=False, return_history=False,
             update_rho_options=None, compute_objective=True, ker_param=1,
-            max_iter_ext=100, init='empirical'):
+            max_iter_ext=100, init='empirical', max_lag=None,
+            ker_param_grid=None, n_jobs=None):
         super(KernelTimeGraphicalLasso, self).__init__(
             alpha=alpha, beta=beta, rho=rho, tol=tol, rtol=rtol,
             max_iter=max_iter, verbose=verbose,
@@ -407,41 +499,49 @@ class KernelTimeGraphicalLasso(TimeGraphicalLasso):
         self.kernel = kernel
         self.ker_param = ker_param
         self.max_iter_ext = max_iter_ext
+        self.max_lag = max_lag
+        self.ker_param_grid = ker_param_grid
+        self.n_jobs = n_jobs
 
     def _fit(self, emp_cov, n_samples):
+        times = self.classes_[:, None]
         if self.ker_param == "auto":
             from scipy.optimize import minimize_scalar
 
             if not callable(self.kernel):
                 raise ValueError(
                     "kernel should be a function if ker_param=='auto'")
+            psi, _, _ = check_norm_prox(self.psi)
+            # kernel matrices are shared by the E and M steps
+            cache = {}
+
             # discover best kernel parameter via EM
             # initialise precision matrices, as warm start
             self.precision_ = init_precision(emp_cov, mode=self.init)
+            state = None
             theta_old = 0
             for i in range(self.max_iter_ext):
                 # E step - discover best kernel parameter
-                theta = minimize_scalar(
-                    objective_kernel, args=(
-                        self.precision_, self.psi, self.kernel,
-                        self.classes_[:, None]), bounds=(0, emp_cov.shape[0]),
-                    method='bounded').x
+                distances = psi_distances(self.precision_, psi)
+                if self.ker_param_grid is None:
+                    theta = minimize_scalar(
+                        objective_kernel,
+                        args=(distances, self.kernel, times, cache),
+                        bounds=(0, emp_cov.shape[0]), method='bounded').x
+                else:
+                    objs = Parallel(n_jobs=self.n_jobs)(
+                        delayed(objective_kernel)(
+                            theta, distances, self.kernel, times)
+                        for theta in self.ker_param_grid)
+                    theta = self.ker_param_grid[np.argmin(objs)]
 
                 if i > 0 and abs(theta_old - theta) < 1e-5:
                     break
                 else:
                     print("Find new theta: %f" % theta)
 
-                # M step
-                try:
-                    # this works if it is a ExpSineSquared or RBF kernel
-                    kernel = self.kernel(length_scale=theta)(
-                        self.classes_[:, None])
-                except TypeError:
-                    # maybe it's a ConstantKernel
-                    kernel = self.kernel(constant_value=theta)(
-                        self.classes_[:, None])
-
+                # M step, resuming the previous ADMM run
+                kernel = _kernel_matrix(self.kernel, theta, times, cache)
                 out = kernel_time_graphical_lasso(
                     emp_cov, alpha=self.alpha, rho=self.rho, kernel=kernel,
                     n_samples=n_samples, tol=self.tol, rtol=self.rtol,
@@ -449,7 +549,9 @@ class KernelTimeGraphicalLasso(TimeGraphicalLasso):
                     return_n_iter=True, return_history=self.return_history,
                     update_rho_options=self.update_rho_options,
                     compute_objective=self.compute_objective,
-                    init=self.precision_)
+                    init=self.precision_, compute_covariance=False,
+                    max_lag=self.max_lag, warm_start=state, return_state=True)
+                state = out.pop()
                 if self.return_history:
                     (
                         self.precision_, self.covariance_, self.history_,
@@ -462,14 +564,7 @@ class KernelTimeGraphicalLasso(TimeGraphicalLasso):
 
         else:
             if callable(self.kernel):
-                try:
-                    # this works if it is a ExpSineSquared or RBF kernel
-                    kernel = self.kernel(length_scale=self.ker_param)(
-                        self.classes_[:, None])
-                except TypeError:
-                    # maybe it's a ConstantKernel
-                    kernel = self.kernel(constant_value=self.ker_param)(
-                        self.classes_[:, None])
+                kernel = _kernel_matrix(self.kernel, self.ker_param, times)
             else:
                 kernel = self.kernel
                 if kernel.shape[0] != self.classes_.size:
@@ -484,7 +579,8 @@ class KernelTimeGraphicalLasso(TimeGraphicalLasso):
                 psi=self.psi, max_iter=self.max_iter, verbose=self.verbose,
                 return_n_iter=True, return_history=self.return_history,
                 update_rho_options=self.update_rho_options,
-                compute_objective=self.compute_objective, init=self.init)
+                compute_objective=self.compute_objective, init=self.init,
+                compute_covariance=False, max_lag=self.max_lag)
             if self.return_history:
                 (
                     self.precision_, self.covariance_, self.history_,
@@ -589,11 +685,14 @@ class SimilarityTimeGraphicalLasso(KernelTimeGraphicalLasso):
             theta_old = np.zeros(n_times * (n_times - 1) // 2)
             # idx = np.triu_indices(n_times, 1)
             kernel = np.eye(n_times)
+            kernel_times = kernels.RBF(self.beta)(np.arange(n_times)[:, None])
 
             psi, _, _ = check_norm_prox(self.psi)
             if self.n_clusters is None:
                 self.n_clusters = n_times
 
+            distances = None
+            state = None
             for i in range(self.max_iter_ext):
                 # E step - discover best kernel
                 # , method='bounded'bounds=[(0, None)]*theta_old.size
@@ -603,7 +702,22 @@ class SimilarityTimeGraphicalLasso(KernelTimeGraphicalLasso):
                 #     ).x
                 # theta -= np.min(theta)
                 # theta /= np.max(theta)
-                theta = precision_similarity(self.precision_, psi)
+                if distances is None:
+                    distances = psi_distances(self.precision_, psi)
+                else:
+                    # only precisions which moved more than the tolerance
+                    # of the solver change the similarity
+                    changed = np.linalg.norm(
+                        self.precision_ - precision_old, axis=(1, 2)) > \
+                        self.tol * np.linalg.norm(self.precision_, axis=(1, 2))
+                    if not np.any(changed):
+                        # same similarity, hence same clusters
+                        kernel = theta_old
+                        break
+                    update_psi_distances(
+                        distances, self.precision_, psi, changed)
+                theta = precision_similarity(
+                    self.precision_, psi, distances=distances)
 
                 # if i > 0 and np.linalg.norm(theta_old -
                 #                             theta) / theta.size < self.eps:
@@ -619,14 +733,14 @@ class SimilarityTimeGraphicalLasso(KernelTimeGraphicalLasso):
                 if i > 0 and np.linalg.norm(labels_pred - labels_pred_old
                                             ) / labels_pred.size < self.eps:
                     break
-                kernel = kernels.RBF(0.0001)(
-                    labels_pred[:, None]) + kernels.RBF(self.beta)(
-                        np.arange(n_times)[:, None])
+                kernel = kernels.RBF(0.0001)(labels_pred[:, None]) + \
+                    kernel_times
 
                 # normalize_matrix(kernel_sum)
                 # kernel += kerne * self.beta
 
-                # M step - fix the kernel matrix
+                # M step - fix the kernel matrix, resuming the previous run
+                precision_old = self.precision_
                 out = kernel_time_graphical_lasso(
                     emp_cov, alpha=self.alpha, rho=self.rho, kernel=kernel,
                     n_samples=n_samples, tol=self.tol, rtol=self.rtol,
@@ -634,7 +748,9 @@ class SimilarityTimeGraphicalLasso(KernelTimeGraphicalLasso):
                     return_n_iter=True, return_history=self.return_history,
                     update_rho_options=self.update_rho_options,
                     compute_objective=self.compute_objective,
-                    init=self.precision_)
+                    init=self.precision_, compute_covariance=False,
+                    warm_start=state, return_state=True)
+                state = out.pop()
 
                 if self.return_history:
                     (
@@ -669,7 +785,8 @@ class SimilarityTimeGraphicalLasso(KernelTimeGraphicalLasso):
                 psi=self.psi, max_iter=self.max_iter, verbose=self.verbose,
                 return_n_iter=True, return_history=self.return_history,
                 update_rho_options=self.update_rho_options,
-                compute_objective=self.compute_objective, init=self.init)
+                compute_objective=self.compute_objective, init=self.init,
+                compute_covariance=False)
             if self.return_history:
                 (
                     self.precision_, self.covariance_, self.history_,
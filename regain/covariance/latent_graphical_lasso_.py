@@ -33,27 +33,32 @@ from __future__ import division
 import warnings
 
 import numpy as np
-from scipy import linalg
 from six.moves import range
 
 from regain.covariance.graphical_lasso_ import GraphicalLasso, init_precision
 from regain.covariance.graphical_lasso_ import objective as obj_gl
 from regain.prox import prox_logdet, prox_trace_indicator, soft_thresholding
 from regain.update_rules import update_rho
-from regain.utils import convergence
+from regain.utils import batch_pinvh, convergence
 
 
-def objective(emp_cov, R, K, L, alpha, tau):
-    """Objective function for latent graphical lasso."""
-    obj = obj_gl(emp_cov, R, K, alpha=alpha)
-    obj += tau * np.linalg.norm(L, ord='nuc')
+def objective(emp_cov, R, K, L, alpha, tau, R_eigvals=None, L_eigvals=None):
+    """Objective function for latent graphical lasso.
+
+    Eigenvalues of R and L, if available, avoid further decompositions.
+    """
+    obj = obj_gl(emp_cov, R, K, alpha=alpha, eigvals=R_eigvals)
+    obj += tau * (
+        np.linalg.norm(L, ord='nuc')
+        if L_eigvals is None else np.sum(np.abs(L_eigvals)))
     return obj
 
 
 def latent_graphical_lasso(
         emp_cov, alpha=1., tau=1., rho=1., max_iter=100, verbose=False,
         tol=1e-4, rtol=1e-2, return_history=False, return_n_iter=True,
-        update_rho_options=None, compute_objective=True, init='empirical'):
+        update_rho_options=None, compute_objective=True, init='empirical',
+        compute_covariance=True):
     r"""Latent variable graphical lasso solver via ADMM.
 
     Solves the following problem:
@@ -90,6 +95,9 @@ def latent_graphical_lasso(
     init : {'empirical', 'zeros', ndarray}, default 'empirical'
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
+    compute_covariance : bool, default True
+        Choose to compute the covariance matrices, i.e. the inverse of the
+        solution. If False, None is returned in their place.
 
     Returns
     -------
@@ -118,7 +126,8 @@ def latent_graphical_lasso(
         A = K - L - U
         A += A.T
         A /= 2.
-        R = prox_logdet(emp_cov - rho * A, lamda=1. / rho)
+        R, R_eigvals = prox_logdet(
+            emp_cov - rho * A, lamda=1. / rho, return_eigen=True)
 
         A = L + R + U
         K = soft_thresholding(A, lamda=alpha / rho)
@@ -126,13 +135,16 @@ def latent_graphical_lasso(
         A = K - R - U
         A += A.T
         A /= 2.
-        L = prox_trace_indicator(A, lamda=tau / rho)
+        L, L_eigvals = prox_trace_indicator(
+            A, lamda=tau / rho, return_eigen=True)
 
         # update residuals
         U += R - K + L
 
         # diagnostics, reporting, termination checks
-        obj = objective(emp_cov, R, K, L, alpha, tau) \
+        obj = objective(
+            emp_cov, R, K, L, alpha, tau, R_eigvals=R_eigvals,
+            L_eigvals=L_eigvals) \
             if compute_objective else np.nan
         rnorm = np.linalg.norm(R - K + L)
         snorm = rho * np.linalg.norm(R - R_old)
@@ -161,7 +173,7 @@ def latent_graphical_lasso(
     else:
         warnings.warn("Objective did not converge.")
 
-    covariance_ = linalg.pinvh(K)
+    covariance_ = batch_pinvh(K) if compute_covariance else None
     return_list = [K, L, covariance_]
     if return_history:
         return_list.append(checks)
@@ -274,5 +286,6 @@ class LatentGraphicalLasso(GraphicalLasso):
                 max_iter=self.max_iter, verbose=self.verbose,
                 return_n_iter=True, return_history=False,
                 update_rho_options=self.update_rho_options,
-                compute_objective=self.compute_objective, init=self.init)
+                compute_objective=self.compute_objective, init=self.init,
+                compute_covariance=False)
         return self
@@ -34,7 +34,6 @@ import warnings
 from functools import partial
 
 import numpy as np
-from scipy import linalg
 from six.moves import map, range, zip
 from sklearn.utils.extmath import squared_norm
 
@@ -43,18 +42,25 @@ from regain.covariance.time_graphical_lasso_ import (
 from regain.covariance.time_graphical_lasso_ import objective as obj_tgl
 from regain.prox import prox_logdet, prox_trace_indicator, soft_thresholding
 from regain.update_rules import update_rho
-from regain.utils import convergence
+from regain.utils import batch_pinvh, convergence
 from regain.validation import check_norm_prox
 
 
 def objective(
         S, n_samples, R, Z_0, Z_1, Z_2, W_0, W_1, W_2, alpha, tau, beta, eta,
-        psi, phi):
-    """Objective function for latent variable time-varying graphical lasso."""
+        psi, phi, R_eigvals=None, W_eigvals=None):
+    """Objective function for latent variable time-varying graphical lasso.
+
+    Eigenvalues of R and W_0, if available, avoid further decompositions.
+    """
     # obj = sum(- n * logl(s, r) for s, r, n in zip(S, R, n_samples))
-    obj = obj_tgl(n_samples, S, R, Z_0, Z_1, Z_2, alpha, beta, psi)
+    obj = obj_tgl(
+        n_samples, S, R, Z_0, Z_1, Z_2, alpha, beta, psi, eigvals=R_eigvals)
 
-    if isinstance(tau, np.ndarray):
+    if W_eigvals is not None and np.size(tau) in (1, W_0.shape[0]):
+        # nuclear norms from the eigenvalues of the symmetric W_0
+        obj += np.sum(np.abs(np.ravel(tau)) * np.abs(W_eigvals).sum(axis=1))
+    elif isinstance(tau, np.ndarray):
         obj += sum(np.linalg.norm(t * w, ord='nuc') for t, w in zip(tau, W_0))
     else:
         obj += tau * sum(map(partial(np.linalg.norm, ord='nuc'), W_0))
@@ -71,7 +77,7 @@ def latent_time_graphical_lasso(
         n_samples=None, verbose=False, psi='laplacian', phi='laplacian',
         mode='admm', tol=1e-4, rtol=1e-4, return_history=False,
         return_n_iter=True, update_rho_options=None, compute_objective=True,
-        init='empirical'):
+        init='empirical', compute_covariance=True):
     r"""Latent variable time-varying graphical lasso solver.
 
     Solves the following problem via ADMM:
@@ -113,6 +119,9 @@ def latent_time_graphical_lasso(
     init : {'empirical', 'zeros', ndarray}, default 'empirical'
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
+    compute_covariance : bool, default True
+        Choose to compute the covariance matrices, i.e. the inverse of the
+        solution. If False, None is returned in their place.
 
     Returns
     -------
@@ -164,8 +173,11 @@ def latent_time_graphical_lasso(
         A += emp_cov
         # A = emp_cov / rho - A
 
-        R = np.array(
-            [prox_logdet(a, lamda=ni / rho) for a, ni in zip(A, n_samples)])
+        R = np.empty_like(A)
+        R_eigvals = np.empty(A.shape[:2])
+        for t, (a, ni) in enumerate(zip(A, n_samples)):
+            R[t], R_eigvals[t] = prox_logdet(
+                a, lamda=ni / rho, return_eigen=True)
 
         # update Z_0
         A = R + W_0 + X_0
@@ -197,11 +209,11 @@ def latent_time_graphical_lasso(
         A += A.transpose(0, 2, 1)
         A /= 2.
 
-        W_0 = np.array(
-            [
-                prox_trace_indicator(a, lamda=tau / (rho * div))
-                for a, div in zip(A, divisor)
-            ])
+        W_0 = np.empty_like(A)
+        W_eigvals = np.empty(A.shape[:2])
+        for t, (a, div) in enumerate(zip(A, divisor)):
+            W_0[t], W_eigvals[t] = prox_trace_indicator(
+                a, lamda=tau / (rho * div), return_eigen=True)
 
         # update W_1, W_2
         A_1 = W_0[:-1] + U_1
@@ -234,7 +246,8 @@ def latent_time_graphical_lasso(
             squared_norm(W_2 - W_2_old))
 
         obj = objective(emp_cov, n_samples, R, Z_0, Z_1, Z_2, W_0, W_1, W_2,
-                        alpha, tau, beta, eta, psi, phi) \
+                        alpha, tau, beta, eta, psi, phi, R_eigvals=R_eigvals,
+                        W_eigvals=W_eigvals) \
             if compute_objective else np.nan
 
         check = convergence(
@@ -280,7 +293,7 @@ def latent_time_graphical_lasso(
     else:
         warnings.warn("Objective did not converge.")
 
-    covariance_ = np.array([linalg.pinvh(x) for x in Z_0])
+    covariance_ = batch_pinvh(Z_0) if compute_covariance else None
     return_list = [Z_0, W_0, covariance_]
     if return_history:
         return_list.append(checks)
@@ -416,5 +429,6 @@ class LatentTimeGraphicalLasso(TimeGraphicalLasso):
                 max_iter=self.max_iter, verbose=self.verbose,
                 return_n_iter=True, return_history=False,
                 update_rho_options=self.update_rho_options,
-                compute_objective=self.compute_objective, init=self.init)
+                compute_objective=self.compute_objective, init=self.init,
+                compute_covariance=False)
         return self
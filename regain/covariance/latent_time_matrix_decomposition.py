@@ -49,11 +49,13 @@ from regain.validation import check_array_dimensions, check_norm_prox
 
 
 def objective(S, R, Z_0, Z_1, Z_2, W_0, W_1, W_2,
-              alpha, tau, beta, eta, psi, phi):
+              alpha, tau, beta, eta, psi, phi, W_eigvals=None):
     """Objective function for latent variable time-varying graphical lasso."""
     obj = squared_norm(S - R)
     obj += alpha * sum(map(l1_od_norm, Z_0))
-    obj += tau * sum(map(partial(np.linalg.norm, ord='nuc'), W_0))
+    obj += tau * (
+        sum(map(partial(np.linalg.norm, ord='nuc'), W_0))
+        if W_eigvals is None else np.sum(np.abs(W_eigvals)))
     obj += beta * sum(map(psi, Z_2 - Z_1))
     obj += eta * sum(map(phi, W_2 - W_1))
     return obj
@@ -165,8 +167,11 @@ def latent_time_matrix_decomposition(
         A += A.transpose(0, 2, 1)
         A /= 2.
 
-        W_0 = np.array([prox_trace_indicator(a, lamda=tau / (rho * div))
-                        for a, div in zip(A, divisor)])
+        W_0 = np.empty_like(A)
+        W_eigvals = np.empty(A.shape[:2])
+        for t, (a, div) in enumerate(zip(A, divisor)):
+            W_0[t], W_eigvals[t] = prox_trace_indicator(
+                a, lamda=tau / (rho * div), return_eigen=True)
 
         # update W_1, W_2
         A_1 = W_0[:-1] + U_1
@@ -199,7 +204,8 @@ def latent_time_matrix_decomposition(
             squared_norm(W_1 - W_1_old) + squared_norm(W_2 - W_2_old))
 
         obj = objective(emp_cov, R, Z_0, Z_1, Z_2, W_0, W_1, W_2,
-                        alpha, tau, beta, eta, psi, phi) \
+                        alpha, tau, beta, eta, psi, phi,
+                        W_eigvals=W_eigvals) \
             if compute_objective else np.nan
 
         check = convergence(
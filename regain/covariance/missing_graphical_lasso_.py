@@ -33,8 +33,9 @@ from __future__ import division
 import warnings
 
 import numpy as np
+from numpy.linalg.linalg import LinAlgError
 from six.moves import range
-from scipy.linalg import pinvh
+from scipy.linalg import cho_factor, cho_solve, pinvh
 
 from sklearn.covariance import empirical_covariance
 from sklearn.utils.extmath import fast_logdet
@@ -46,34 +47,56 @@ from regain.covariance.graphical_lasso_ import GraphicalLasso, logl
 from regain.utils import convergence
 
 
-def _compute_empirical_covariance(X, K, cs):
-    emp_cov = np.zeros((X.shape[0], K.shape[0], K.shape[0]))
+def _missing_patterns(X):
+    """Group the samples of X by their pattern of missing values.
+
+    Returns
+    -------
+    patterns : list of tuple
+        For each pattern with at least one missing value, the indices of
+        the samples (rows) which share it, and the indices of the missing
+        and observed variables.
+
+    """
+    mask = np.isnan(X)
+    unique, index = np.unique(mask, axis=0, return_inverse=True)
+    index = index.ravel()
+    return [
+        (np.flatnonzero(index == i), np.flatnonzero(pattern),
+         np.flatnonzero(~pattern)) for i, pattern in enumerate(unique)
+        if np.any(pattern)
+    ]
+
+
+def _missing_inverses(K, patterns):
+    """Pseudo-inverse of the missing block of K, for each pattern."""
+    return [pinvh(K[np.ix_(missing, missing)]) for _, missing, _ in patterns]
+
+
+def _compute_empirical_covariance(X, K, cs, patterns=None, inverses=None):
+    if patterns is None:
+        patterns = _missing_patterns(X)
+    if inverses is None:
+        inverses = _missing_inverses(K, patterns)
     aux = np.nan_to_num(np.copy(X))
     aux += cs
-    for i in range(X.shape[0]):
-        for v in range(emp_cov.shape[1]):
-            for s in range(emp_cov.shape[1]):
-                if np.isnan(X[i, v]) and np.isnan(X[i, s]):
-                    nans = np.where(np.isnan(X[i, :]))[0]
-                    xxm, yym = np.meshgrid(nans, nans)
-                    inv = np.linalg.pinv(K[xxm, yym])[
-                        np.where(nans == v)[0][0], np.where(nans == s)[0][0]]
-                    emp_cov[i, v, s] = inv + cs[i, v]*cs[i, s]
-                else:
-                    emp_cov[i, v, s] = aux[i, v]*aux[i, s]
-    emp_cov = np.sum(emp_cov, axis=0)
+    emp_cov = aux.T.dot(aux)
+    for (rows, missing, _), inv in zip(patterns, inverses):
+        # conditional covariance of the missing variables
+        emp_cov[np.ix_(missing, missing)] += rows.size * inv
     return emp_cov/np.max(emp_cov)
 
 
-def _compute_cs(means, K, X):
+def _compute_cs(means, K, X, patterns=None, inverses=None):
+    if patterns is None:
+        patterns = _missing_patterns(X)
+    if inverses is None:
+        inverses = _missing_inverses(K, patterns)
     cs = np.zeros_like(X)
-    for i in range(X.shape[0]):
-        nans = np.where(np.isnan(X[i, :]))[0]
-        obs = np.where(np.logical_not(np.isnan(X[i, :])))[0]
-        xxm, yym = np.meshgrid(nans, nans)
-        xxm1, yyo = np.meshgrid(obs, nans)
-        KK = np.linalg.pinv(K[xxm, yym]).dot(K[xxm1, yyo])
-        cs[i, nans] = means[nans] - KK.dot(X[i, obs].T - means[obs])
+    for (rows, missing, observed), inv in zip(patterns, inverses):
+        KK = inv.dot(K[np.ix_(missing, observed)])
+        cs[np.ix_(rows, missing)] = means[missing] - (
+            X[np.ix_(rows, observed)] - means[observed]).dot(KK.T)
     return cs/max(np.max(np.abs(cs)), 1)
 
 
@@ -83,6 +106,28 @@ def _compute_mean(X, cs):
     return np.sum(aux, axis=0)
 
 
+def _n_inexact(start=100., decay=0.1):
+    """Number of EM iterations whose M step is solved inexactly.
+
+    It is the first iteration at which `start * decay ** iteration` reaches
+    1, computed on the exponents so that rounding errors do not delay it.
+    """
+    return max(0, int(np.ceil(np.log(start) / -np.log(decay) - 1e-8)))
+
+
+def _inexact_tol(tol, iteration, start=100., decay=0.1):
+    """Tolerance of the M step at the given EM iteration.
+
+    Early M steps need not be accurate, since the expected statistics are
+    still far from their final value. The tolerance starts at `start * tol`
+    and decreases geometrically, down to `tol` from iteration
+    `_n_inexact(start, decay)`.
+    """
+    if iteration >= _n_inexact(start, decay):
+        return tol
+    return tol * start * decay ** iteration
+
+
 def missing_graphical_lasso(
         X, alpha=0.01, rho=1, over_relax=1, max_iter=100, verbose=False,
         tol=1e-4, rtol=1e-4, return_history=False, return_n_iter=True,
@@ -143,22 +188,31 @@ def missing_graphical_lasso(
     K = np.zeros((X.shape[1], X.shape[1]))
     means = np.zeros(X.shape[1])
 
+    patterns = _missing_patterns(X)
+
     loglik = -np.inf
     checks = []
+    state = None
     for iter_ in range(max_iter):
         old_logl = loglik
 
-        cs = _compute_cs(means, K, X)
+        # one factorisation for each pattern of missing values
+        inverses = _missing_inverses(K, patterns)
+        cs = _compute_cs(means, K, X, patterns, inverses)
         means = _compute_mean(X, cs)
-        emp_cov = _compute_empirical_covariance(X, K, cs)
-        K, _ = graphical_lasso(emp_cov, alpha=alpha, rho=rho,
-                               over_relax=over_relax, max_iter=max_iter,
-                               verbose=max(0, int(verbose-1)),
-                               tol=tol*10, rtol=rtol*10, return_history=False,
-                               return_n_iter=False,
-                               update_rho_options=update_rho_options,
-                               compute_objective=compute_objective,
-                               init=K)
+        emp_cov = _compute_empirical_covariance(
+            X, K, cs, patterns, inverses)
+
+        # inexact M step, resuming the previous one
+        inner_tol = _inexact_tol(tol * 10, iter_)
+        K, _, state = graphical_lasso(
+            emp_cov, alpha=alpha, rho=rho, over_relax=over_relax,
+            max_iter=max_iter, verbose=max(0, int(verbose-1)),
+            tol=inner_tol, rtol=_inexact_tol(rtol * 10, iter_),
+            return_history=False, return_n_iter=False,
+            update_rho_options=update_rho_options,
+            compute_objective=compute_objective, init=K,
+            warm_start=state, return_state=True)
         loglik = logl(emp_cov, K)
         diff = old_logl - loglik
         checks.append(dict(iteration=iter_,
@@ -167,7 +221,7 @@ def missing_graphical_lasso(
         if verbose:
             print("Iter %d: log-likelihood %.4f, difference: %.4f" % (
                     iter_, loglik, diff))
-        if np.abs(diff) < tol:
+        if np.abs(diff) < tol and iter_ >= _n_inexact():
             break
     else:
         warnings.warn("The Missing Graphical Lasso algorithm did not converge")
@@ -181,6 +235,29 @@ def missing_graphical_lasso(
     return return_list
 
 
+def _latent_regression(K, h):
+    """Conditional distribution of the latent variables given the observed.
+
+    With the first `h` variables of K latent, the latent variables given the
+    observed ones have covariance inv(K_hh) and mean -inv(K_hh) K_ho x_o.
+    Only the small h x h block needs to be factorised.
+
+    Returns
+    -------
+    K_hh_inv : ndarray, shape (h, h)
+        Inverse of the latent block of K.
+    coef : ndarray, shape (h, n_observed)
+        inv(K_hh) K_ho.
+
+    """
+    try:
+        factor = cho_factor(K[:h, :h])
+        return cho_solve(factor, np.eye(h)), cho_solve(factor, K[:h, h:])
+    except LinAlgError:
+        K_hh_inv = pinvh(K[:h, :h])
+        return K_hh_inv, K_hh_inv.dot(K[:h, h:])
+
+
 def _penalized_nll(K, S=None, regularizer=None):
     res = - fast_logdet(K) + np.sum(K*S)
     res += np.linalg.norm(regularizer*K, 1)
@@ -291,15 +368,10 @@ def latent_missing_graphical_lasso(
     checks = []
     for iter_ in range(max_iter):
 
-        # expectation step
-        sigma = pinvh(K)
-        sigma_o_inv = pinvh(sigma[h:, h:])
-        sigma_ho = sigma[:h, h:]
-        sigma_oh = sigma[h:, :h]
-        emp_cov_H = (sigma[:h, :h] - sigma_ho.dot(sigma_o_inv).dot(sigma_oh) +
-                     np.linalg.multi_dot((sigma_ho, sigma_o_inv, emp_cov,
-                                          sigma_o_inv, sigma_oh)))
-        emp_cov_OH = emp_cov.dot(sigma_o_inv).dot(sigma_oh)
+        # expectation step, via the Schur complement of K_hh in K
+        K_hh_inv, coef = _latent_regression(K, h)
+        emp_cov_OH = -emp_cov.dot(coef.T)
+        emp_cov_H = K_hh_inv - coef.dot(emp_cov_OH)
         S = np.zeros_like(K)
         S[:h, :h] = emp_cov_H
         S[:h, h:] = emp_cov_OH.T
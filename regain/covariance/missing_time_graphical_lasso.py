@@ -40,7 +40,9 @@ from sklearn.covariance import empirical_covariance
 from sklearn.utils.validation import check_X_y
 
 from regain.covariance.missing_graphical_lasso_ import \
-        _compute_empirical_covariance, _compute_cs, _compute_mean
+        _compute_empirical_covariance, _compute_cs, _compute_mean, \
+        _missing_patterns, _missing_inverses, _inexact_tol, _n_inexact, \
+        _latent_regression
 from regain.covariance.kernel_time_graphical_lasso_ import \
                 kernel_time_graphical_lasso, KernelTimeGraphicalLasso
 from regain.covariance.time_graphical_lasso_ import loss
@@ -116,27 +118,39 @@ def missing_time_graphical_lasso(
     K = np.zeros((n_times, d, d))
     means = np.zeros((n_times, d))
 
+    patterns = [_missing_patterns(X[t]) for t in range(n_times)]
+
     loglik = -np.inf
     checks = []
+    state = None
     for iter_ in range(max_iter):
         old_logl = loglik
 
-        cs = np.array([_compute_cs(means[t, :], K[t, :, :], X[t, :, :])
+        inverses = [_missing_inverses(K[t], patterns[t])
+                    for t in range(n_times)]
+        cs = np.array([_compute_cs(means[t, :], K[t, :, :], X[t, :, :],
+                                   patterns[t], inverses[t])
                        for t in range(n_times)])
         means = np.array([_compute_mean(X[t, :, :], cs[t, :, :])
                           for t in range(n_times)])
         emp_cov = np.array([
                     _compute_empirical_covariance(X[t, :, :], K[t, :, :],
-                                                  cs[t, :, :])
+                                                  cs[t, :, :], patterns[t],
+                                                  inverses[t])
                     for t in range(n_times)
                     ])
-        K = kernel_time_graphical_lasso(
+
+        # inexact M step, resuming the previous one
+        inner_tol = _inexact_tol(tol, iter_)
+        out = kernel_time_graphical_lasso(
                 emp_cov, alpha=alpha, rho=rho, kernel=kernel,
                 max_iter=max_iter, verbose=max(0, verbose-1),
-                psi=psi, tol=tol, rtol=tol,
+                psi=psi, tol=inner_tol, rtol=inner_tol,
                 return_history=False, return_n_iter=True, mode='admm',
                 update_rho_options=None, compute_objective=False, stop_at=None,
-                stop_when=1e-4, init='empirical')[0]
+                stop_when=1e-4, init='empirical',
+                compute_covariance=False, warm_start=state, return_state=True)
+        K, state = out[0], out[-1]
 
         loglik = loss(emp_cov, K)
         diff = old_logl - loglik
@@ -146,7 +160,7 @@ def missing_time_graphical_lasso(
         if verbose:
             print("Iter %d: log-likelihood %.4f, difference: %.4f" % (
                     iter_, loglik, diff))
-        if iter_ > 1 and diff < tol:
+        if iter_ > 1 and diff < tol and iter_ >= _n_inexact():
             break
     else:
         warnings.warn("The Missing Graphical Lasso algorithm did not converge")
@@ -207,6 +221,7 @@ def latent_missing_time_graphical_lasso(
     Ss = np.zeros((emp_cov.shape[0], h+o, h+o))
     Ks_prev = None
     likelihoods = []
+    state = None
     for iter_ in range(max_iter):
 
         # expectation step
@@ -218,23 +233,27 @@ def latent_missing_time_graphical_lasso(
                 K[h:, :h] = M
 
             S = np.zeros_like(K)
-            K_inv = np.linalg.pinv(K[:h, :h])
-            S[:h, :h] = K_inv + K_inv.dot(K[:h, h:]).dot(
-                            emp_cov[i]).dot(K[h:, :h]).dot(K_inv)
-            S[:h, h:] = K_inv.dot(K[:h, h:].dot(emp_cov[i]))
+            K_inv, coef = _latent_regression(K, h)
+            S[:h, h:] = coef.dot(emp_cov[i])
+            S[:h, :h] = K_inv + S[:h, h:].dot(coef.T)
             S[h:, :h] = S[:h, h:].T
             S[h:, h:] = emp_cov[i]
 
             Ss_.append(S)
 
         Ss = np.array(Ss_)
-        Ks = kernel_time_graphical_lasso(
+
+        # inexact M step, resuming the previous one
+        inner_tol = _inexact_tol(tol, iter_)
+        out = kernel_time_graphical_lasso(
                 Ss, alpha=alpha, rho=rho, kernel=kernel,
                 max_iter=max_iter, verbose=max(0, verbose-1),
-                psi=psi, tol=tol, rtol=tol,
+                psi=psi, tol=inner_tol, rtol=inner_tol,
                 return_history=False, return_n_iter=True, mode='admm',
                 update_rho_options=None, compute_objective=False, stop_at=None,
-                stop_when=1e-4, init='empirical')[0]
+                stop_when=1e-4, init='empirical',
+                compute_covariance=False, warm_start=state, return_state=True)
+        Ks, state = out[0], out[-1]
 
         penalized_nll_old = penalized_nll
         penalized_nll = objective(Ks, Ss, n_samples, regularizer, beta,
@@ -245,14 +264,13 @@ def latent_missing_time_graphical_lasso(
                             e_pri=None, e_dual=None)
 
         checks.append(check)
-        thetas = [k[h:, h:] -
-                  k[h:, :h].dot(np.linalg.pinv(k[:h, :h])).dot(k[:h, h:])
+        thetas = [k[h:, h:] - k[h:, :h].dot(_latent_regression(k, h)[1])
                   for k in Ks]
         likelihoods.append(log_likelihood_t(emp_cov, thetas))
         if verbose:
             print("iter: %d, NLL: %.6f , NLL_diff: %.6f" %
                   (iter_, check[0], check[2]))
-        if iter_ > 2:
+        if iter_ > 2 and iter_ >= _n_inexact():
             if np.abs(check[2]) < tol:
                 break
             if check[2] < 0 and checks[-2][2] > 0:
@@ -398,6 +416,7 @@ class TwoLayersTimeGraphicalLasso(LatentMissingGraphicalLasso,
                             assume_centered=self.assume_centered)
                             for cl in self.classes_])
 
+        self.n_latent_ = self.h if self.mask is None else self.mask.shape[1]
         self.precision_, _, self.n_iter_ = latent_missing_time_graphical_lasso(
                 emp_cov, h=self.h, alpha=self.alpha, M=self.mask, mu=self.mu,
                 eta=self.eta, beta=self.beta, psi=self.psi, kernel=self.kernel,
@@ -413,9 +432,9 @@ class TwoLayersTimeGraphicalLasso(LatentMissingGraphicalLasso,
         precision = []
         for p in self.precision_:
             obs = p[self.n_latent_:, self.n_latent_:]
-            lat = p[:self.n_latent_, :self.n_latent_]
             inter = p[:self.n_latent_, self.n_latent_:]
-            precision.append(obs - inter.T.dot(np.linalg.pinv(lat)).dot(inter))
+            precision.append(
+                obs - inter.T.dot(_latent_regression(p, self.n_latent_)[1]))
         return np.array(precision)
 
     def score(self, X, y):
@@ -40,29 +40,39 @@ import numpy as np
 from scipy import linalg
 from six.moves import map, range, zip
 from sklearn.covariance import empirical_covariance, log_likelihood
-from sklearn.utils.extmath import squared_norm
+from sklearn.utils.extmath import fast_logdet, squared_norm
 from sklearn.utils.validation import check_X_y
 
-from regain.covariance.graphical_lasso_ import GraphicalLasso, logl
+from regain.covariance.graphical_lasso_ import GraphicalLasso
+from regain.covariance.graphical_lasso_ import init_precision as \
+    init_precision_2d
+from regain.covariance.graphical_lasso_ import logl
 from regain.norm import l1_od_norm
 from regain.prox import prox_logdet, soft_thresholding
 from regain.update_rules import update_rho
-from regain.utils import convergence, error_norm_time
+from regain.utils import (
+    PackedSymmetric, batch_pinvh, convergence, error_norm_time)
 from regain.validation import check_norm_prox
 
 
-def loss(S, K, n_samples=None):
-    """Loss function for time-varying graphical lasso."""
+def loss(S, K, n_samples=None, eigvals=None):
+    """Loss function for time-varying graphical lasso.
+
+    If the eigenvalues of each K are given, they are used to compute the
+    log-determinants.
+    """
     if n_samples is None:
         n_samples = np.ones(S.shape[0])
+    if eigvals is None:
+        eigvals = [None] * S.shape[0]
     return sum(
-        -ni * logl(emp_cov, precision)
-        for emp_cov, precision, ni in zip(S, K, n_samples))
+        -ni * logl(emp_cov, precision, eigvals=e)
+        for emp_cov, precision, ni, e in zip(S, K, n_samples, eigvals))
 
 
-def objective(n_samples, S, K, Z_0, Z_1, Z_2, alpha, beta, psi):
+def objective(n_samples, S, K, Z_0, Z_1, Z_2, alpha, beta, psi, eigvals=None):
     """Objective function for time-varying graphical lasso."""
-    obj = loss(S, K, n_samples=n_samples)
+    obj = loss(S, K, n_samples=n_samples, eigvals=eigvals)
 
     if isinstance(alpha, np.ndarray):
         obj += sum(l1_od_norm(a * z) for a, z in zip(alpha, Z_0))
@@ -100,7 +110,8 @@ def time_graphical_lasso(
         verbose=False, psi='laplacian', tol=1e-4, rtol=1e-4,
         return_history=False, return_n_iter=True, mode='admm',
         compute_objective=True, stop_at=None, stop_when=1e-4,
-        update_rho_options=None, init='empirical'):
+        update_rho_options=None, init='empirical', compact=False,
+        compute_covariance=True):
     """Time-varying graphical lasso solver.
 
     Solves the following problem via ADMM:
@@ -137,9 +148,25 @@ def time_graphical_lasso(
         See regain.update_rules.update_rho function for more information.
     compute_objective : bool, default True
         Choose to compute the objective value.
+    stop_at : float, optional
+        Stop when the objective is within a relative `stop_when` of this
+        value. The objective is then evaluated with the likelihood at Z_0 and
+        the penalty at K, otherwise with the likelihood at K and the penalty
+        at Z_0, which reuses the eigenvalues of K.
+    stop_when : float, default 1e-4
+        Relative tolerance for `stop_at`.
     init : {'empirical', 'zero', ndarray}
         Choose how to initialize the precision matrix, with the inverse
         empirical covariance, zero matrix or precomputed.
+    compact : bool, default False
+        Store the ADMM variables as the upper triangle of each symmetric
+        matrix and do not keep copies of the previous iterate.
+        This roughly divides by three the memory required by the solver, but
+        it is only available for psi in {'laplacian', 'l1'}, whose prox
+        preserves symmetry.
+    compute_covariance : bool, default True
+        Choose to compute the covariance matrices, i.e. the inverse of the
+        solution. If False, None is returned in their place.
 
     Returns
     -------
@@ -151,6 +178,19 @@ def time_graphical_lasso(
         for the primal and dual residual norms at each iteration.
 
     """
+    if n_samples is None:
+        n_samples = np.ones(emp_cov.shape[0])
+
+    if compact:
+        return _time_graphical_lasso_compact(
+            emp_cov, alpha=alpha, rho=rho, beta=beta, max_iter=max_iter,
+            n_samples=n_samples, verbose=verbose, psi=psi, tol=tol,
+            rtol=rtol, return_history=return_history,
+            return_n_iter=return_n_iter, compute_objective=compute_objective,
+            stop_at=stop_at, stop_when=stop_when,
+            update_rho_options=update_rho_options, init=init,
+            compute_covariance=compute_covariance)
+
     psi, prox_psi, psi_node_penalty = check_norm_prox(psi)
 
     Z_0 = init_precision(emp_cov, mode=init)
@@ -170,9 +210,6 @@ def time_graphical_lasso(
     divisor[0] -= 1
     divisor[-1] -= 1
 
-    if n_samples is None:
-        n_samples = np.ones(emp_cov.shape[0])
-
     checks = [
         convergence(
             obj=objective(
@@ -192,11 +229,11 @@ def time_graphical_lasso(
         A *= -rho * divisor[:, None, None] / n_samples[:, None, None]
         A += emp_cov
 
-        K = np.array(
-            [
-                prox_logdet(a, lamda=ni / (rho * div))
-                for a, div, ni in zip(A, divisor, n_samples)
-            ])
+        K = np.empty_like(A)
+        K_eigvals = np.empty(A.shape[:2])
+        for t, (a, div, ni) in enumerate(zip(A, divisor, n_samples)):
+            K[t], K_eigvals[t] = prox_logdet(
+                a, lamda=ni / (rho * div), return_eigen=True)
 
         # update Z_0
         A = K + U_0
@@ -230,9 +267,16 @@ def time_graphical_lasso(
             squared_norm(Z_0 - Z_0_old) + squared_norm(Z_1 - Z_1_old) +
             squared_norm(Z_2 - Z_2_old))
 
-        obj = objective(
-            n_samples, emp_cov, Z_0, K, Z_1, Z_2, alpha, beta, psi) \
-            if compute_objective else np.nan
+        if not compute_objective:
+            obj = np.nan
+        elif stop_at is None:
+            obj = objective(
+                n_samples, emp_cov, K, Z_0, Z_1, Z_2, alpha, beta, psi,
+                eigvals=K_eigvals)
+        else:
+            # likelihood at Z_0 and penalty at K, as stop_at expects
+            obj = objective(
+                n_samples, emp_cov, Z_0, K, Z_1, Z_2, alpha, beta, psi)
 
         # if np.isinf(obj):
         #     Z_0 = Z_0_old
@@ -282,7 +326,197 @@ def time_graphical_lasso(
     else:
         warnings.warn("Objective did not converge.")
 
-    covariance_ = np.array([linalg.pinvh(x) for x in Z_0])
+    covariance_ = batch_pinvh(Z_0) if compute_covariance else None
+    return_list = [Z_0, covariance_]
+    if return_history:
+        return_list.append(checks)
+    if return_n_iter:
+        return_list.append(iteration_ + 1)
+    return return_list
+
+
+def _time_graphical_lasso_compact(
+        emp_cov, alpha, rho, beta, max_iter, n_samples, verbose, psi, tol,
+        rtol, return_history, return_n_iter, compute_objective, stop_at,
+        stop_when, update_rho_options, init, compute_covariance):
+    """Time-varying graphical lasso on packed symmetric matrices.
+
+    Same iterations as `time_graphical_lasso`, but each variable is a
+    `PackedSymmetric` stack, which only stores the d(d+1)/2 entries of the
+    upper triangle of each matrix. The dual
+    residual is accumulated while the consensus variables are overwritten,
+    so no copy of the previous iterate is kept, and residuals are computed
+    in two preallocated buffers.
+
+    """
+    if psi not in ('laplacian', 'l1'):
+        raise ValueError(
+            "Compact storage is only available for psi in "
+            "{'laplacian', 'l1'}, got %r." % (psi,))
+    _, prox_psi, _ = check_norm_prox(psi)
+
+    n_times, _, n_features = emp_cov.shape
+
+    def update(Z, Z_new):
+        # overwrite Z and return the squared norm of its change
+        Z -= Z_new
+        change = Z.squared_norm()
+        Z[...] = Z_new
+        return change
+
+    def pack_param(x):
+        if not isinstance(x, np.ndarray):
+            return x
+        return PackedSymmetric.from_dense(
+            np.broadcast_to(x, (x.shape[0], n_features, n_features)))
+
+    alpha, beta = pack_param(alpha), pack_param(beta)
+    n_samples = np.asarray(n_samples, dtype=float)
+
+    def objective_compact(K, Z_0, Z_1, Z_2, eigvals=None):
+        logdets = np.array([fast_logdet(k.to_dense()) for k in K]) \
+            if eigvals is None else np.log(eigvals).sum(axis=1)
+        obj = np.sum(-n_samples * (logdets - S.inner(K)))
+        obj += (alpha * Z_0).l1_norm(off_diagonal=True)
+        E = Z_2 - Z_1
+        psi_E = E.squared_norm(per_matrix=True) if psi == 'laplacian' \
+            else E.l1_norm(per_matrix=True)
+        if isinstance(beta, PackedSymmetric):
+            obj += np.dot(psi_E, beta.data[:, 0])
+        else:
+            obj += beta * np.sum(psi_E)
+        return obj
+
+    def zeros(n):
+        return PackedSymmetric(
+            np.zeros((n, n_features * (n_features + 1) // 2)), n_features)
+
+    S = PackedSymmetric.from_dense(emp_cov)
+    if isinstance(init, np.ndarray):
+        Z_0 = PackedSymmetric.from_dense(init)
+    else:
+        # initialise one slice at a time to avoid dense temporaries
+        Z_0 = zeros(n_times)
+        for t, e in enumerate(emp_cov):
+            Z_0[t] = init_precision_2d(e, mode=init)
+    Z_1 = Z_0[:-1].copy()
+    Z_2 = Z_0[1:].copy()
+
+    U_0 = zeros(n_times)
+    U_1 = zeros(n_times - 1)
+    U_2 = zeros(n_times - 1)
+
+    K = zeros(n_times)
+    K_eigvals = np.empty((n_times, n_features))
+    # buffers for prox arguments and residuals
+    A = zeros(n_times)
+    R = zeros(n_times)
+
+    # divisor for consensus variables, accounting for two less matrices
+    divisor = np.full(n_times, 3, dtype=float)
+    divisor[0] -= 1
+    divisor[-1] -= 1
+
+    size = (3 * n_times - 2) * n_features ** 2
+    checks = [
+        convergence(obj=objective_compact(Z_0, Z_0, Z_1, Z_2))
+    ]
+    for iteration_ in range(max_iter):
+        # update K
+        np.subtract(Z_0, U_0, out=A)
+        A[:-1] += Z_1
+        A[:-1] -= U_1
+        A[1:] += Z_2
+        A[1:] -= U_2
+        A *= -rho / n_samples[:, None]
+        A += S
+
+        for t, (div, ni) in enumerate(zip(divisor, n_samples)):
+            K[t], K_eigvals[t] = prox_logdet(
+                A[t].to_dense(), lamda=ni / (rho * div), return_eigen=True)
+
+        # update Z_0, soft thresholding in place
+        np.add(K, U_0, out=A)
+        np.abs(A, out=R)
+        R -= alpha / rho
+        np.maximum(R, 0, out=R)
+        R *= np.sign(A)
+        snorm = update(Z_0, R)
+
+        # other Zs
+        A_1 = np.add(K[:-1], U_1, out=A[:-1])
+        A_2 = np.add(K[1:], U_2, out=R[1:])
+        A_2 -= A_1
+        prox_e = prox_psi(A_2, lamda=2. * beta / rho)
+        prox_e *= .5
+        # A_1 becomes the mean of the two arguments
+        A_2 *= .5
+        A_1 += A_2
+        snorm += update(Z_1, np.subtract(A_1, prox_e, out=A_2))
+        snorm += update(Z_2, np.add(A_1, prox_e, out=A_2))
+        snorm = rho * np.sqrt(snorm)
+
+        # update residuals
+        rnorm = np.subtract(K, Z_0, out=R).squared_norm()
+        U_0 += R
+        rnorm += np.subtract(K[:-1], Z_1, out=R[:-1]).squared_norm()
+        U_1 += R[:-1]
+        rnorm += np.subtract(K[1:], Z_2, out=R[1:]).squared_norm()
+        U_2 += R[1:]
+        rnorm = np.sqrt(rnorm)
+
+        # diagnostics, reporting, termination checks
+        if not compute_objective:
+            obj = np.nan
+        elif stop_at is None:
+            obj = objective_compact(K, Z_0, Z_1, Z_2, eigvals=K_eigvals)
+        else:
+            # likelihood at Z_0 and penalty at K, as stop_at expects
+            obj = objective_compact(Z_0, K, Z_1, Z_2)
+
+        check = convergence(
+            obj=obj,
+            rnorm=rnorm,
+            snorm=snorm,
+            e_pri=np.sqrt(size) * tol + rtol * max(
+                np.sqrt(
+                    Z_0.squared_norm() + Z_1.squared_norm() +
+                    Z_2.squared_norm()),
+                np.sqrt(
+                    K.squared_norm() + K[:-1].squared_norm() +
+                    K[1:].squared_norm())),
+            e_dual=np.sqrt(size) * tol + rtol * rho * np.sqrt(
+                U_0.squared_norm() + U_1.squared_norm() +
+                U_2.squared_norm()),
+        )
+
+        if verbose:
+            print(
+                "obj: %.4f, rnorm: %.4f, snorm: %.4f,"
+                "eps_pri: %.4f, eps_dual: %.4f" % check[:5])
+
+        checks.append(check)
+        if stop_at is not None:
+            if abs(check.obj - stop_at) / abs(stop_at) < stop_when:
+                break
+
+        if check.rnorm <= check.e_pri and check.snorm <= check.e_dual:
+            break
+
+        rho_new = update_rho(
+            rho, rnorm, snorm, iteration=iteration_,
+            **(update_rho_options or {}))
+        # scaled dual variables should be also rescaled
+        U_0 *= rho / rho_new
+        U_1 *= rho / rho_new
+        U_2 *= rho / rho_new
+        rho = rho_new
+    else:
+        warnings.warn("Objective did not converge.")
+
+    del K, U_0, U_1, U_2, Z_1, Z_2, A, R
+    Z_0 = Z_0.to_dense()
+    covariance_ = batch_pinvh(Z_0) if compute_covariance else None
     return_list = [Z_0, covariance_]
     if return_history:
         return_list.append(checks)
@@ -348,10 +582,16 @@ class TimeGraphicalLasso(GraphicalLasso):
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
 
+    compact : boolean, default False
+        Store only the upper triangle of the symmetric matrices during the
+        optimisation, to reduce memory usage.
+        Only available for psi in {'laplacian', 'l1'}.
+
     Attributes
     ----------
     covariance_ : array-like, shape (n_times, n_features, n_features)
-        Estimated covariance matrix
+        Estimated covariance matrix. It is computed from `precision_` the
+        first time it is accessed.
 
     precision_ : array-like, shape (n_times, n_features, n_features)
         Estimated precision matrix.
@@ -366,7 +606,8 @@ class TimeGraphicalLasso(GraphicalLasso):
             rtol=1e-4, psi='laplacian', max_iter=100, verbose=False,
             assume_centered=False, return_history=False,
             update_rho_options=None, compute_objective=True, stop_at=None,
-            stop_when=1e-4, suppress_warn_list=False, init='empirical'):
+            stop_when=1e-4, suppress_warn_list=False, init='empirical',
+            compact=False):
         super(TimeGraphicalLasso, self).__init__(
             alpha=alpha, rho=rho, tol=tol, rtol=rtol, max_iter=max_iter,
             verbose=verbose, assume_centered=assume_centered, mode=mode,
@@ -378,6 +619,7 @@ class TimeGraphicalLasso(GraphicalLasso):
         self.stop_at = stop_at
         self.stop_when = stop_when
         self.suppress_warn_list = suppress_warn_list
+        self.compact = compact
 
     def get_observed_precision(self):
         """Getter for the observed precision matrix.
@@ -407,7 +649,8 @@ class TimeGraphicalLasso(GraphicalLasso):
             return_n_iter=True, return_history=self.return_history,
             update_rho_options=self.update_rho_options,
             compute_objective=self.compute_objective, stop_at=self.stop_at,
-            stop_when=self.stop_when, init=self.init)
+            stop_when=self.stop_when, init=self.init, compact=self.compact,
+            compute_covariance=False)
         if self.return_history:
             self.precision_, self.covariance_, self.history_, self.n_iter_ = \
                 out
@@ -34,6 +34,7 @@ import warnings
 from functools import partial
 
 import numpy as np
+from numpy.linalg.linalg import LinAlgError
 from scipy import linalg
 from six.moves import map, range, zip
 from sklearn.covariance import empirical_covariance, log_likelihood
@@ -42,7 +43,7 @@ from regain.covariance.time_graphical_lasso_ import TimeGraphicalLasso, init_pre
 from regain.covariance.time_graphical_lasso_ import loss as loss_tgl
 from regain.norm import l1_od_norm, vector_p_norm
 from regain.prox import prox_FL
-from regain.utils import convergence, positive_definite
+from regain.utils import batch_pinvh, convergence, positive_definite
 from regain.validation import check_input
 
 
@@ -53,6 +54,29 @@ def loss(S, K, n_samples=None, vareps=0):
     return loss_
 
 
+def _loss_cholesky(x, emp_cov, n_samples, vareps=0):
+    """Loss function, together with the Cholesky factors of x.
+
+    The log-determinants are read from the factors, which can then be reused
+    for the inverse of x. If x is not positive definite the loss is infinite
+    and the factors are None, so that line searches reject x early.
+    """
+    try:
+        chol = np.linalg.cholesky(x)
+    except LinAlgError:
+        return np.inf, None
+    logdets = 2 * np.sum(np.log(np.diagonal(chol, axis1=1, axis2=2)), axis=1)
+    loss_ = np.dot(n_samples, np.sum(emp_cov * x, axis=(1, 2)) - logdets)
+    loss_ += vareps / 2. * _scalar_product(x, x)
+    return loss_, chol
+
+
+def _cholesky_inverse(chol):
+    """Inverse of each slice, given the Cholesky factors."""
+    identity = np.eye(chol.shape[1])
+    return np.array([linalg.cho_solve((c, True), identity) for c in chol])
+
+
 def grad_loss(x, emp_cov, n_samples, x_inv=None, vareps=0):
     """Gradient of the loss function for the time-varying graphical lasso."""
     if x_inv is None:
@@ -105,9 +129,13 @@ def _scalar_product(x, y):
 
 def choose_gamma(
         gamma, x, emp_cov, n_samples, beta, alpha, lamda, grad, delta=1e-4,
-        eps=0.5, max_iter=1000, p=1, x_inv=None, vareps=1e-5, choose='gamma'):
+        eps=0.5, max_iter=1000, p=1, x_inv=None, vareps=1e-5, choose='gamma',
+        fx=None, return_loss=False):
     """Choose gamma for backtracking.
 
+    If `return_loss`, also return the loss and the Cholesky factors of the
+    accepted point `x + lamda * (prox - x)` (None if not available).
+
     References
     ----------
     Salzo S. (2017). https://doi.org/10.1137/16M1073741
@@ -116,8 +144,9 @@ def choose_gamma(
     # if grad is None:
     #     grad = grad_loss(x, emp_cov, n_samples, x_inv=x_inv)
 
-    partial_f = partial(loss, n_samples=n_samples, S=emp_cov, vareps=vareps)
-    fx = partial_f(K=x)
+    if fx is None:
+        fx = _loss_cholesky(x, emp_cov, n_samples, vareps=vareps)[0]
+    fy, chol = np.inf, None
     for i in range(max_iter):
         prox = prox_FL(
             x - gamma * grad, beta * gamma, alpha * gamma, p=p, symmetric=True)
@@ -126,23 +155,32 @@ def choose_gamma(
 
         if choose == "gamma":
             y_minus_x = prox - x
-            loss_diff = partial_f(K=x + lamda * y_minus_x) - fx
-
-            tolerance = _scalar_product(y_minus_x, grad)
-            tolerance += delta / gamma * _scalar_product(y_minus_x, y_minus_x)
-            if loss_diff <= lamda * tolerance:
-                break
+            fy, chol = _loss_cholesky(
+                x + lamda * y_minus_x, emp_cov, n_samples, vareps=vareps)
+            if chol is not None:
+                tolerance = _scalar_product(y_minus_x, grad)
+                tolerance += delta / gamma * _scalar_product(
+                    y_minus_x, y_minus_x)
+                if fy - fx <= lamda * tolerance:
+                    break
         gamma *= eps
+    else:
+        fy, chol = np.inf, None
 
+    if return_loss:
+        return gamma, prox, fy, chol
     return gamma, prox
 
 
 def choose_lamda(
         lamda, x, emp_cov, n_samples, beta, alpha, gamma, delta=1e-4, eps=0.5,
         max_iter=1000, criterion='b', p=1, x_inv=None, grad=None, prox=None,
-        min_eigen_x=None, vareps=1e-5):
+        min_eigen_x=None, vareps=1e-5, fx=None, return_loss=False):
     """Choose lambda for backtracking.
 
+    If `return_loss`, also return the loss and the Cholesky factors of the
+    accepted point (None if not available).
+
     References
     ----------
     Salzo S. (2017). https://doi.org/10.1137/16M1073741
@@ -155,8 +193,9 @@ def choose_lamda(
     # if prox is None:
     #     prox = prox_FL(x - gamma * grad, beta * gamma, alpha * gamma, p=p, symmetric=True)
 
-    partial_f = partial(loss, n_samples=n_samples, S=emp_cov, vareps=vareps)
-    fx = partial_f(K=x)
+    if fx is None:
+        fx = _loss_cholesky(x, emp_cov, n_samples, vareps=vareps)[0]
+    fy, chol = np.inf, None
 
     # min_eigen_y = np.min([np.linalg.eigh(z)[0] for z in prox])
 
@@ -186,8 +225,9 @@ def choose_lamda(
             if norm_grad_diff <= tolerance:
                 break
         elif criterion == 'b':
-            loss_diff = partial_f(K=x1) - fx
-            if loss_diff <= lamda * tolerance and positive_definite(x1):
+            # a failed factorisation rejects x1 without computing the loss
+            fy, chol = _loss_cholesky(x1, emp_cov, n_samples, vareps=vareps)
+            if chol is not None and fy - fx <= lamda * tolerance:
                 break
         elif criterion == 'c':
             obj_diff = objective(
@@ -201,6 +241,11 @@ def choose_lamda(
         else:
             raise ValueError(criterion)
         lamda *= eps
+    else:
+        fy, chol = np.inf, None
+
+    if return_loss:
+        return lamda, i + 1, fy, chol
     return lamda, i + 1
 
 
@@ -223,7 +268,8 @@ def time_graph_lasso(
         return_history=False, return_n_iter=True, choose='gamma',
         lamda_criterion='b', time_norm=1, compute_objective=True,
         return_n_linesearch=False, vareps=1e-5, stop_at=None, stop_when=1e-4,
-        init='empirical'):
+        init='empirical', compute_covariance=True, mode='fb',
+        restart='gradient'):
     """Time-varying graphical lasso solver.
 
     Solves the following problem via ADMM:
@@ -250,6 +296,21 @@ def time_graph_lasso(
         Relative tolerance for convergence.
     return_history : bool, optional
         Return the history of computed values.
+    compute_covariance : bool, default True
+        Choose to compute the covariance matrices, i.e. the inverse of the
+        solution. If False, None is returned in their place.
+    mode : {'fb', 'fista'}, default 'fb'
+        Minimisation algorithm. 'fb' takes (relaxed) forward-backward
+        steps from the current point, while 'fista' takes them from an
+        extrapolated point, as in the accelerated method by Beck and
+        Teboulle (2009). Extrapolated points which are not positive definite
+        are discarded by restarting.
+    restart : {'gradient', 'function'}, default 'gradient'
+        Adaptive restart scheme for 'fista' (O'Donoghue and Candes, 2015).
+        With 'gradient', the momentum is reset when the gradient mapping at
+        the extrapolated point, `V - K`, has a positive scalar product with
+        the last step `K - k_previous`; with 'function', when the objective
+        increases.
 
     Returns
     -------
@@ -265,6 +326,11 @@ def time_graph_lasso(
     if choose not in available_choose:
         raise ValueError(
             "`choose` parameter must be one of %s." % available_choose)
+    if mode not in ('fb', 'fista'):
+        raise ValueError("`mode` parameter must be one of ('fb', 'fista').")
+    if restart not in ('gradient', 'function'):
+        raise ValueError(
+            "`restart` parameter must be one of ('gradient', 'function').")
 
     n_times, _, n_features = emp_cov.shape
 
@@ -274,20 +340,31 @@ def time_graph_lasso(
     # Y = K.copy()
     # assert positive_definite(K)
 
-    obj_partial = partial(
-        objective, n_samples=n_samples, emp_cov=emp_cov, alpha=alpha,
-        beta=beta, psi=partial(vector_p_norm, p=time_norm), vareps=vareps)
+    penalty_partial = partial(
+        penalty, alpha=alpha, beta=beta,
+        psi=partial(vector_p_norm, p=time_norm))
+
+    # loss and Cholesky factors of the current point, which are reused for
+    # its inverse and updated with the ones computed by the line searches
+    fx, chol = _loss_cholesky(K, emp_cov, n_samples, vareps=vareps)
+    obj = fx + penalty_partial(K)
+
+    # point from which the step is taken, extrapolated in fista mode
+    V, fv, chol_v = K, fx, chol
+    t = 1.
 
     max_residual = -np.inf
     n_linesearch = 0
-    checks = [convergence(obj=obj_partial(precision=K))]
+    checks = [convergence(obj=obj)]
     for iteration_ in range(max_iter):
         # if not positive_definite(K):
         #     print("precision is not positive definite.")
         #     # break
 
         k_previous = K.copy()
-        x_inv = np.array([linalg.pinvh(x) for x in K])
+        obj_previous = obj
+        x_inv = np.array([linalg.pinvh(x) for x in V]) if chol_v is None \
+            else _cholesky_inverse(chol_v)
         # x_inv = []
         # eigens = []
         # for x in K:
@@ -298,25 +375,27 @@ def time_graph_lasso(
         # x_inv = np.array(x_inv)
         # eigens = np.array(eigens)
 
-        grad = grad_loss(K, emp_cov, n_samples, x_inv=x_inv, vareps=vareps)
+        grad = grad_loss(V, emp_cov, n_samples, x_inv=x_inv, vareps=vareps)
+        fy, chol = np.inf, None
         if choose in ['gamma', 'both']:
-            gamma, y = choose_gamma(
-                gamma / eps if iteration_ > 0 else gamma, K, emp_cov,
+            gamma, y, fy, chol = choose_gamma(
+                gamma / eps if iteration_ > 0 else gamma, V, emp_cov,
                 n_samples=n_samples, beta=beta, alpha=alpha, lamda=lamda,
                 grad=grad, delta=delta, eps=eps, max_iter=200, p=time_norm,
-                x_inv=x_inv, vareps=vareps, choose=choose)
+                x_inv=x_inv, vareps=vareps, choose=choose, fx=fv,
+                return_loss=True)
         # print(gamma)
 
-        x_hat = K - gamma * grad
+        x_hat = V - gamma * grad
         if choose not in ['gamma', 'both']:
             y = prox_FL(
                 x_hat, beta * gamma, alpha * gamma, p=time_norm,
                 symmetric=True)
 
         if choose in ['lamda', 'both']:
-            lamda, n_ls = choose_lamda(
+            lamda, n_ls, fy, chol = choose_lamda(
                 min(lamda / eps if iteration_ > 0 else lamda, 1),
-                K,
+                V,
                 emp_cov,
                 n_samples=n_samples,
                 beta=beta,
@@ -331,18 +410,39 @@ def time_graph_lasso(
                 grad=grad,
                 prox=y,
                 # min_eigen_x=np.min(eigens),
-                vareps=vareps)
+                vareps=vareps,
+                fx=fv,
+                return_loss=True)
             n_linesearch += n_ls
         # print ("lambda: ", lamda, n_ls)
 
-        K = K + min(max(lamda, 0), 1) * (y - K)
-        # K, t = fista_step(Y, Y - Y_old, t)
+        K = V + min(max(lamda, 0), 1) * (y - V)
+
+        if chol is None or not 0 <= lamda <= 1:
+            # the new point was not evaluated by the line search
+            fy, chol = _loss_cholesky(K, emp_cov, n_samples, vareps=vareps)
+        fx = fy
+        obj = fx + penalty_partial(K)
+
+        reset = True
+        if mode == 'fista':
+            if restart == 'gradient':
+                # the gradient mapping at V is proportional to V - K
+                reset = _scalar_product(V - K, K - k_previous) > 0
+            else:
+                reset = obj > obj_previous
+        if not reset:
+            V, t = fista_step(K, K - k_previous, t)
+            fv, chol_v = _loss_cholesky(V, emp_cov, n_samples, vareps=vareps)
+            # extrapolated points must be positive definite
+            reset = chol_v is None
+        if reset:
+            V, fv, chol_v, t = K, fx, chol, 1.
 
         check = convergence(
-            obj=obj_partial(precision=K),
+            obj=obj,
             rnorm=np.linalg.norm(upper_diag_3d(K) - upper_diag_3d(k_previous)),
-            snorm=np.linalg.norm(
-                obj_partial(precision=K) - obj_partial(precision=k_previous)),
+            snorm=np.linalg.norm(obj - obj_previous),
             e_pri=np.sqrt(upper_diag_3d(K).size) * tol + tol * max(
                 np.linalg.norm(upper_diag_3d(K)),
                 np.linalg.norm(upper_diag_3d(k_previous))),
@@ -395,9 +495,7 @@ def time_graph_lasso(
     else:
         warnings.warn("Objective did not converge.")
 
-    # for i in range(K.shape[0]):
-    #     covariance_[i] = linalg.pinvh(K[i])
-
+    covariance_ = batch_pinvh(K) if compute_covariance else None
     return_list = [K, covariance_]
     if return_history:
         return_list.append(checks)
@@ -461,9 +559,12 @@ class TimeGraphicalLassoForwardBackward(TimeGraphicalLasso):
         Choose if compute the objective function during iterations
         (only useful if `verbose=True`).
 
-    mode : {'admm'}, default 'admm'
-        Minimisation algorithm. At the moment, only 'admm' is available,
-        so this is ignored.
+    mode : {'fb', 'fista'}, default 'fb'
+        Minimisation algorithm. 'fista' accelerates the forward-backward
+        steps, with adaptive restart.
+
+    restart : {'gradient', 'function'}, default 'gradient'
+        Adaptive restart scheme, used if `mode='fista'`.
 
     Attributes
     ----------
@@ -484,11 +585,13 @@ class TimeGraphicalLassoForwardBackward(TimeGraphicalLasso):
             compute_objective=True, eps=0.5, choose='gamma', lamda=1,
             delta=1e-4, gamma=1., lamda_criterion='b', time_norm=1,
             return_history=False, debug=False, return_n_linesearch=False,
-            vareps=1e-5, stop_at=None, stop_when=1e-4, init='empirical'):
+            vareps=1e-5, stop_at=None, stop_when=1e-4, init='empirical',
+            mode='fb', restart='gradient'):
         super(TimeGraphicalLassoForwardBackward, self).__init__(
             alpha=alpha, tol=tol, max_iter=max_iter, verbose=verbose,
             assume_centered=assume_centered,
-            compute_objective=compute_objective, beta=beta, init=init)
+            compute_objective=compute_objective, beta=beta, init=init,
+            mode=mode)
         self.delta = delta
         self.gamma = gamma
         self.lamda_criterion = lamda_criterion
@@ -503,6 +606,7 @@ class TimeGraphicalLassoForwardBackward(TimeGraphicalLasso):
         self.stop_at = stop_at
         self.stop_when = stop_when
         self.time_on_axis = time_on_axis
+        self.restart = restart
 
     def _fit(self, emp_cov, n_samples):
         """Fit the TimeGraphLasso model to X.
@@ -526,7 +630,8 @@ class TimeGraphicalLassoForwardBackward(TimeGraphicalLasso):
             delta=self.delta, eps=self.eps, choose=self.choose,
             lamda=self.lamda, debug=self.debug,
             return_n_linesearch=self.return_n_linesearch, vareps=self.vareps,
-            stop_at=self.stop_at, stop_when=self.stop_when, init=self.init)
+            stop_at=self.stop_at, stop_when=self.stop_when, init=self.init,
+            compute_covariance=False, mode=self.mode, restart=self.restart)
 
         if self.return_history:
             if self.return_n_linesearch:
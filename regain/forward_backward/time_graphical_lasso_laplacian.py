@@ -5,24 +5,23 @@ import warnings
 from functools import partial
 
 import numpy as np
-from scipy import linalg
 from six.moves import map, range, zip
 from sklearn.covariance import empirical_covariance
 from sklearn.utils.extmath import squared_norm
 
-from regain.covariance.graph_lasso_ import logl
-from regain.covariance.time_graph_lasso_ import TimeGraphLasso
-from regain.norm import l1_od_norm, vector_p_norm
-from regain.prox import prox_FL, soft_thresholding, soft_thresholding_od
-from regain.utils import convergence, positive_definite
+from regain.covariance.time_graphical_lasso_ import TimeGraphicalLasso
+from regain.norm import vector_p_norm
+from regain.prox import prox_FL, soft_thresholding
+from regain.utils import batch_pinvh, convergence, positive_definite
 
 
 def loss(S, K, beta=0, n_samples=None, vareps=0):
     """Loss function for time-varying graphical lasso."""
     if n_samples is None:
         n_samples = np.ones(S.shape[0])
-    loss_ = sum(-ni * logl(emp_cov, precision)
-                for emp_cov, precision, ni in zip(S, K, n_samples))
+    sign, logdet = np.linalg.slogdet(K)
+    logdet[sign <= 0] = -np.inf
+    loss_ = np.dot(n_samples, np.sum(S * K, axis=(1, 2)) - logdet)
     # loss_ += vareps / 2. * squared_norm(K)
     loss_ += vareps / 2. * _scalar_product(K, K)
 
@@ -34,36 +33,38 @@ def loss(S, K, beta=0, n_samples=None, vareps=0):
 def grad_loss(x, emp_cov, beta=0, n_samples=None, x_inv=None, vareps=0):
     """Gradient of the loss function for the time-varying graphical lasso."""
     if x_inv is None:
-        x_inv = np.array([linalg.pinvh(_) for _ in x])
+        x_inv = batch_pinvh(x)
     grad = emp_cov - x_inv
     grad *= n_samples[:, None, None]
 
     # add coercitive term
     grad += vareps * x
 
-    aux = np.empty_like(x)
-    aux[0] = x[0] - x[1]
-    aux[-1] = x[-1] - x[-2]
-    for t in range(1, x.shape[0] - 1):
-        aux[t] = 2 * x[t] - x[t-1] - x[t+1]
-    aux *= 2 * beta
-    grad += aux
+    # temporal laplacian, i.e. 2 x[t] - x[t-1] - x[t+1] inside and
+    # one-sided differences at the boundaries
+    diff = x[1:] - x[:-1]
+    grad[:-1] -= 2 * beta * diff
+    grad[1:] += 2 * beta * diff
 
     return grad
 
 
 def penalty(precision, alpha):
     """Penalty for time-varying graphical lasso."""
+    l1_od = np.abs(precision).sum(axis=(1, 2)) - np.abs(
+        np.diagonal(precision, axis1=1, axis2=2)).sum(axis=1)
     if isinstance(alpha, np.ndarray):
-        obj = sum(a[0][0] * m for a, m in zip(alpha, map(l1_od_norm, precision)))
+        obj = np.dot(alpha[:, 0, 0], l1_od)
     else:
-        obj = alpha * sum(map(l1_od_norm, precision))
+        obj = alpha * np.sum(l1_od)
     # obj += beta * psi(precision[1:] - precision[:-1])
     return obj
 
 def prox_penalty(precision, alpha):
-    # return soft_thresholding(precision, alpha)
-    return np.array([soft_thresholding_od(p, alpha) for p in precision])
+    prox = soft_thresholding(precision, alpha)
+    diagonal = np.arange(precision.shape[1])
+    prox[:, diagonal, diagonal] = precision[:, diagonal, diagonal]
+    return prox
 
 
 def objective(n_samples, emp_cov, precision, alpha, beta, vareps=0):
@@ -196,7 +197,8 @@ def time_graph_lasso(
         tol=1e-4, delta=1e-4, gamma=1., lamda=1., eps=0.5, debug=False,
         return_history=False, return_n_iter=True, choose='gamma',
         lamda_criterion='b', time_norm=1, compute_objective=True,
-        return_n_linesearch=False, vareps=1e-5, stop_at=None, stop_when=1e-4):
+        return_n_linesearch=False, vareps=1e-5, stop_at=None, stop_when=1e-4,
+        mode='fb', restart='gradient'):
     """Time-varying graphical lasso solver.
 
     Solves the following problem via ADMM:
@@ -223,6 +225,18 @@ def time_graph_lasso(
         Relative tolerance for convergence.
     return_history : bool, optional
         Return the history of computed values.
+    mode : {'fb', 'fista'}, default 'fb'
+        Minimisation algorithm. 'fb' takes (relaxed) forward-backward
+        steps from the current point, while 'fista' takes them from an
+        extrapolated point, as in the accelerated method by Beck and
+        Teboulle (2009). Extrapolated points which are not positive definite
+        are discarded by restarting.
+    restart : {'gradient', 'function'}, default 'gradient'
+        Adaptive restart scheme for 'fista' (O'Donoghue and Candes, 2015).
+        With 'gradient', the momentum is reset when the gradient mapping at
+        the extrapolated point, `V - K`, has a positive scalar product with
+        the last step `K - k_previous`; with 'function', when the objective
+        increases.
 
     Returns
     -------
@@ -238,15 +252,19 @@ def time_graph_lasso(
     if choose not in available_choose:
         raise ValueError("`choose` parameter must be one of %s." %
                          available_choose)
+    if mode not in ('fb', 'fista'):
+        raise ValueError("`mode` parameter must be one of ('fb', 'fista').")
+    if restart not in ('gradient', 'function'):
+        raise ValueError(
+            "`restart` parameter must be one of ('gradient', 'function').")
 
     n_times, _, n_features = emp_cov.shape
     covariance_ = emp_cov.copy()
     covariance_ *= 0.95
 
-    K = np.empty_like(emp_cov)
-    for i, (c, e) in enumerate(zip(covariance_, emp_cov)):
-        c.flat[::n_features + 1] = e.flat[::n_features + 1]
-        K[i] = linalg.pinvh(c)
+    diagonal = np.arange(n_features)
+    covariance_[:, diagonal, diagonal] = emp_cov[:, diagonal, diagonal]
+    K = batch_pinvh(covariance_)
 
     # K = np.array([np.eye(s.shape[0]) for s in emp_cov])
     # Y = K.copy()
@@ -256,16 +274,22 @@ def time_graph_lasso(
         objective, n_samples=n_samples, emp_cov=emp_cov,
         alpha=alpha, beta=beta, vareps=vareps)
 
+    # point from which the step is taken, extrapolated in fista mode
+    V = K
+    t = 1.
+
     max_residual = -np.inf
     n_linesearch = 0
-    checks = [convergence(obj=obj_partial(precision=K))]
+    obj = obj_partial(precision=K)
+    checks = [convergence(obj=obj)]
     for iteration_ in range(max_iter):
         # if not positive_definite(K):
         #     print("precision is not positive definite.")
         #     break
 
         k_previous = K.copy()
-        x_inv = np.array([linalg.pinvh(x) for x in K])
+        obj_previous = obj
+        x_inv = batch_pinvh(V)
         # x_inv = []
         # eigens = []
         # for x in K:
@@ -276,10 +300,10 @@ def time_graph_lasso(
         # x_inv = np.array(x_inv)
         # eigens = np.array(eigens)
 
-        grad = grad_loss(K, emp_cov, beta=beta, n_samples=n_samples, x_inv=x_inv, vareps=vareps)
+        grad = grad_loss(V, emp_cov, beta=beta, n_samples=n_samples, x_inv=x_inv, vareps=vareps)
         if choose in ['gamma', 'both']:
             gamma, y = choose_gamma(
-                gamma / eps if iteration_ > 0 else gamma, K, emp_cov,
+                gamma / eps if iteration_ > 0 else gamma, V, emp_cov,
                 n_samples=n_samples,
                 beta=beta, alpha=alpha, lamda=lamda, grad=grad,
                 delta=delta, eps=eps, max_iter=200, p=time_norm, x_inv=x_inv,
@@ -287,14 +311,14 @@ def time_graph_lasso(
             # gamma = min(gamma, 0.249)
         # print(gamma)
 
-        x_hat = K - gamma * grad
+        x_hat = V - gamma * grad
         if choose not in ['gamma', 'both']:
             y = prox_penalty(x_hat, alpha * gamma)
 
         if choose in ['lamda', 'both']:
             lamda, n_ls = choose_lamda(
                 min(lamda / eps if iteration_ > 0 else lamda, 1),
-                K, emp_cov, n_samples=n_samples,
+                V, emp_cov, n_samples=n_samples,
                 beta=beta, alpha=alpha, gamma=gamma, delta=delta, eps=eps,
                 criterion=lamda_criterion, max_iter=200, p=time_norm,
                 x_inv=x_inv, grad=grad, prox=y,
@@ -303,14 +327,27 @@ def time_graph_lasso(
             n_linesearch += n_ls
         # print ("lambda: ", lamda, n_ls)
 
-        K = K + min(max(lamda, 0), 1) * (y - K)
-        # K, t = fista_step(Y, Y - Y_old, t)
+        K = V + min(max(lamda, 0), 1) * (y - V)
+        obj = obj_partial(precision=K)
+
+        reset = True
+        if mode == 'fista':
+            if restart == 'gradient':
+                # the gradient mapping at V is proportional to V - K
+                reset = _scalar_product(V - K, K - k_previous) > 0
+            else:
+                reset = obj > obj_previous
+        if not reset:
+            V, t = fista_step(K, K - k_previous, t)
+            # extrapolated points must be positive definite
+            reset = not positive_definite(V)
+        if reset:
+            V, t = K, 1.
 
         check = convergence(
-            obj=obj_partial(precision=K),
+            obj=obj,
             rnorm=np.linalg.norm(upper_diag_3d(K) - upper_diag_3d(k_previous)),
-            snorm=np.linalg.norm(
-                obj_partial(precision=K) - obj_partial(precision=k_previous)),
+            snorm=np.linalg.norm(obj - obj_previous),
             e_pri=np.sqrt(upper_diag_3d(K).size) * tol + tol * max(
                 np.linalg.norm(upper_diag_3d(K)),
                 np.linalg.norm(upper_diag_3d(k_previous))),
@@ -374,7 +411,7 @@ def time_graph_lasso(
     return return_list
 
 
-class TimeGraphLassoForwardBackward(TimeGraphLasso):
+class TimeGraphLassoForwardBackward(TimeGraphicalLasso):
     """Sparse inverse covariance estimation with an l1-penalized estimator.
 
     Parameters
@@ -427,9 +464,12 @@ class TimeGraphLassoForwardBackward(TimeGraphLasso):
         Choose if compute the objective function during iterations
         (only useful if `verbose=True`).
 
-    mode : {'admm'}, default 'admm'
-        Minimisation algorithm. At the moment, only 'admm' is available,
-        so this is ignored.
+    mode : {'fb', 'fista'}, default 'fb'
+        Minimisation algorithm. 'fista' accelerates the forward-backward
+        steps, with adaptive restart.
+
+    restart : {'gradient', 'function'}, default 'gradient'
+        Adaptive restart scheme, used if `mode='fista'`.
 
     Attributes
     ----------
@@ -450,12 +490,14 @@ class TimeGraphLassoForwardBackward(TimeGraphLasso):
                  delta=1e-4, gamma=1., lamda_criterion='b', time_norm=1,
                  return_history=False, debug=False,
                  return_n_linesearch=False,
-                 vareps=1e-5, stop_at=None, stop_when=1e-4):
+                 vareps=1e-5, stop_at=None, stop_when=1e-4, mode='fb',
+                 restart='gradient'):
         super(TimeGraphLassoForwardBackward, self).__init__(
             alpha=alpha, tol=tol, max_iter=max_iter,
             verbose=verbose, assume_centered=assume_centered,
-            compute_objective=compute_objective, beta=beta,
-            time_on_axis=time_on_axis)
+            compute_objective=compute_objective, beta=beta, mode=mode)
+        self.time_on_axis = time_on_axis
+        self.restart = restart
         self.delta = delta
         self.gamma = gamma
         self.lamda_criterion = lamda_criterion
@@ -493,7 +535,8 @@ class TimeGraphLassoForwardBackward(TimeGraphLasso):
             choose=self.choose, lamda=self.lamda, debug=self.debug,
             return_n_linesearch=self.return_n_linesearch,
             vareps=self.vareps,
-            stop_at=self.stop_at, stop_when=self.stop_when)
+            stop_at=self.stop_at, stop_when=self.stop_when, mode=self.mode,
+            restart=self.restart)
 
         if self.return_history:
             if self.return_n_linesearch:
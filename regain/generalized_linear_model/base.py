@@ -1,13 +1,29 @@
 
+import warnings
+
 import numpy as np
 
 from abc import ABC, abstractmethod
 
+from scipy import sparse
 from sklearn.base import BaseEstimator
+from sklearn.utils import check_random_state
+from sklearn.utils._joblib import Parallel, delayed, effective_n_jobs
 from regain.utils import namedtuple_with_defaults
 
 convergence = namedtuple_with_defaults(
-    'convergence', 'iter obj iter_norm iter_r_norm')
+    'convergence', 'iter obj iter_norm iter_r_norm n_screened')
+
+
+def _column(X, ix):
+    """Column ix of X, possibly sparse, as a dense 1-d array."""
+    x = X[:, ix]
+    return x.toarray().ravel() if sparse.issparse(x) else x
+
+
+def _sum_product(X, Y):
+    """Sum of the elementwise product of X, possibly sparse, and dense Y."""
+    return X.multiply(Y).sum() if sparse.issparse(X) else np.sum(X * Y)
 
 
 def build_adjacency_matrix(neighbours, how='union'):
@@ -30,6 +46,103 @@ def build_adjacency_matrix(neighbours, how='union'):
     return out
 
 
+def _fit_batch(fit_each_variable, X, nodes, **params):
+    """Fit the neighbourhood of each node in `nodes`."""
+    return [fit_each_variable(X, ix, **params) for ix in nodes]
+
+
+def _fit_neighbourhoods(fit_each_variable, X, n_jobs=None, **params):
+    """Fit the neighbourhood of each node independently.
+
+    The fits are dispatched to `n_jobs` workers; joblib memory-maps dense X
+    read-only in the workers instead of pickling it for every node. It does
+    not memory-map scipy.sparse matrices, so a sparse X is sent once per
+    worker, together with a contiguous batch of nodes.
+    Returns the list of `fit_each_variable(X, ix, **params)` for each node.
+    """
+    n_features = X.shape[1]
+    if not sparse.issparse(X):
+        return Parallel(n_jobs=n_jobs)(
+            delayed(fit_each_variable)(X, ix, **params)
+            for ix in range(n_features))
+
+    n_batches = min(effective_n_jobs(n_jobs), n_features)
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_batch)(fit_each_variable, X, nodes, **params)
+        for nodes in np.array_split(np.arange(n_features), n_batches))
+    return [res for batch in results for res in batch]
+
+
+def _batches(n_samples, batch_size, random_state):
+    """Stream mini-batches of samples, reshuffled at each pass."""
+    n_batches = max(1, n_samples // batch_size)
+    while True:
+        for batch in np.array_split(
+                random_state.permutation(n_samples), n_batches):
+            yield np.sort(batch)
+
+
+def _prox_svrg(gradient, prox, X, theta, gamma=1e-3, batch_size=100,
+               max_iter=100, tol=1e-4, decay=0.1, objective=None,
+               random_state=None, verbose=0):
+    """Mini-batch proximal gradient with SVRG variance reduction.
+
+    `gradient(X_batch, theta)` is the average gradient of the smooth loss
+    on the rows X_batch, and `prox(theta, step)` the proximal operator of
+    the penalty. Each epoch computes the full gradient at a snapshot, then
+    takes a pass of variance-reduced mini-batch steps of size
+    gamma / (1 + decay * epoch). An epoch which makes the solution
+    non-finite, or increases the objective, is discarded and gamma halved.
+    Returns the solution, the snapshots, the checks and the last epoch.
+    """
+    random_state = check_random_state(random_state)
+    n_samples = X.shape[0]
+    batches = _batches(n_samples, batch_size, random_state)
+
+    gamma_init = gamma
+    obj = objective(theta) if objective is not None else np.nan
+    thetas = [theta]
+    checks = []
+    for iter_ in range(max_iter):
+        step = gamma / (1 + decay * iter_)
+        snapshot, obj_snapshot = theta, obj
+        full_gradient = gradient(X, snapshot)
+        with np.errstate(over='ignore', invalid='ignore'):
+            for _ in range(max(1, n_samples // batch_size)):
+                X_batch = X[next(batches)]
+                direction = gradient(X_batch, theta) - \
+                    gradient(X_batch, snapshot) + full_gradient
+                theta = prox(theta - step * direction, step)
+            diverged = not np.all(np.isfinite(theta))
+            if not diverged and objective is not None:
+                obj = objective(theta)
+                diverged = not obj <= obj_snapshot
+        if diverged:
+            # restart from the snapshot with a smaller step
+            theta, obj = snapshot, obj_snapshot
+            gamma /= 2.
+            continue
+        thetas.append(theta)
+
+        iter_norm = np.linalg.norm(theta - snapshot)
+        norm_theta = np.linalg.norm(theta)
+        check = convergence(
+            iter=iter_, obj=obj, iter_norm=iter_norm,
+            iter_r_norm=iter_norm / norm_theta if norm_theta > 0 else 0)
+        checks.append(check)
+        if verbose:
+            print('Epoch: %d, objective: %.4f, iter_norm %.4f' %
+                  (check[0], check[1], check[2]))
+        if iter_norm < tol:
+            break
+
+    if gamma < gamma_init:
+        warnings.warn(
+            "The stochastic solver diverged with gamma=%g, which was reduced "
+            "to %g." % (gamma_init, gamma))
+    return theta, thetas, checks, iter_
+
+
 class GLM_GM(ABC, BaseEstimator):
 
     def __init__(self, alpha=0.01, tol=1e-4, rtol=1e-4, max_iter=100,
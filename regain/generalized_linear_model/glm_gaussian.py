@@ -36,7 +36,8 @@ from sklearn.utils import check_array
 
 from regain.generalized_linear_model.base import GLM_GM, convergence, \
                                                  build_adjacency_matrix
-from regain.prox import soft_thresholding
+from regain.generalized_linear_model.base import _fit_neighbourhoods
+from regain.linear_model.lasso_ import _gap_safe_screening, _strong_rule
 
 
 def objective(X, theta, n, r, selector, alpha):
@@ -45,41 +46,111 @@ def objective(X, theta, n, r, selector, alpha):
     return -(1/n)*XXT + (1/(2*n)) * TXXT + alpha * np.linalg.norm(theta, 1)
 
 
+def _objective_gram(gram_selector, gram_r, theta, alpha):
+    """Objective of a node regression from the Gram matrix of the data."""
+    return -gram_r.dot(theta) + .5 * theta.dot(gram_selector).dot(theta) + \
+        alpha * np.linalg.norm(theta, 1)
+
+
 def fit_each_variable(X, ix, alpha=1e-2, gamma=1e-3, tol=1e-3,
                       max_iter=1000, verbose=0,
                       return_history=True, compute_objective=True,
-                      return_n_iter=False, adjust_gamma=False):
-    n, d = X.shape
-    theta = np.zeros(d-1)+1e-15
-    selector = [i for i in range(d) if i != ix]
-
-    def gradient(X, theta, r, selector, n):
-        XX = X[:, r].T.dot(X[:, selector])
-        XXT = X[:, selector].T.dot(X[:, selector]).dot(theta)
-        return - (1/n) * XX + (1/n) * XXT
-
-    thetas = [theta]
+                      return_n_iter=False, adjust_gamma=False, gram=None,
+                      check_every=10, screening=None):
+    """Lasso regression of a node on the others via coordinate descent.
+
+    The problem is solved from the Gram matrix X^T X / n only, updating
+    the gradient as coordinates change (covariance updates). Sweeps alternate
+    between all the coordinates and the current active set, until a full
+    sweep does not change the solution. `gram` can be precomputed to share
+    it among the nodes. The objective is stored every `check_every` sweeps.
+    `gamma` and `adjust_gamma` are not used and kept for compatibility.
+
+    With screening='strong', the features discarded by the strong rule are
+    left out of the sweeps and the updates of the gradient, and re-added if
+    they violate the KKT conditions at convergence. With screening='safe',
+    the gap safe test discards features after each full sweep.
+    The number of discarded features is stored in the checks.
+    """
+    if gram is None:
+        n, _ = X.shape
+        gram = X.T.dot(X) / n
+    d = gram.shape[0]
+    selector = np.arange(d) != ix
+    gram_selector = gram[np.ix_(selector, selector)]
+    gram_r = gram[selector, ix]
+    diag = np.diag(gram_selector)
+
+    theta = np.zeros(d-1)
+    grad = gram_r.copy()  # gram_r - gram_selector theta
+    keep = diag > 0
+    if screening == 'strong':
+        keep &= _strong_rule(gram_r, alpha)
+    elif screening not in (None, 'safe'):
+        raise ValueError(
+            "Unknown screening %s. Options are 'strong', 'safe'" % screening)
+    # the gradient is only kept up to date on the features
+    features = np.flatnonzero(keep)
+    coords = features
+
+    thetas = [theta.copy()]
     checks = []
     for iter_ in range(max_iter):
-        theta_new = theta - gamma*gradient(X, theta, ix, selector, n)
-        theta = soft_thresholding(theta_new, alpha*gamma)
-        thetas.append(theta)
-
-        check = convergence(iter=iter_,
-                            obj=objective(X, theta, n, ix, selector, alpha),
-                            iter_norm=np.linalg.norm(thetas[-2]-thetas[-1]),
-                            iter_r_norm=(np.linalg.norm(thetas[-2] -
-                                                        thetas[-1]) /
-                                         np.linalg.norm(thetas[-1])))
-        checks.append(check)
-        # if adjust_gamma: # TODO multiply or divide
-        if verbose:
-            print('Iter: %d, objective: %.4f, iter_norm %.4f' %
-                  (check[0], check[1], check[2]))
-
-        if check[-2] < tol:
+        theta_old = theta.copy()
+        for j in coords:
+            z = grad[j] + diag[j] * theta[j]
+            theta_j = np.sign(z) * max(abs(z) - alpha, 0) / diag[j]
+            if theta_j != theta[j]:
+                grad[features] -= \
+                    gram_selector[features, j] * (theta_j - theta[j])
+                theta[j] = theta_j
+        thetas.append(theta.copy())
+
+        iter_norm = np.linalg.norm(theta - theta_old)
+        full_sweep = coords is features
+        converged = iter_norm < tol and full_sweep
+        if full_sweep and screening == 'safe' and features.size > 0:
+            safe = _gap_safe_screening(
+                gram[ix, ix], gram_r[features], np.sqrt(diag[features]),
+                theta[features], grad[features], alpha)
+            dropped = features[~safe & (theta[features] != 0)]
+            for j in dropped:
+                grad[features] += gram_selector[features, j] * theta[j]
+                theta[j] = 0
+            features = features[safe]
+            converged &= dropped.size == 0
+        elif converged and screening == 'strong':
+            discarded = np.flatnonzero(~keep & (diag > 0))
+            grad[discarded] = gram_r[discarded] - \
+                gram_selector[discarded].dot(theta)
+            violations = discarded[np.abs(grad[discarded]) > alpha]
+            if violations.size > 0:
+                keep[violations] = True
+                features = np.flatnonzero(keep)
+                converged = False
+
+        if converged or iter_ % check_every == 0:
+            norm_theta = np.linalg.norm(theta)
+            check = convergence(
+                iter=iter_,
+                obj=_objective_gram(gram_selector, gram_r, theta, alpha)
+                if compute_objective else np.nan,
+                iter_norm=iter_norm,
+                iter_r_norm=iter_norm / norm_theta if norm_theta > 0 else 0,
+                n_screened=d - 1 - features.size)
+            checks.append(check)
+            if verbose:
+                print('Iter: %d, objective: %.4f, iter_norm %.4f' %
+                      (check[0], check[1], check[2]))
+        if converged:
             break
 
+        if iter_norm < tol:
+            # the active set has converged, check all the coordinates
+            coords = features
+        elif full_sweep:
+            coords = features[theta[features] != 0]
+
     return_list = [thetas[-1]]
     if return_history:
         return_list.append(thetas)
@@ -128,8 +199,14 @@ class Gaussian_GLM_GM(GLM_GM):
         Choose if compute the objective function during iterations
         (only useful if `verbose=True`).
 
-    n_cores: int, default -1
-         Number of cores to use in parallel execution.
+    n_jobs : int or None, optional (default=None)
+        Number of jobs to fit the neighbourhoods of the nodes in parallel.
+        ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+        ``-1`` means using all processors.
+
+    screening : {None, 'strong', 'safe'}, default None
+        Discard features of the node regressions, either with the strong
+        rule and KKT checks or with the gap safe test.
 
     Attributes
     ----------
@@ -142,15 +219,21 @@ class Gaussian_GLM_GM(GLM_GM):
     n_iter_ : int
         Number of iterations run.
 
+    n_screened_ : array-like, shape (n_features,)
+        Number of features discarded by the screening for each node,
+        if screening is not None.
+
     """
     def __init__(self, alpha=0.01, tol=1e-4, rtol=1e-4, reconstruction='union',
                  max_iter=100,
                  verbose=False, return_history=True, return_n_iter=False,
-                 compute_objective=True):
+                 compute_objective=True, n_jobs=None, screening=None):
         super(Gaussian_GLM_GM, self).__init__(
             alpha, tol, rtol, max_iter, verbose, return_history, return_n_iter,
             compute_objective)
         self.reconstruction = reconstruction
+        self.n_jobs = n_jobs
+        self.screening = screening
 
     def get_precision(self):
         return self.precision_
@@ -164,12 +247,16 @@ class Gaussian_GLM_GM(GLM_GM):
             Step size of the proximal gradient descent.
         """
         X = check_array(X)
-        thetas_pred = []
-        historys = []
-        for ix in range(X.shape[1]):
-            res = fit_each_variable(X, ix, self.alpha)
-            thetas_pred.append(res[0])
-            historys.append(res[1:])
+        # all the node regressions only depend on the Gram matrix
+        gram = X.T.dot(X) / X.shape[0]
+        res = _fit_neighbourhoods(
+            fit_each_variable, X, n_jobs=self.n_jobs, alpha=self.alpha,
+            tol=self.tol, max_iter=self.max_iter, gram=gram,
+            screening=self.screening)
+        thetas_pred = [r[0] for r in res]
+        historys = [r[1:] for r in res]
+        if self.screening is not None:
+            self.n_screened_ = np.array([r[2][-1].n_screened for r in res])
         self.precision_ = build_adjacency_matrix(thetas_pred,
                                                  how=self.reconstruction)
         self.history = historys
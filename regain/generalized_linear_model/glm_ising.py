@@ -31,30 +31,41 @@ import warnings
 
 import numpy as np
 
+from scipy import sparse
 from sklearn.utils import check_array
 from sklearn.base import BaseEstimator
 from sklearn.linear_model import LogisticRegression
+from sklearn.utils.extmath import safe_sparse_dot
 
 from regain.generalized_linear_model.base import GLM_GM, convergence
 from regain.generalized_linear_model.base import build_adjacency_matrix
+from regain.generalized_linear_model.base import _fit_neighbourhoods
+from regain.generalized_linear_model.base import _column, _sum_product
+from regain.generalized_linear_model.base import _prox_svrg
 from regain.prox import soft_thresholding_od
 from regain.norm import l1_od_norm
 
 
+def _linear_predictors(X, theta):
+    """Linear predictors of all the nodes, excluding their own spin.
+
+    Column r contains sum_{j != r} X[:, j] theta[j, r].
+    """
+    theta_od = theta - np.diag(np.diag(theta))
+    return X.dot(theta_od)
+
+
 def loss(X, theta):
-    n, d = X.shape
-    objective = 0
+    """Negative log pseudo-likelihood of the Ising model (vectorised).
+
+    The entries of X are the spins, in {-1, 1}, so that the normaliser of
+    node r is 2 cosh of its linear predictor.
+    """
+    n, _ = X.shape
     if not np.all(theta == theta.T):
-        return np.float('inf')
-    for r in range(d):
-        selector = [i for i in range(d) if i != r]
-        for i in range(n):
-            XXT = X[i, r] * X[i, selector].dot(theta[selector, r])
-            XT = X[i, selector].dot(theta[selector, r])
-            EXT = np.exp(XT)
-            E_XT = np.exp(-XT)
-            objective += np.log(EXT + E_XT) - XXT
-    return (1/n)*objective
+        return np.inf
+    XT = _linear_predictors(X, theta)
+    return (np.sum(np.logaddexp(XT, -XT)) - _sum_product(X, XT)) / n
 
 
 def objective(X, theta, alpha):
@@ -64,21 +75,17 @@ def objective(X, theta, alpha):
 
 
 def _gradient_ising(X, theta,  n, A=None, rho=1, T=0):
-    n, d = X.shape
-    theta_new = np.zeros_like(theta)
-
-    def gradient(X, thetas, r, selector, n, A=None, rho=1, T=0):
-        sum_ = np.zeros((1, len(selector)))
-        for i in range(X.shape[0]):
-            XT = X[i, selector].dot(theta[selector, r])
-            EXT = np.exp(XT)
-            E_XT = np.exp(-XT)
-            sum_ += (1/n)*X[i, selector]*((EXT - E_XT)/(EXT + E_XT) - X[i, r])
-            return sum_
-    for ix in range(theta.shape[0]):
-        selector = [i for i in range(d) if i != ix]
-        theta_new[ix, selector] = gradient(
-                                    X, theta, ix, selector, n, A, rho, T)
+    """Gradient of the pseudo-likelihood, node r on row r (vectorised)."""
+    n, _ = X.shape
+    residuals = np.tanh(_linear_predictors(X, theta))
+    if sparse.issparse(X):
+        X_coo = X.tocoo()
+        # unbuffered, so that duplicate entries are summed
+        np.subtract.at(residuals, (X_coo.row, X_coo.col), X_coo.data)
+    else:
+        residuals -= X
+    theta_new = safe_sparse_dot(X.T, residuals).T / n
+    np.fill_diagonal(theta_new, 0)
     if A is not None:
         theta_new += (rho*T)*(theta - A)
 
@@ -88,13 +95,34 @@ def _gradient_ising(X, theta,  n, A=None, rho=1, T=0):
 def _fit(X, alpha=1e-2, gamma=1e-3, tol=1e-3, max_iter=1000, verbose=0,
          return_history=True, compute_objective=True, warm_start=None,
          return_n_iter=False, adjust_gamma=False, A=None, T=0, rho=1,
-         update_gamma=0.5, line_search=False):
+         update_gamma=0.5, line_search=False, solver='gd', batch_size=100,
+         decay=0.1, random_state=None):
     n, d = X.shape
     if warm_start is None:
         theta = np.zeros((d, d))
     else:
         theta = check_array(warm_start)
 
+    if solver == 'sgd':
+        def prox(theta, step):
+            return soft_thresholding_od((theta + theta.T) / 2, alpha*step)
+
+        theta, thetas, checks, iter_ = _prox_svrg(
+            lambda X_batch, theta: _gradient_ising(
+                X_batch, theta, X_batch.shape[0], A, rho, T),
+            prox, X, theta, gamma=gamma, batch_size=batch_size,
+            max_iter=max_iter, tol=tol, decay=decay,
+            objective=(lambda theta: objective(X, theta, alpha))
+            if compute_objective else None,
+            random_state=random_state, verbose=verbose)
+        return_list = [theta]
+        if return_history:
+            return_list.append(thetas)
+            return_list.append(checks)
+        if return_n_iter:
+            return_list.append(iter_)
+        return return_list
+
     thetas = [theta]
     theta_new = theta.copy()
     checks = []
@@ -106,14 +134,13 @@ def _fit(X, alpha=1e-2, gamma=1e-3, tol=1e-3, max_iter=1000, verbose=0,
             theta = (theta_new + theta_new.T)/2
             theta = soft_thresholding_od(theta, alpha*gamma)
         else:
+            grad = _gradient_ising(X, theta_old,  n, A, rho, T)
+            loss_old = loss(X, theta_old)
             while True:
-                grad = _gradient_ising(X, theta,  n, A, rho, T)
-                theta_new = theta - gamma*grad
+                theta_new = theta_old - gamma*grad
                 theta = (theta_new + theta_new.T)/2
                 theta = soft_thresholding_od(theta, alpha*gamma)
-                print(theta)
                 loss_new = loss(X, theta)
-                loss_old = loss(X, theta_old)
                 # Line search
                 diff_theta2 = np.linalg.norm(theta_old - theta)**2
                 grad_diff = np.trace(grad.dot(theta_old - theta))
@@ -121,10 +148,6 @@ def _fit(X, alpha=1e-2, gamma=1e-3, tol=1e-3, max_iter=1000, verbose=0,
 
                 if loss_new > diff or np.isinf(loss_new) or np.isnan(loss_new):
                     gamma = update_gamma * gamma
-                    theta = theta_old - gamma * grad
-                    theta = soft_thresholding_od(theta, alpha*gamma)
-                    loss_new = loss(X, theta)
-                    diff = loss_old - grad_diff + (diff_theta2/(2*gamma))
                 else:
                     break
         thetas.append(theta)
@@ -156,6 +179,14 @@ def _fit(X, alpha=1e-2, gamma=1e-3, tol=1e-3, max_iter=1000, verbose=0,
     return return_list
 
 
+def _fit_logistic(X, ix, alpha=1e-2, verbose=0):
+    """Fit the neighbourhood of a node via l1 logistic regression."""
+    selector = np.array([i for i in range(X.shape[1]) if i != ix])
+    return LogisticRegression(C=1/alpha, penalty='l1', solver='liblinear',
+                              verbose=verbose, random_state=0).fit(
+        X[:, selector], _column(X, ix)).coef_
+
+
 class IsingGraphicalModel(GLM_GM, BaseEstimator):
     """Graphical model inference with Bernoulli distribution.
 
@@ -194,8 +225,21 @@ class IsingGraphicalModel(GLM_GM, BaseEstimator):
         Choose if compute the objective function during iterations
         (only useful if `verbose=True`).
 
-    n_cores: int, default -1
-         Number of cores to use in parallel execution.
+    n_jobs : int or None, optional (default=None)
+        Number of jobs to fit the neighbourhoods of the nodes in parallel.
+        ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+        ``-1`` means using all processors.
+
+    solver : {'gd', 'sgd'}, default 'gd'
+        Solver of the 'symmetric_fbs' mode. 'gd' uses full-batch proximal
+        gradient steps, 'sgd' mini-batch proximal steps with SVRG variance
+        reduction, where max_iter counts the passes over the data.
+
+    batch_size : int, default 100
+        Number of samples of each mini-batch, if solver='sgd'.
+
+    random_state : int, RandomState instance or None, default None
+        Seed of the mini-batches, if solver='sgd'.
 
     Attributes
     ----------
@@ -212,10 +256,15 @@ class IsingGraphicalModel(GLM_GM, BaseEstimator):
     def __init__(self, alpha=0.01, tol=1e-4, rtol=1e-4, reconstruction='union',
                  mode='symmetric_fbs', rho=1, max_iter=100,
                  verbose=False, return_history=True, return_n_iter=False,
-                 compute_objective=True, gamma=1):
+                 compute_objective=True, gamma=1, n_jobs=None, solver='gd',
+                 batch_size=100, random_state=None):
         super(IsingGraphicalModel, self).__init__(
             alpha, tol, rtol, max_iter, verbose, return_history, return_n_iter,
             compute_objective)
+        self.n_jobs = n_jobs
+        self.solver = solver
+        self.batch_size = batch_size
+        self.random_state = random_state
         self.reconstruction = reconstruction
         self.mode = mode
         self.rho = rho
@@ -226,17 +275,22 @@ class IsingGraphicalModel(GLM_GM, BaseEstimator):
 
     def fit(self, X, y=None):
         """
-        X : ndarray, shape = (n_samples * n_times, n_dimensions)
-            Data matrix.
+        X : {ndarray, sparse matrix}, shape = (n_samples, n_dimensions)
+            Data matrix. With mode='symmetric_fbs' the entries are the spins,
+            in {-1, 1}: data in {0, 1} must be mapped to 2 * X - 1 first.
+            Since the spins are never zero, sparse X only saves memory with
+            mode='logistic_regression', which takes any binary encoding.
         y : added for compatiblity
         gamma: float,
             Step size of the proximal gradient descent.
         """
-        X = check_array(X)
+        X = check_array(X, accept_sparse=('csr', 'csc'))
         if self.mode.lower() == 'symmetric_fbs':
             res = _fit(X, self.alpha, tol=self.tol, gamma=self.gamma,
                        max_iter=self.max_iter,
-                       verbose=self.verbose)
+                       verbose=self.verbose, solver=self.solver,
+                       batch_size=self.batch_size,
+                       random_state=self.random_state)
             self.precision_ = res[0]
             self.history = res[1:]
         elif self.mode.lower() == 'coordinate_descent':
@@ -253,16 +307,9 @@ class IsingGraphicalModel(GLM_GM, BaseEstimator):
             #                                          how=self.reconstruction)
             # self.history = historys
         elif self.mode.lower() == 'logistic_regression':
-            thetas_pred = []
-            for ix in range(X.shape[1]):
-                verbose = min(0, self.verbose-1)
-                selector = np.array([i for i in range(X.shape[1]) if i != ix])
-                print('pd')
-                res = LogisticRegression(C=1/self.alpha, penalty='l1',
-                                         solver='liblinear',
-                                         verbose=verbose, random_state=0).fit(
-                    X[:, selector], X[:, ix]).coef_
-                thetas_pred.append(res)
+            thetas_pred = _fit_neighbourhoods(
+                _fit_logistic, X, n_jobs=self.n_jobs, alpha=self.alpha,
+                verbose=max(0, self.verbose-1))
             self.precision_ = build_adjacency_matrix(thetas_pred,
                                                      how=self.reconstruction)
         else:
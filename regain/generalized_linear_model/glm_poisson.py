@@ -29,72 +29,170 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import numpy as np
+from scipy import sparse
 from sklearn.utils import check_array
 from sklearn.base import BaseEstimator
 
 from regain.generalized_linear_model.base import GLM_GM, convergence
 from regain.generalized_linear_model.base import build_adjacency_matrix
+from regain.generalized_linear_model.base import _fit_neighbourhoods
+from regain.generalized_linear_model.base import _column, _sum_product
+from regain.generalized_linear_model.base import _prox_svrg
+from regain.linear_model.lasso_ import _strong_rule
 from regain.prox import soft_thresholding
 from regain.norm import l1_od_norm
 
 
+def _linear_predictors(X, theta):
+    """Linear predictors of all the nodes, excluding their own count.
+
+    Column r contains sum_{j != r} X[:, j] theta[r, j].
+    """
+    theta_od = theta - np.diag(np.diag(theta))
+    return X.dot(theta_od.T)
+
+
 def loss_single_variable(X, theta, n, r, selector):
-    objective = 0
-    for i in range(n):
-        XXT = X[i, r] * X[i, selector].dot(theta)
-        expXT = np.exp(X[i, selector].dot(theta))
-        objective += expXT - XXT
-    return (1/n)*objective
+    XT = X[:, selector].dot(theta)
+    return np.sum(np.exp(XT) - _column(X, r) * XT) / n
 
 
 def objective(X, theta, alpha):
-    n, d = X.shape
-    objective = 0
     if not np.all(theta == theta.T):
-        return np.float('inf')
-    for r in range(d):
-        selector = [i for i in range(d) if i != r]
-        objective += objective_single_variable(X, theta[r, selector], n, r,
-                                               selector, 0)
-    return objective + alpha*l1_od_norm(theta)
+        return np.inf
+    return loss(X, theta) + alpha*l1_od_norm(theta)
 
 
 def objective_single_variable(X, theta, n, r, selector, alpha):
-    objective = 0
-    for i in range(X.shape[0]):
-        XXT = X[i, r] * X[i, selector].dot(theta)
-        expXT = np.exp(X[i, selector].dot(theta))
-        objective += expXT - XXT
-    return (1/n) * objective + alpha*np.linalg.norm(theta, 1)
+    return loss_single_variable(X, theta, n, r, selector) + \
+        alpha*np.linalg.norm(theta, 1)
 
 
 def fit_each_variable(X, ix, alpha=1e-2, gamma=1, tol=1e-3,
                       max_iter=100, verbose=0, update_gamma=0.5,
                       return_history=True, compute_objective=True,
                       return_n_iter=False, adjust_gamma=False, A=None,
-                      T=0, rho=1):
+                      T=0, rho=1, warm_start=None, solver='gd',
+                      batch_size=100, decay=0.1, random_state=None,
+                      screening=None):
     n, d = X.shape
-    theta = np.zeros(d-1)
+    if warm_start is None:
+        theta = np.zeros(d-1)
+    else:
+        theta = np.array(warm_start, dtype=float)
     selector = [i for i in range(d) if i != ix]
 
-    def gradient(X, theta, r, selector, n, A, T, rho):
-        XTX = X[:, selector].T.dot(X[:, r])
-        EXK = X[:, selector].T.dot(np.exp(X[:, selector].dot(theta)))
+    if screening is not None:
+        if screening != 'strong':
+            raise ValueError(
+                "Unknown screening %s. Only 'strong' is available for the "
+                "Poisson loss" % screening)
+        X_selector = X[:, selector]
+        X_ix = _column(X, ix)
+
+        def gradient(theta):
+            to_add = 0
+            if A is not None:
+                to_add = (rho*T)*(theta - A[ix, selector])/n
+            return -X_selector.T.dot(X_ix - np.exp(X_selector.dot(theta)))/n \
+                + to_add
+
+        # solve the problem on the features kept by the strong rule, and
+        # re-add the ones violating the KKT conditions
+        keep = _strong_rule(gradient(theta), alpha) | (theta != 0)
+        thetas, checks, n_iter = [], [], 0
+        while True:
+            columns = [ix] + [selector[j] for j in np.flatnonzero(keep)]
+            res = fit_each_variable(
+                X[:, columns], 0, alpha, gamma=gamma, tol=tol,
+                max_iter=max_iter, verbose=verbose, update_gamma=update_gamma,
+                return_history=True, compute_objective=compute_objective,
+                return_n_iter=True,
+                A=None if A is None else A[np.ix_(columns, columns)], T=T,
+                rho=rho, warm_start=theta[keep], solver=solver,
+                batch_size=batch_size, decay=decay, random_state=random_state)
+            theta = np.zeros(d-1)
+            theta[keep] = res[0]
+            for theta_keep in res[1]:
+                thetas.append(np.zeros(d-1))
+                thetas[-1][keep] = theta_keep
+            checks.extend(
+                check._replace(n_screened=d - 1 - np.sum(keep))
+                for check in res[2])
+            n_iter += res[3] + 1
+
+            violations = ~keep & (np.abs(gradient(theta)) > alpha)
+            if not np.any(violations):
+                break
+            keep |= violations
+
+        return_list = [theta]
+        if return_history:
+            return_list.append(thetas)
+            return_list.append(checks)
+        if return_n_iter:
+            return_list.append(n_iter - 1)
+        return return_list
+
+    if solver == 'sgd':
+        def batch_gradient(X_batch, theta):
+            X_selector = X_batch[:, selector]
+            XT = X_selector.dot(theta)
+            to_add = 0
+            if A is not None:
+                to_add = (rho*T)*(theta - A[ix, selector])/n
+            return -(X_selector.T.dot(_column(X_batch, ix) - np.exp(XT)) /
+                     X_batch.shape[0]) + to_add
+
+        theta, thetas, checks, iter_ = _prox_svrg(
+            batch_gradient,
+            lambda theta, step: soft_thresholding(theta, alpha*step),
+            X, theta, gamma=gamma, batch_size=batch_size,
+            max_iter=max_iter, tol=tol, decay=decay,
+            objective=(lambda theta: objective_single_variable(
+                X, theta, n, ix, selector, alpha))
+            if compute_objective else None,
+            random_state=random_state, verbose=verbose)
+        return_list = [theta]
+        if return_history:
+            return_list.append(thetas)
+            return_list.append(checks)
+        if return_n_iter:
+            return_list.append(iter_)
+        return return_list
+
+    X_selector = X[:, selector]
+    X_ix = _column(X, ix)
+    XTX = X_selector.T.dot(X_ix)
+
+    def loss_predictor(theta, XT):
+        loss_ = np.sum(np.exp(XT) - X_ix * XT) / n
+        if A is not None:
+            # the line search must use the same smooth part as the gradient
+            loss_ += (rho*T) / (2*n) * np.sum((theta - A[ix, selector])**2)
+        return loss_
+
+    def gradient(theta, XT):
         to_add = 0
         if A is not None:
-            to_add = (rho*T)*(theta - A[r, selector])/n
-        return -(1/n)*(XTX - EXK) + to_add
+            to_add = (rho*T)*(theta - A[ix, selector])/n
+        return -(1/n)*(XTX - X_selector.T.dot(np.exp(XT))) + to_add
+
+    # linear predictor and loss of the current iterate, reused by the
+    # gradient and by every trial of the line search
+    XT_old = X_selector.dot(theta)
+    loss_old = loss_predictor(theta, XT_old)
 
     thetas = [theta]
     checks = []
     for iter_ in range(max_iter):
         theta_old = thetas[-1]
-        grad = gradient(X, theta, ix, selector, n, A, T, rho)
+        grad = gradient(theta_old, XT_old)
         while True:
-            theta_new = theta - gamma*grad
+            theta_new = theta_old - gamma*grad
             theta = soft_thresholding(theta_new, alpha*gamma)
-            loss_new = loss_single_variable(X, theta, n, ix, selector)
-            loss_old = loss_single_variable(X, theta_old, n,  ix, selector)
+            XT = X_selector.dot(theta)
+            loss_new = loss_predictor(theta, XT)
             # Line search
             diff_theta2 = np.linalg.norm(theta_old - theta)**2
             grad_diff = grad.dot(theta_old - theta)
@@ -102,17 +200,13 @@ def fit_each_variable(X, ix, alpha=1e-2, gamma=1, tol=1e-3,
 
             if loss_new > diff or np.isinf(loss_new) or np.isnan(loss_new):
                 gamma = update_gamma * gamma
-                theta = theta_old - gamma * grad
-                theta = soft_thresholding(theta, alpha*gamma)
-                loss_new = loss_single_variable(X, theta, n, ix, selector)
-                diff = loss_old - grad_diff + (diff_theta2/(2*gamma))
             else:
                 break
+        XT_old, loss_old = XT, loss_new
         thetas.append(theta)
         if iter_ > 0:
             check = convergence(iter=iter_,
-                                obj=objective_single_variable(X, theta, n, ix,
-                                                              selector, alpha),
+                                obj=loss_new + alpha*np.linalg.norm(theta, 1),
                                 iter_norm=np.linalg.norm(thetas[-2]-thetas[-1]),
                                 iter_r_norm=(np.linalg.norm(thetas[-2] -
                                                             thetas[-1]) /
@@ -138,13 +232,10 @@ def fit_each_variable(X, ix, alpha=1e-2, gamma=1, tol=1e-3,
 
 
 def loss(X, theta):
-    n, d = X.shape
-    objective = 0
-    for r in range(d):
-        selector = [i for i in range(d) if i != r]
-        a = loss_single_variable(X, theta[r, selector], n, r, selector)
-        objective += a
-    return objective
+    """Negative log pseudo-likelihood of the Poisson model (vectorised)."""
+    n, _ = X.shape
+    XT = _linear_predictors(X, theta)
+    return (np.sum(np.exp(XT)) - _sum_product(X, XT)) / n
 
 
 class PoissonGraphicalModel(GLM_GM, BaseEstimator):
@@ -175,7 +266,14 @@ class PoissonGraphicalModel(GLM_GM, BaseEstimator):
         Relative tolerance to declare convergence.
 
     max_iter : integer, default 100
-        The maximum number of iterations.
+        The maximum number of iterations of each node regression, with
+        either solver.
+
+    gamma : positive float, default 0.1
+        Initial step size of the node regressions. The default solver='gd'
+        starts its line search from gamma; it used to ignore both gamma and
+        max_iter, starting from 1 and stopping after 100 iterations.
+        solver='sgd' halves gamma whenever an epoch diverges.
 
     verbose : boolean, default False
         If verbose is True, the objective function, rnorm and snorm are
@@ -185,8 +283,26 @@ class PoissonGraphicalModel(GLM_GM, BaseEstimator):
         Choose if compute the objective function during iterations
         (only useful if `verbose=True`).
 
-    n_cores: int, default -1
-         Number of cores to use in parallel execution.
+    n_jobs : int or None, optional (default=None)
+        Number of jobs to fit the neighbourhoods of the nodes in parallel.
+        ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+        ``-1`` means using all processors.
+
+    solver : {'gd', 'sgd'}, default 'gd'
+        Solver of the node regressions. 'gd' uses full-batch proximal
+        gradient steps with line search, 'sgd' mini-batch proximal steps of
+        size gamma with SVRG variance reduction, where max_iter counts the
+        passes over the data.
+
+    batch_size : int, default 100
+        Number of samples of each mini-batch, if solver='sgd'.
+
+    random_state : int, RandomState instance or None, default None
+        Seed of the mini-batches, if solver='sgd'.
+
+    screening : {None, 'strong'}, default None
+        Fit each node on the features kept by the strong rule, re-adding
+        the ones that violate the KKT conditions.
 
     Attributes
     ----------
@@ -199,15 +315,25 @@ class PoissonGraphicalModel(GLM_GM, BaseEstimator):
     n_iter_ : int
         Number of iterations run.
 
+    n_screened_ : array-like, shape (n_features,)
+        Number of features discarded by the screening for each node,
+        if screening is not None.
+
     """
     def __init__(self, alpha=0.01, tol=1e-4, rtol=1e-4, reconstruction='union',
                  mode='coordinate_descent', max_iter=100, gamma=0.1,
                  intercept=False,
                  verbose=False, return_history=True, return_n_iter=False,
-                 compute_objective=True):
+                 compute_objective=True, n_jobs=None, solver='gd',
+                 batch_size=100, random_state=None, screening=None):
         super(PoissonGraphicalModel, self).__init__(
             alpha, tol, rtol, max_iter, verbose, return_history, return_n_iter,
             compute_objective)
+        self.n_jobs = n_jobs
+        self.solver = solver
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.screening = screening
         self.reconstruction = reconstruction
         self.mode = mode
         self.gamma = gamma
@@ -224,22 +350,26 @@ class PoissonGraphicalModel(GLM_GM, BaseEstimator):
         gamma: float,
             Step size of the proximal gradient descent.
         """
-        X = check_array(X)
+        X = check_array(X, accept_sparse='csc')
         if self.mode.lower() == 'symmetric_fbs':
             raise ValueError('Not implemented.')
 
         elif self.mode.lower() == 'coordinate_descent':
-            print('sono qui')
-            thetas_pred = []
-            historys = []
             if self.intercept:
-                X = np.hstack((X, np.ones((X.shape[0], 1))))
-            for ix in range(X.shape[1]):
-                verbose = max(0, self.verbose-1)
-                res = fit_each_variable(X, ix, self.alpha, tol=self.tol,
-                                        verbose=verbose)
-                thetas_pred.append(res[0])
-                historys.append(res[1:])
+                X = sparse.hstack((X, np.ones((X.shape[0], 1))),
+                                  format='csc') if sparse.issparse(X) \
+                    else np.hstack((X, np.ones((X.shape[0], 1))))
+            res = _fit_neighbourhoods(
+                fit_each_variable, X, n_jobs=self.n_jobs, alpha=self.alpha,
+                tol=self.tol, gamma=self.gamma, max_iter=self.max_iter,
+                verbose=max(0, self.verbose-1), solver=self.solver,
+                batch_size=self.batch_size, random_state=self.random_state,
+                screening=self.screening)
+            thetas_pred = [r[0] for r in res]
+            historys = [r[1:] for r in res]
+            if self.screening is not None:
+                self.n_screened_ = np.array(
+                    [r[2][-1].n_screened if r[2] else 0 for r in res])
             self.precision_ = build_adjacency_matrix(thetas_pred,
                                                      how=self.reconstruction)
             self.history = historys
@@ -35,6 +35,7 @@ import numpy as np
 from six.moves import map, range, zip
 
 from sklearn.base import BaseEstimator
+from sklearn.utils._joblib import Parallel, delayed
 from sklearn.utils.extmath import squared_norm
 from sklearn.utils.validation import check_X_y
 from sklearn.cluster import AgglomerativeClustering
@@ -42,14 +43,14 @@ from sklearn.gaussian_process import kernels
 
 from sklearn.utils.validation import check_is_fitted
 
-from regain.generalized_linear_model.poisson import fit_each_variable
-from regain.generalized_linear_model.poisson import loss
+from regain.generalized_linear_model.glm_poisson import fit_each_variable
+from regain.generalized_linear_model.glm_poisson import loss
 from regain.generalized_linear_model.base import build_adjacency_matrix
 from regain.covariance.kernel_time_graphical_lasso_ import precision_similarity
 from regain.norm import l1_od_norm
-from regain.utils import convergence
+from regain.utils import convergence, lag_pairs, segment_sum
 from regain.update_rules import update_rho
-from regain.validation import check_norm_prox
+from regain.validation import check_kernel, check_norm_prox
 
 
 def loss_poisson(X, K, n_samples=None):
@@ -61,27 +62,42 @@ def loss_poisson(X, K, n_samples=None):
         for x, k, ni in zip(X, K, n_samples))
 
 
-def objective(X, K, Z_M, alpha, kernel, psi):
-    """Objective function for time-varying poisson model."""
+def objective(X, K, Z_M, alpha, weights, psi):
+    """Objective function for time-varying poisson model.
 
+    Z_M contains the consensus variables (Z_L, Z_R) of all the pairs of
+    time points coupled by the kernel, and `weights` their kernel values.
+    """
     obj = loss_poisson(X, K)
     obj += alpha * sum(map(l1_od_norm, K))
 
-    for m in range(1, K.shape[0]):
-        # all possible non markovians jumps
-        Z_L, Z_R = Z_M[m]
-        obj += np.sum(np.array(list(map(psi, Z_R - Z_L))) * np.diag(kernel, m))
-
+    Z_L, Z_R = Z_M
+    obj += np.dot(weights, [psi(z) for z in Z_R - Z_L])
     return obj
 
 
+def _fit_time_point(X, alpha, tol, verbose, A, T, rho, warm_start):
+    """Fit the neighbourhoods of all the nodes at a single time point.
+
+    The node fits are grouped in a single task, as each of them is too
+    small to be worth dispatching to a worker.
+    """
+    thetas = [
+        fit_each_variable(
+            X, v, alpha, tol=tol, verbose=verbose, A=A, T=T, rho=rho,
+            warm_start=np.delete(warm_start[v], v))[0]
+        for v in range(X.shape[1])]
+    return build_adjacency_matrix(thetas, 'union')
+
+
 def _fit_time_poisson_model(X, alpha=0.01, rho=1, kernel=None,
                             max_iter=100, verbose=False, psi='laplacian',
                             gamma=0.1,
                             tol=1e-4, rtol=1e-4, return_history=False,
                             return_n_iter=True, compute_objective=True,
                             stop_at=None, stop_when=1e-4,
-                            n_cores=-1):
+                            update_rho_options=None, n_cores=None,
+                            kernel_tol=1e-8, max_lag=None):
     """Time-varying graphical model solver.
 
     Solves the following problem via ADMM:
@@ -111,6 +127,13 @@ def _fit_time_poisson_model(X, alpha=0.01, rho=1, kernel=None,
         How to initialise the inverse covariance matrix. Default is take
         the empirical covariance and inverting it.
 
+    kernel_tol : float, default 1e-8
+        Lags of the kernel whose weights are all below `kernel_tol` are
+        not enforced, and their consensus variables are not allocated.
+    max_lag : int, default None
+        Bandwidth of the kernel, i.e., the highest lag to consider.
+        If None, it is inferred from `kernel_tol`.
+
     Returns
     -------
     X : numpy.array, 2-dimensional
@@ -125,132 +148,111 @@ def _fit_time_poisson_model(X, alpha=0.01, rho=1, kernel=None,
     n_times, n_samples, n_features = X.shape
     n_samples = np.array([n_samples]*n_times)
 
-    if kernel is None:
-        kernel = np.eye(n_times)
+    kernel, lags = check_kernel(
+        kernel, n_times, tol=kernel_tol, max_lag=max_lag)
 
-    K = np.zeros((n_times, n_features, n_features))
+    # all pairs of time points (left, right) coupled by the kernel
+    left, right = lag_pairs(n_times, lags)
+    weights = kernel[left, right]
+    n_consensus = 1 + np.bincount(left, minlength=n_times) + \
+        np.bincount(right, minlength=n_times)
+    n_constraints = n_times + 2 * left.size
 
-    Z_M = {}
-    U_M = {}
-    Z_M_old = {}
-
-    for m in range(1, n_times):
-        # all possible non markovians jumps
-        Z_L = K.copy()[:-m]
-        Z_R = K.copy()[m:]
-        Z_M[m] = (Z_L, Z_R)
-
-        U_L = np.zeros_like(Z_L)
-        U_R = np.zeros_like(Z_R)
-        U_M[m] = (U_L, U_R)
+    K = np.zeros((n_times, n_features, n_features))
 
-        Z_L_old = np.zeros_like(Z_L)
-        Z_R_old = np.zeros_like(Z_R)
-        Z_M_old[m] = (Z_L_old, Z_R_old)
+    # non markovians jumps with non-negligible weight
+    Z_L, Z_R = K[left], K[right]
+    U_L, U_R = np.zeros_like(Z_L), np.zeros_like(Z_R)
+    Z_L_old, Z_R_old = np.zeros_like(Z_L), np.zeros_like(Z_R)
 
     checks = [
         convergence(
-            obj=objective(X, K, Z_M, alpha, kernel, psi))
+            obj=objective(X, K, (Z_L, Z_R), alpha, weights, psi))
     ]
-    for iteration_ in range(max_iter):
-        # update K
-        A = np.zeros_like(K)
-        for m in range(1, n_times):
-            A[:-m] += Z_M[m][0] - U_M[m][0]
-            A[m:] += Z_M[m][1] - U_M[m][1]
-
-        A /= n_times
-        A += A.transpose(0, 2, 1)
-        A /= 2.
-        # K_new = np.zeros_like(K)
-
-        for t in range(n_times):
-            thetas_pred = []
-            for v in range(n_features):
-                inner_verbose = max(0, verbose-1)
-                res = fit_each_variable(X[t, :, :], v, alpha, tol=tol,
-                                        verbose=inner_verbose, A=A[t, :, :],
-                                        T=n_times, rho=rho)
-                thetas_pred.append(res[0])
-
-            K[t, :, :] = build_adjacency_matrix(thetas_pred, 'union')
-
-        # other Zs
-        for m in range(1, n_times):
-            U_L, U_R = U_M[m]
-            A_L = K[:-m] + U_L
-            A_R = K[m:] + U_R
+    # the inner fits are solved inexactly, more accurately as the outer
+    # residuals shrink
+    inner_tol = 100 * tol
+    with Parallel(n_jobs=n_cores) as parallel:
+        for iteration_ in range(max_iter):
+            # update K
+            A = segment_sum(Z_L - U_L, left, n_times)
+            A += segment_sum(Z_R - U_R, right, n_times)
+
+            A /= n_consensus[:, None, None]
+            A += A.transpose(0, 2, 1)
+            A /= 2.
+            # K_new = np.zeros_like(K)
+
+            # time points fits resume from the previous iterate
+            K = np.array(parallel(
+                delayed(_fit_time_point)(
+                    X[t], alpha, tol=inner_tol, verbose=max(0, verbose-1),
+                    A=A[t], T=n_consensus[t], rho=rho, warm_start=K[t])
+                for t in range(n_times)))
+
+            # other Zs, for all pairs at once
+            K_L, K_R = K[left], K[right]
+            A_L = K_L + U_L
+            A_R = K_R + U_R
             if not psi_node_penalty:
                 prox_e = prox_psi(
-                    A_R - A_L,
-                    lamda=2. * np.diag(kernel, m)[:, None, None] / rho)
+                    A_R - A_L, lamda=2. * weights[:, None, None] / rho)
                 Z_L = .5 * (A_L + A_R - prox_e)
                 Z_R = .5 * (A_L + A_R + prox_e)
             else:
                 Z_L, Z_R = prox_psi(
                     np.concatenate((A_L, A_R), axis=1),
-                    lamda=.5 * np.diag(kernel, m)[:, None, None] / rho,
-                    rho=rho, tol=tol, rtol=rtol, max_iter=max_iter)
-            Z_M[m] = (Z_L, Z_R)
+                    lamda=.5 * weights[:, None, None] / rho, rho=rho, tol=tol,
+                    rtol=rtol, max_iter=max_iter)
 
             # update other residuals
-            U_L += K[:-m] - Z_L
-            U_R += K[m:] - Z_R
-
-        # diagnostics, reporting, termination checks
-        rnorm = np.sqrt(sum(squared_norm(K[:-m] - Z_M[m][0]) +
-                        squared_norm(K[m:] - Z_M[m][1])
-                        for m in range(1, n_times)))
-
-        snorm = rho * np.sqrt(sum(squared_norm(Z_M[m][0] - Z_M_old[m][0]) +
-                                  squared_norm(Z_M[m][1] - Z_M_old[m][1])
-                                  for m in range(1, n_times)))
-
-        obj = objective(X, K, Z_M, alpha, kernel, psi) \
-            if compute_objective else np.nan
-
-        check = convergence(
-            obj=obj, rnorm=rnorm, snorm=snorm,
-            e_pri=n_features * n_times * tol + rtol * max(
-                np.sqrt(sum(
-                        squared_norm(Z_M[m][0]) + squared_norm(Z_M[m][1])
-                        for m in range(1, n_times))),
-                np.sqrt(
-                    squared_norm(K) + sum(
-                        squared_norm(K[:-m]) + squared_norm(K[m:])
-                        for m in range(1, n_times)))),
-            e_dual=n_features * n_times * tol + rtol * rho * np.sqrt(
-                sum(
-                    squared_norm(U_M[m][0]) + squared_norm(U_M[m][1])
-                    for m in range(1, n_times))))
-        for m in range(1, n_times):
-            Z_M_old[m] = (Z_M[m][0].copy(), Z_M[m][1].copy())
-
-        if verbose:
-            print(
-                "obj: %.4f, rnorm: %.4f, snorm: %.4f,"
-                "eps_pri: %.4f, eps_dual: %.4f" % check[:5])
-
-        checks.append(check)
-        if stop_at is not None:
-            if abs(check.obj - stop_at) / abs(stop_at) < stop_when:
-                break
-
-        if check.rnorm <= check.e_pri and check.snorm <= check.e_dual:
-            break
-
-        rho_new = update_rho(
-            rho, rnorm, snorm, iteration=iteration_,
-            **(update_rho_options or {}))
-        # scaled dual variables should be also rescaled
-        # U_0 *= rho / rho_new
-        for m in range(1, n_times):
-            U_L, U_R = U_M[m]
+            U_L += K_L - Z_L
+            U_R += K_R - Z_R
+
+            # diagnostics, reporting, termination checks
+            rnorm = np.sqrt(squared_norm(K_L - Z_L) + squared_norm(K_R - Z_R))
+
+            snorm = rho * np.sqrt(
+                squared_norm(Z_L - Z_L_old) + squared_norm(Z_R - Z_R_old))
+
+            obj = objective(X, K, (Z_L, Z_R), alpha, weights, psi) \
+                if compute_objective else np.nan
+
+            check = convergence(
+                obj=obj, rnorm=rnorm, snorm=snorm,
+                e_pri=n_features * np.sqrt(n_constraints) * tol + rtol * max(
+                    np.sqrt(squared_norm(Z_L) + squared_norm(Z_R)),
+                    np.sqrt(np.dot(n_consensus, np.sum(K ** 2, axis=(1, 2))))),
+                e_dual=n_features * np.sqrt(n_constraints) * tol +
+                rtol * rho * np.sqrt(squared_norm(U_L) + squared_norm(U_R)))
+            Z_L_old, Z_R_old = Z_L, Z_R
+            inner_tol = max(tol, min(inner_tol, .1 * max(rnorm, snorm)))
+
+            if verbose:
+                print(
+                    "obj: %.4f, rnorm: %.4f, snorm: %.4f,"
+                    "eps_pri: %.4f, eps_dual: %.4f" % check[:5])
+
+            checks.append(check)
+            if stop_at is not None:
+                if abs(check.obj - stop_at) / abs(stop_at) < stop_when:
+                    break
+
+            if check.rnorm <= check.e_pri and check.snorm <= check.e_dual:
+                if inner_tol <= tol:
+                    break
+                # converged with inexact fits: refit them up to tol
+                inner_tol = tol
+
+            rho_new = update_rho(
+                rho, rnorm, snorm, iteration=iteration_,
+                **(update_rho_options or {}))
+            # scaled dual variables should be also rescaled
             U_L *= rho / rho_new
             U_R *= rho / rho_new
-        rho = rho_new
-    else:
-        warnings.warn("Objective did not converge.")
+            rho = rho_new
+        else:
+            warnings.warn("Objective did not converge.")
 
     return_list = [K]
     if return_history:
@@ -321,8 +323,9 @@ class TemporalPoissonModel(BaseEstimator):
         Choose if compute the objective function during iterations
         (only useful if `verbose=True`).
 
-    n_cores: int, default -1
-         Number of cores to use in parallel execution.
+    n_cores: int or None, default None
+         Number of cores to use in parallel execution. ``None`` means 1
+         unless in a :obj:`joblib.parallel_backend` context.
 
     Attributes
     ----------
@@ -342,7 +345,7 @@ class TemporalPoissonModel(BaseEstimator):
             tol=1e-4, rtol=1e-4, gamma=0.01,
             psi='laplacian', max_iter=100, verbose=False, return_history=False,
             compute_objective=True, ker_param=1,
-            max_iter_ext=100, n_cores=-1):
+            max_iter_ext=100, n_cores=None):
         self.alpha = alpha
         self.kernel = kernel
         self.rho = rho
@@ -447,7 +450,7 @@ class TemporalPoissonModel(BaseEstimator):
                 psi=self.psi, max_iter=self.max_iter, verbose=self.verbose,
                 return_n_iter=True, return_history=self.return_history,
                 compute_objective=self.compute_objective,
-                )
+                n_cores=self.n_cores)
             if self.return_history:
                 self.precision_,  self.history_, self.n_iter_ = out
             else:
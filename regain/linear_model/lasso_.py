@@ -38,8 +38,39 @@ from six.moves import range
 from regain.prox import soft_thresholding
 
 
+def _strong_rule(correlations, lamda):
+    """Features kept by the strong rule, from their correlations at 0.
+
+    The correlations A^T b are those of the solution at lamda_max, so this
+    is the sequential strong rule for the step from lamda_max to lamda.
+    It is not safe: the discarded features have to be checked (KKT).
+    """
+    correlations = np.abs(correlations)
+    return correlations >= 2 * lamda - np.max(correlations)
+
+
+def _gap_safe_screening(b_norm2, Atb, norms, x, correlations, lamda):
+    """Gap safe sphere test for min 1/2 ||Ax - b||^2 + lamda ||x||_1.
+
+    All quantities are restricted to the features still in the problem:
+    b_norm2 = ||b||^2, Atb = A^T b, norms are the norms of the columns of A
+    and correlations = A^T (b - Ax) at the current point x.
+    Returns the mask of the features that can be active at the optimum;
+    features on the boundary of the test are kept, against rounding errors.
+    """
+    scale = max(lamda, np.max(np.abs(correlations)))
+    b_residual = b_norm2 - Atb.dot(x)  # b^T (b - Ax)
+    residual_norm2 = b_residual - x.dot(correlations)
+    primal = .5 * residual_norm2 + lamda * np.abs(x).sum()
+    dual = lamda / scale * b_residual - \
+        .5 * (lamda / scale) ** 2 * residual_norm2
+    radius = np.sqrt(2 * max(primal - dual, 0)) / lamda
+    return np.abs(correlations) / scale + radius * norms >= 1 - 1e-8
+
+
 def lasso(A, b, lamda=1.0, rho=1.0, alpha=1.0, max_iter=1000,
-          tol=1e-4, rtol=1e-2, return_history=False):
+          tol=1e-4, rtol=1e-2, return_history=False, screening=None,
+          return_n_screened=False):
     r"""Solves the following problem via ADMM:
 
         minimize 1/2*|| Ax - b ||_2^2 + \lambda || x ||_1
@@ -64,18 +95,65 @@ def lasso(A, b, lamda=1.0, rho=1.0, alpha=1.0, max_iter=1000,
         Relative tolerance for convergence.
     return_history : bool, optional
         Return the history of computed values.
+    screening : {None, 'strong', 'safe'}, optional
+        Discard features before solving the problem. 'strong' uses the
+        strong rule and re-adds the features violating the KKT conditions,
+        'safe' the gap safe sphere test at 0.
+    return_n_screened : bool, optional
+        Return the number of features discarded by the screening.
 
     Returns
     -------
     x : numpy.array
-        Solution to the problem.
+        Solution to the problem. It is returned alone, not in a list, if
+        neither return_history nor return_n_screened (it used to be
+        returned twice, as (x, x)).
     history : list
         If return_history, then also a structure that contains the
         objective value, the primal and dual residual norms, and tolerances
-        for the primal and dual residual norms at each iteration.
+        for the primal and dual residual norms at each iteration (it used
+        to contain the last iteration only).
+    n_screened : int
+        If return_n_screened, the number of features discarded.
     """
     n_samples, n_features = A.shape
 
+    if screening is not None:
+        Atb = A.T.dot(b)
+        if screening == 'strong':
+            keep = _strong_rule(Atb, lamda)
+        elif screening == 'safe':
+            keep = _gap_safe_screening(
+                b.dot(b), Atb, np.linalg.norm(A, axis=0),
+                np.zeros(n_features), Atb, lamda)
+        else:
+            raise ValueError(
+                "Unknown screening %s. Options are 'strong', 'safe'" %
+                screening)
+
+        z = np.zeros(n_features)
+        hist = []
+        while True:
+            z[:] = 0
+            z[keep], hist_keep = lasso(
+                A[:, keep], b, lamda=lamda, rho=rho, alpha=alpha,
+                max_iter=max_iter, tol=tol, rtol=rtol, return_history=True)
+            hist.extend(hist_keep)
+            if screening != 'strong':
+                break
+            # KKT conditions of the discarded features
+            violations = ~keep & (np.abs(A.T.dot(b - A.dot(z))) > lamda)
+            if not np.any(violations):
+                break
+            keep |= violations
+
+        return_list = [z]
+        if return_history:
+            return_list.append(hist)
+        if return_n_screened:
+            return_list.append(n_features - np.sum(keep))
+        return return_list if len(return_list) > 1 else z
+
     # % save a matrix-vector multiply
     Atb = A.T.dot(b)
 
@@ -124,7 +202,12 @@ def lasso(A, b, lamda=1.0, rho=1.0, alpha=1.0, max_iter=1000,
         if history[1] < history[3] and history[2] < history[4]:
             break
 
-    return z, history if return_history else z
+    return_list = [z]
+    if return_history:
+        return_list.append(hist)
+    if return_n_screened:
+        return_list.append(0)
+    return return_list if len(return_list) > 1 else z
 
 
 def objective(A, b, alpha, x, z):
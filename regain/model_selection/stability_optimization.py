@@ -36,7 +36,7 @@ from itertools import product
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.special import binom
+from scipy.spatial.distance import pdist
 from scipy.stats import rankdata
 from sklearn.base import clone, is_classifier
 from sklearn.metrics.scorer import _check_multimetric_scoring
@@ -53,6 +53,88 @@ from sklearn.utils.validation import indexable
 warnings.simplefilter('ignore')
 
 
+def _edge_bits(precision):
+    """Pack the support of the upper triangle of a precision into bits.
+
+    Parameters
+    ----------
+    precision : ndarray, shape (..., n_features, n_features)
+        Precision matrix, or stack of precision matrices (e.g. one for each
+        time point).
+
+    Returns
+    -------
+    ndarray of uint8, shape (..., ceil(n_features * (n_features - 1) / 16))
+        Edge indicators of the graph(s), packed along the last axis.
+    """
+    precision = np.asarray(precision)
+    triu_idx = np.triu_indices(precision.shape[-1], 1)
+    return np.packbits(precision[..., triu_idx[0], triu_idx[1]] != 0,
+                       axis=-1)
+
+
+def _edge_frequencies(edge_bits, n_features):
+    """Frequency of each edge across the packed graphs of the estimators."""
+    n_edges = n_features * (n_features - 1) // 2
+    # unpackbits only takes `count` from numpy 1.17, drop the padding bits
+    support = np.unpackbits(np.asarray(edge_bits), axis=-1)[..., :n_edges]
+    return support.mean(axis=0)
+
+
+def _instability(mean_connectivity):
+    """Average edge instability given the edge frequencies."""
+    xi_matrix = 2 * mean_connectivity * (1 - mean_connectivity)
+    return np.sum(xi_matrix) / xi_matrix.size
+
+
+def _pack_edges(out):
+    """Replace the fitted estimator in `out` with its packed edges.
+
+    The number of nodes of the graph is appended, as it may differ from the
+    number of features of the data (e.g., with an intercept).
+    """
+    precision = out[-1].get_precision()
+    out[-1] = _edge_bits(precision)
+    out.append(precision.shape[-1])
+    return out
+
+
+def _fit_and_score_edges(estimator, *args, **kwargs):
+    """Fit an estimator and pack the support of its precision.
+
+    The support is computed by the worker as soon as the fit completes, so
+    that only the bits are needed to compute the instabilities, and the
+    fitted estimator is not returned. The number of nodes of the graph is
+    appended to the output.
+    """
+    return _pack_edges(_fit_and_score(estimator, *args, **kwargs))
+
+
+def _fit_path_and_score_edges(estimator, X, y, train, test, candidate_params,
+                              **kwargs):
+    """Fit an estimator along the parameter grid on a single split.
+
+    The parameters are visited in order, from high to low sparsity, and each
+    fit is warm-started from the precision of the previous one, if the
+    estimator has an `init` parameter.
+
+    Returns
+    -------
+    list:
+        The outputs of `_fit_and_score_edges`, one for each candidate.
+    """
+    warm_start = 'init' in estimator.get_params()
+    out = []
+    for parameters in candidate_params:
+        res = _fit_and_score(estimator, X, y, train=train, test=test,
+                             parameters=parameters, **kwargs)
+        precision = getattr(res[-1], 'precision_', None)
+        if warm_start and precision is not None:
+            estimator.set_params(init=np.copy(precision))
+        out.append(_pack_edges(res))
+    return out
+
+
 def global_instability(estimators):
     """Computes instability of the graphs inferred from estimators.
 
@@ -69,33 +151,81 @@ def global_instability(estimators):
     float:
         Instability value.
     """
-
     precisions = [estimator.get_precision() for estimator in estimators]
+    edges = [_edge_bits(precision) for precision in precisions]
+    return _instability(_edge_frequencies(edges, precisions[0].shape[-1]))
 
-    if precisions[0].ndim == 2:
-        n_times = 1
-        triu_idx = np.triu_indices_from(precisions[0], 1)
-        mean_connectivity = np.zeros_like(precisions[0])[triu_idx]
-        for c in precisions:
-            mean_connectivity += (c[triu_idx].copy() != 0).astype(int)
-    else:
-        # for tri dimensional matrices
-        n_times = precisions[0].shape[0]
-        triu_idx = np.triu_indices_from(precisions[0][0], 1)
-        mean_connectivity = np.array([
-            np.zeros_like(precisions[0][0])[triu_idx] for i in range(n_times)
-        ])
-        for c in precisions:
-            for i in range(n_times):
-                mean_connectivity[i] += (c[i][triu_idx].copy() !=
-                                         0).astype(int)
-
-    mean_connectivity /= len(estimators)
-    xi_matrix = 2 * mean_connectivity * (1 - mean_connectivity)
-    return np.sum(xi_matrix) / (binom(precisions[0].shape[1], 2) * n_times)
+
+def _graphlet_correlations(edge_bits, n_features):
+    """Graphlet correlation matrix of the graph encoded by `edge_bits`.
+
+    As in the GCD of netanalytics, the graphlet degree vectors are computed
+    for graphlets up to 4 nodes, and the Spearman correlations between their
+    11 non-redundant orbits are returned as the upper triangle of the
+    matrix. Constant orbits are uncorrelated with the others.
+    """
+    from netanalytics.graphlets import graphlet_degree_vectors
+    rows, cols = np.triu_indices(n_features, 1)
+    support = np.unpackbits(edge_bits)[:rows.size].astype(bool)
+    edges = list(zip(rows[support].tolist(), cols[support].tolist()))
+    gdv = np.asarray(graphlet_degree_vectors(list(range(n_features)), edges,
+                                             graphlet_size=4), dtype=float)
+    gdv = gdv[:, [0, 1, 2, 4, 5, 6, 7, 8, 9, 10, 11]]
+
+    ranks = np.apply_along_axis(rankdata, 0, gdv)
+    ranks -= ranks.mean(axis=0)
+    norms = np.linalg.norm(ranks, axis=0)
+    norms[norms == 0] = np.inf
+    ranks /= norms
+    gcm = ranks.T.dot(ranks)
+    return gcm[np.triu_indices_from(gcm, 1)]
+
+
+def _graphlet_instability(edge_bits, n_features, cache=None, n_jobs=None):
+    """Graphlet instability of the graphs of the estimators given their edges.
+
+    Parameters
+    ----------
+    edge_bits : ndarray, shape (n_estimators, [n_times,] n_bytes)
+        Packed edges of the graphs, as returned by `_edge_bits`.
+    n_features : int
+        Number of nodes of the graphs.
+    cache : dict, optional
+        Graphlet correlations of the graphs already computed, indexed by
+        their packed edges. It is updated with the new graphs.
+    n_jobs : int or None, optional
+        Number of jobs to compute the graphlet correlations of the graphs.
+
+    Returns
+    -------
+    float:
+        Graphlet instability value.
+    """
+    edge_bits = np.asarray(edge_bits)
+    n = edge_bits.shape[0]
+    edge_bits = edge_bits.reshape(n, -1, edge_bits.shape[-1])
+    cache = {} if cache is None else cache
+
+    # identical graphs are common, e.g. at high regularisation
+    keys = [[bits.tobytes() for bits in times] for times in edge_bits]
+    new_graphs = {}
+    for times, keys_times in zip(edge_bits, keys):
+        for bits, key in zip(times, keys_times):
+            if key not in cache:
+                new_graphs[key] = bits
+    gcms = Parallel(n_jobs=n_jobs)(
+        delayed(_graphlet_correlations)(bits, n_features)
+        for bits in new_graphs.values())
+    cache.update(zip(new_graphs.keys(), gcms))
+
+    # pairwise GCD of all the estimators, averaged over the time points
+    distances = np.mean([
+        pdist(np.array([cache[key] for key in keys_times]))
+        for keys_times in zip(*keys)], axis=0)
+    return 2 / (n * (n - 1)) * np.sum(distances)
 
 
-def graphlet_instability(estimators):
+def graphlet_instability(estimators, n_jobs=None):
     """
     Computes graphlet instability of the graphs inferred from estimators.
 
@@ -106,79 +236,43 @@ def graphlet_instability(estimators):
         Each estimator contains the inferred adjacency matrix that is taken
         to compute the global instability of the list of estimator.
 
+    n_jobs : int or None, optional
+        Number of jobs to compute the graphlet correlations of the graphs.
+
 
     Returns
     -------
     float:
         Graphlet instability value.
     """
-
-    from netanalytics.graphlets import GCD, graphlet_degree_vectors
-    import networkx as nx
-    n = len(estimators)
     precisions = [estimator.get_precision() for estimator in estimators]
-
-    if precisions[0].ndim == 2:
-        gdvs = []
-        for p in precisions:
-            g = nx.from_numpy_array(p - np.diag(np.diag(p)))
-            gdvs.append(
-                graphlet_degree_vectors(list(g.nodes),
-                                        list(g.edges),
-                                        graphlet_size=4))
-        distances = []
-        for i in range(len(gdvs)):
-            for j in range(i + 1, len(gdvs)):
-                distances.append(GCD(gdvs[i], gdvs[j])[1])
-    else:
-        n_times = precisions[0].shape[0]
-        gdvs = []
-        for p in precisions:
-            times = []
-            for t in range(n_times):
-                g = nx.from_numpy_array(p[t] - np.diag(np.diag(p[t])))
-                times.append(
-                    graphlet_degree_vectors(list(g.nodes),
-                                            list(g.edges),
-                                            graphlet_size=4))
-            gdvs.append(times)
-
-        distances = []
-        for i in range(len(gdvs)):
-            for j in range(i + 1, len(gdvs)):
-                distance = 0
-                for t in range(n_times):
-                    distance += GCD(gdvs[i][t], gdvs[j][t])[1]
-                distances.append(distance / n_times)
-    return 2 / (n * (n - 1)) * np.sum(distances)
+    edges = [_edge_bits(precision) for precision in precisions]
+    return _graphlet_instability(edges, precisions[0].shape[-1],
+                                 n_jobs=n_jobs)
 
 
 def upper_bound(estimators):
-    precisions = [estimator.get_precision() for estimator in estimators]
-    if precisions[0].ndim == 2:
-        n_times = 1
-        triu_idx = np.triu_indices_from(precisions[0], 1)
-        mean_connectivity = np.zeros_like(precisions[0])[triu_idx]
-        for c in precisions:
-            mean_connectivity += (c[triu_idx].copy() != 0).astype(int)
-    else:
-        # for tri-dimensional matrices
-        n_times = precisions[0].shape[0]
-        triu_idx = np.triu_indices_from(precisions[0][0], 1)
-        mean_connectivity = np.array([
-            np.zeros_like(precisions[0][0])[triu_idx] for i in range(n_times)
-        ])
-        for c in precisions:
-            for i in range(n_times):
-                mean_connectivity[i] += (c[i][triu_idx].copy() !=
-                                         0).astype(int)
-    mean_connectivity /= len(estimators)
-    xi_matrix = 2 * mean_connectivity * (1 - mean_connectivity)
+    """Upper bound of the instability used to select the graphlet stability.
+
+    It is computed as 4 * theta * (1 - theta), where theta is the edge
+    instability of the graphs of the estimators (see `global_instability`).
+    With mode='gstars', the search for the most graphlet-stable parameter
+    starts from the last candidate whose bound is at most 0.05.
+
+    Parameters
+    ----------
+
+    estimators: list of fitted graphical models estimator
+        Each estimator contains the inferred adjacency matrix that is taken
+        to compute the global instability of the list of estimator.
 
-    p = precisions[0].shape[1]
-    theta_hat = np.sum(xi_matrix)
-    theta_hat = theta_hat/(p*(p-1)/2) if precisions[0].ndim == 2 \
-        else theta_hat/(n_times*p*(p-1)/2)
+
+    Returns
+    -------
+    float:
+        Upper bound value.
+    """
+    theta_hat = global_instability(estimators)
     return 4 * theta_hat * (1 - theta_hat)
 
 
@@ -267,6 +361,12 @@ class GraphicalModelStabilitySelection(GridSearchCV):
         The sample size to each repetition of the stability procedure. If None
         value is taken as ` int(min(10*np.sqrt(X.shape[0]), X.shape[0]-10))`
 
+    scheduling: {'grid', 'path'}, optional default 'grid'
+        If 'grid', each (parameters, subsample) pair is fitted in a separate
+        job. If 'path', each job takes one subsample and fits the whole
+        ordered grid as a path, warm-starting each fit from the previous
+        precision if the estimator has an `init` parameter.
+
     """
     def __init__(self,
                  estimator,
@@ -282,7 +382,8 @@ class GraphicalModelStabilitySelection(GridSearchCV):
                  mode='stars',
                  return_train_score=False,
                  n_repetitions=10,
-                 sampling_size=None):
+                 sampling_size=None,
+                 scheduling='grid'):
         super(GraphicalModelStabilitySelection, self).__init__(
             estimator=estimator,
             scoring=scoring,
@@ -299,6 +400,7 @@ class GraphicalModelStabilitySelection(GridSearchCV):
         self.mode = mode
         self.n_repetitions = n_repetitions
         self.sampling_size = sampling_size
+        self.scheduling = scheduling
         self.param_grid = _check_param_order(param_grid)
 
     def fit(self, X, y=None, groups=None, **fit_params):
@@ -318,6 +420,9 @@ class GraphicalModelStabilitySelection(GridSearchCV):
             Parameters passed to the ``fit`` method of the estimator
         """
         estimator = self.estimator
+        if self.scheduling not in ('grid', 'path'):
+            raise ValueError("scheduling must be 'grid' or 'path', got %r" %
+                             self.scheduling)
 
         if self.sampling_size is None:
             self.sampling_size = int(
@@ -393,16 +498,30 @@ class GraphicalModelStabilitySelection(GridSearchCV):
                           " totalling {2} fits".format(
                               n_splits, n_candidates, n_candidates * n_splits))
 
-                out = parallel(
-                    delayed(_fit_and_score)(clone(base_estimator),
-                                            X,
-                                            y,
-                                            train=train,
-                                            test=test,
-                                            parameters=parameters,
-                                            **fit_and_score_kwargs)
-                    for parameters, (train, test) in product(
-                        candidate_params, cv.split(X, y, groups)))
+                if self.scheduling == 'path':
+                    out = parallel(
+                        delayed(_fit_path_and_score_edges)(
+                            clone(base_estimator),
+                            X,
+                            y,
+                            train=train,
+                            test=test,
+                            candidate_params=candidate_params,
+                            **fit_and_score_kwargs)
+                        for train, test in cv.split(X, y, groups))
+                    # order the results by candidate, then by split
+                    out = [res for split_res in zip(*out) for res in split_res]
+                else:
+                    out = parallel(
+                        delayed(_fit_and_score_edges)(clone(base_estimator),
+                                                      X,
+                                                      y,
+                                                      train=train,
+                                                      test=test,
+                                                      parameters=parameters,
+                                                      **fit_and_score_kwargs)
+                        for parameters, (train, test) in product(
+                            candidate_params, cv.split(X, y, groups)))
 
                 if len(out) < 1:
                     raise ValueError('No fits were performed. '
@@ -471,10 +590,12 @@ class GraphicalModelStabilitySelection(GridSearchCV):
         # if one choose to see train score, "out" will contain train score info
         if self.return_train_score:
             (train_score_dicts, test_score_dicts, test_sample_counts, fit_time,
-             score_time, estimators) = zip(*out)
+             score_time, edges, n_features) = zip(*out)
         else:
             (test_score_dicts, test_sample_counts, fit_time, score_time,
-             estimators) = zip(*out)
+             edges, n_features) = zip(*out)
+        # number of nodes of the graphs, the same for all the fits
+        n_features = n_features[0]
 
         # test_score_dicts and train_score dicts are lists of dictionaries and
         # we make them into dict of lists
@@ -555,9 +676,12 @@ class GraphicalModelStabilitySelection(GridSearchCV):
                        train_scores[scorer_name],
                        splits=True)
 
-        estimators = np.asarray(estimators).reshape(n_candidates, n_splits)
-        array_means = np.array(
-            [global_instability(e_split) for e_split in estimators])
+        # the packed edges of all the fits are reduced along the splits at once
+        edges = np.asarray(edges)
+        edges = edges.reshape((n_candidates, n_splits) + edges.shape[1:])
+        mean_connectivity = _edge_frequencies(
+            np.moveaxis(edges, 1, 0), n_features)
+        array_means = np.array([_instability(m) for m in mean_connectivity])
 
         # monotonize instabilities - require ordered parameters,
         # from high sparsity to low
@@ -569,12 +693,16 @@ class GraphicalModelStabilitySelection(GridSearchCV):
         self.monotonized_instabilities = np.copy(monotonized_instabilities)
 
         if self.mode.lower() == 'gstars':
-            graphlets_stability = np.array(
-                [graphlet_instability(e_split) for e_split in estimators])
+            # graphlet correlations are shared among the candidates
+            cache = {}
+            graphlets_stability = np.array([
+                _graphlet_instability(e_split, n_features, cache=cache,
+                                      n_jobs=self.n_jobs)
+                for e_split in edges
+            ])
             self.graphlets_instabilities = np.copy(graphlets_stability)
 
-            upper_bounds = np.array(
-                [upper_bound(e_split) for e_split in estimators])
+            upper_bounds = 4 * array_means * (1 - array_means)
             upper_bounds = [upper_bounds[0]] + [
                 np.max(upper_bounds[:i]) for i in range(1, upper_bounds.size)
             ]
@@ -174,11 +174,15 @@ def prox_linf(a, lamda):
     return x
 
 
-def prox_logdet(a, lamda):
-    """Time-varying latent variable graphical lasso prox."""
+def prox_logdet(a, lamda, return_eigen=False):
+    """Time-varying latent variable graphical lasso prox.
+
+    If `return_eigen`, also return the eigenvalues of the result.
+    """
     es, Q = np.linalg.eigh(a)
     xi = (-es + np.sqrt(np.square(es) + 4. / lamda)) * lamda / 2.
-    return np.linalg.multi_dot((Q, np.diag(xi), Q.T))
+    x = np.linalg.multi_dot((Q, np.diag(xi), Q.T))
+    return (x, xi) if return_eigen else x
 
 
 def prox_logdet_ala_ma(a, lamda):
@@ -187,11 +191,15 @@ def prox_logdet_ala_ma(a, lamda):
     return np.linalg.multi_dot((Q, np.diag(xi), Q.T))
 
 
-def prox_trace_indicator(a, lamda):
-    """Time-varying latent variable graphical lasso prox."""
+def prox_trace_indicator(a, lamda, return_eigen=False):
+    """Time-varying latent variable graphical lasso prox.
+
+    If `return_eigen`, also return the eigenvalues of the result.
+    """
     es, Q = np.linalg.eigh(a)
     xi = np.maximum(es - lamda, 0)
-    return np.linalg.multi_dot((Q, np.diag(xi), Q.T))
+    x = np.linalg.multi_dot((Q, np.diag(xi), Q.T))
+    return (x, xi) if return_eigen else x
 
 
 def prox_laplacian(a, lamda):
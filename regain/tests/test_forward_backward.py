@@ -0,0 +1,255 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test the forward-backward time-varying graphical lasso."""
+import warnings
+from functools import partial
+from unittest import SkipTest
+
+import numpy as np
+from numpy.testing import (assert_almost_equal, assert_array_almost_equal,
+                           assert_array_equal)
+from scipy import linalg
+
+from regain.forward_backward import time_graphical_lasso_
+from regain.forward_backward import time_graphical_lasso_laplacian
+from regain.covariance.graphical_lasso_ import logl
+from regain.norm import vector_p_norm
+from regain.prox import soft_thresholding_od
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+fista_step = time_graphical_lasso_laplacian.fista_step
+
+
+def _empirical_covariances(n_times=2):
+    rng = np.random.RandomState(0)
+    X = [rng.randn(100, 3) for _ in range(n_times)]
+    emp_cov = np.array([np.cov(x, rowvar=False, bias=True) for x in X])
+    return emp_cov, np.array([x.shape[0] for x in X])
+
+
+def _skip_without_prox_tv():
+    try:
+        import prox_tv  # noqa
+    except ImportError:
+        raise SkipTest("prox_tv is required for the l1 temporal penalty")
+
+
+def _non_positive_definite_step(Y, Y_diff, t):
+    """Extrapolate, then flip the sign of the point."""
+    V, t_next = fista_step(Y, Y_diff, t)
+    return -V, t_next
+
+
+def test_loss_cholesky():
+    """Check the loss and the inverse from the Cholesky factors."""
+    emp_cov, n_samples = _empirical_covariances()
+    module = time_graphical_lasso_
+    K = np.linalg.inv(emp_cov)
+    fx, chol = module._loss_cholesky(K, emp_cov, n_samples, vareps=1e-2)
+    assert_almost_equal(fx, module.loss(emp_cov, K, n_samples, vareps=1e-2))
+    assert_array_almost_equal(
+        module._cholesky_inverse(chol),
+        np.array([linalg.pinvh(k) for k in K]))
+
+    # a single indefinite slice makes the loss infinite
+    K[1, 0, 0] = -1
+    assert module._loss_cholesky(K, emp_cov, n_samples) == (np.inf, None)
+
+
+def test_choose_lamda_loss():
+    """Check the loss returned by the line search on the step."""
+    emp_cov, n_samples = _empirical_covariances()
+    module = time_graphical_lasso_
+    K = np.linalg.inv(emp_cov)
+    grad = module.grad_loss(K, emp_cov, n_samples)
+    # a step towards a far, still positive definite, point
+    prox = 5 * K
+    lamda, _, fy, chol = module.choose_lamda(
+        1., K, emp_cov, n_samples, beta=1., alpha=.1, gamma=1., grad=grad,
+        prox=prox, vareps=0, return_loss=True)
+    x1 = K + lamda * (prox - K)
+    assert lamda < 1
+    assert_almost_equal(fy, module.loss(emp_cov, x1, n_samples))
+    assert_array_almost_equal(chol, np.linalg.cholesky(x1))
+
+
+def _laplacian_loss_loop(S, K, beta, n_samples, vareps):
+    loss = sum(-ni * logl(emp_cov, precision)
+               for emp_cov, precision, ni in zip(S, K, n_samples))
+    loss += vareps / 2. * np.sum(K * K)
+    return loss + beta * np.sum((K[1:] - K[:-1]) ** 2)
+
+
+def _laplacian_grad_loss_loop(x, emp_cov, beta, n_samples, vareps):
+    x_inv = np.array([linalg.pinvh(_) for _ in x])
+    grad = (emp_cov - x_inv) * n_samples[:, None, None] + vareps * x
+    aux = np.empty_like(x)
+    aux[0] = x[0] - x[1]
+    aux[-1] = x[-1] - x[-2]
+    for t in range(1, x.shape[0] - 1):
+        aux[t] = 2 * x[t] - x[t - 1] - x[t + 1]
+    return grad + 2 * beta * aux
+
+
+def test_laplacian_loss():
+    """Check loss and gradient against the computation on each slice."""
+    module = time_graphical_lasso_laplacian
+    for n_times in (2, 5):
+        emp_cov, n_samples = _empirical_covariances(n_times)
+        K = np.linalg.inv(emp_cov)
+        assert_almost_equal(
+            module.loss(emp_cov, K, .5, n_samples, vareps=1e-2),
+            _laplacian_loss_loop(emp_cov, K, .5, n_samples, 1e-2))
+        assert_array_almost_equal(
+            module.grad_loss(K, emp_cov, .5, n_samples, vareps=1e-2),
+            _laplacian_grad_loss_loop(K, emp_cov, .5, n_samples, 1e-2))
+
+        # a single non positive definite slice makes the loss infinite
+        K[-1] *= -1
+        assert module.loss(emp_cov, K, .5, n_samples) == np.inf
+
+
+def test_laplacian_prox_penalty():
+    """Check the off-diagonal soft-thresholding against each slice."""
+    module = time_graphical_lasso_laplacian
+    emp_cov, _ = _empirical_covariances(4)
+    K = np.linalg.inv(emp_cov)
+    assert_array_equal(
+        module.prox_penalty(K, .3),
+        np.array([soft_thresholding_od(k, .3) for k in K]))
+
+    # one regularisation parameter per time
+    alpha = np.array([.1, .3, .5, 5.])[:, None, None] * np.ones_like(K)
+    prox = module.prox_penalty(K, alpha)
+    assert_array_equal(
+        prox, np.array([soft_thresholding_od(k, a[0, 0])
+                        for k, a in zip(K, alpha)]))
+    assert_array_equal(prox[-1], np.diag(np.diag(K[-1])))
+    assert_almost_equal(
+        module.penalty(K, alpha),
+        sum(a[0, 0] * (np.abs(k).sum() - np.abs(np.diag(k)).sum())
+            for k, a in zip(K, alpha)))
+
+
+def test_fista_laplacian():
+    """Check that FISTA reaches the solution of forward-backward, faster."""
+    emp_cov, n_samples = _empirical_covariances()
+    module = time_graphical_lasso_laplacian
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        K_fb, _, n_iter_fb = module.time_graph_lasso(
+            emp_cov, n_samples, alpha=0.5, max_iter=2000, tol=1e-8)
+        for restart in ('gradient', 'function'):
+            K, _, n_iter = module.time_graph_lasso(
+                emp_cov, n_samples, alpha=0.5, max_iter=2000, tol=1e-8,
+                mode='fista', restart=restart)
+
+            assert n_iter < n_iter_fb
+            assert module.objective(n_samples, emp_cov, K, 0.5, 1.) <= \
+                module.objective(n_samples, emp_cov, K_fb, 0.5, 1.)
+            assert_array_almost_equal(K, K_fb, decimal=2)
+
+
+def test_fista_laplacian_restart():
+    """Check that both schemes reset the momentum."""
+    emp_cov, n_samples = _empirical_covariances()
+    module = time_graphical_lasso_laplacian
+    for restart in ('gradient', 'function'):
+        with mock.patch.object(module, 'fista_step',
+                               wraps=module.fista_step) as step:
+            module.time_graph_lasso(
+                emp_cov, n_samples, alpha=0.5, max_iter=2000, tol=1e-8,
+                mode='fista', restart=restart)
+
+        # the first step after a restart starts again from t = 1
+        ts = [args[2] for args, _ in step.call_args_list]
+        assert ts.count(1.) > 1
+
+
+def test_fista_laplacian_non_positive_definite():
+    """Check that non positive definite extrapolations are discarded."""
+    emp_cov, n_samples = _empirical_covariances()
+    module = time_graphical_lasso_laplacian
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        K_fb, _, n_iter_fb = module.time_graph_lasso(
+            emp_cov, n_samples, alpha=0.5, max_iter=200)
+        with mock.patch.object(module, 'fista_step',
+                               side_effect=_non_positive_definite_step):
+            K, _, n_iter = module.time_graph_lasso(
+                emp_cov, n_samples, alpha=0.5, max_iter=200, mode='fista')
+
+    # every step restarts, so FISTA falls back to forward-backward
+    assert n_iter == n_iter_fb
+    assert_array_equal(K, K_fb)
+
+
+def test_fista_non_positive_definite():
+    """Check that non positive definite extrapolations are discarded."""
+    _skip_without_prox_tv()
+    emp_cov, n_samples = _empirical_covariances()
+    module = time_graphical_lasso_
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        K_fb, _, n_iter_fb = module.time_graph_lasso(
+            emp_cov, n_samples, alpha=0.5, max_iter=200)
+        with mock.patch.object(module, 'fista_step',
+                               side_effect=_non_positive_definite_step):
+            K, _, n_iter = module.time_graph_lasso(
+                emp_cov, n_samples, alpha=0.5, max_iter=200, mode='fista')
+
+    assert n_iter == n_iter_fb
+    assert_array_equal(K, K_fb)
+
+
+def test_fista():
+    """Check that FISTA reaches the solution of forward-backward."""
+    _skip_without_prox_tv()
+    emp_cov, n_samples = _empirical_covariances()
+    module = time_graphical_lasso_
+    psi = partial(vector_p_norm, p=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        K_fb, _, _ = module.time_graph_lasso(
+            emp_cov, n_samples, alpha=0.5, max_iter=2000, tol=1e-8)
+        for restart in ('gradient', 'function'):
+            K, _, _ = module.time_graph_lasso(
+                emp_cov, n_samples, alpha=0.5, max_iter=2000, tol=1e-8,
+                mode='fista', restart=restart)
+
+            # both stop on the relative change of the iterates, so compare
+            # the solutions instead of the number of iterations
+            assert module.objective(n_samples, emp_cov, K, 0.5, 1., psi) <= \
+                module.objective(n_samples, emp_cov, K_fb, 0.5, 1., psi) + 1e-6
+            assert_array_almost_equal(K, K_fb, decimal=2)
@@ -0,0 +1,76 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test Gaussian_GLM_GM."""
+import numpy as np
+
+from numpy.testing import assert_array_almost_equal
+from sklearn.linear_model import Lasso
+
+from regain.generalized_linear_model.glm_gaussian import (
+    Gaussian_GLM_GM, fit_each_variable)
+
+
+def test_gaussian_coordinate_descent():
+    """Check the node regressions against the lasso of scikit-learn."""
+    rng = np.random.RandomState(0)
+    X = rng.randn(100, 6)
+    X[:, 1] += X[:, 0]
+    gram = X.T.dot(X) / X.shape[0]
+    for ix in range(X.shape[1]):
+        selector = np.arange(X.shape[1]) != ix
+        coef = Lasso(alpha=.05, fit_intercept=False, tol=1e-10).fit(
+            X[:, selector], X[:, ix]).coef_
+        assert_array_almost_equal(
+            fit_each_variable(X, ix, alpha=.05, tol=1e-8, gram=gram)[0], coef)
+
+
+def test_gaussian_screening():
+    """Screening does not change the node regressions."""
+    rng = np.random.RandomState(0)
+    X = rng.randn(100, 20)
+    X[:, 1] += X[:, 0]
+    X[:, 2:6] += .5 * X[:, :1]
+    for alpha in (.05, .2, .6):
+        theta = fit_each_variable(X, 0, alpha=alpha, tol=1e-10)[0]
+        for screening in ('strong', 'safe'):
+            assert_array_almost_equal(
+                fit_each_variable(
+                    X, 0, alpha=alpha, tol=1e-10, screening=screening)[0],
+                theta)
+
+
+def test_gaussian_n_jobs():
+    """Parallel and sequential node regressions give the same model."""
+    rng = np.random.RandomState(0)
+    X = rng.randn(100, 6)
+    X[:, 1] += X[:, 0]
+    assert_array_almost_equal(
+        Gaussian_GLM_GM(alpha=.05, n_jobs=2).fit(X).precision_,
+        Gaussian_GLM_GM(alpha=.05, n_jobs=1).fit(X).precision_)
@@ -0,0 +1,129 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test IsingGraphicalModel."""
+import numpy as np
+
+from numpy.testing import assert_almost_equal
+from scipy import sparse
+
+from regain.generalized_linear_model.glm_ising import (
+    IsingGraphicalModel, _fit, _gradient_ising, loss, objective)
+
+
+def test_ising_gradient():
+    """Check the pseudo-likelihood against the node-by-node computation."""
+    rng = np.random.RandomState(0)
+    n_samples, n_features = 40, 5
+    X = rng.choice([-1., 1.], size=(n_samples, n_features))
+    theta = rng.randn(n_features, n_features)
+    theta += theta.T
+
+    objective = 0
+    for r in range(n_features):
+        selector = np.arange(n_features) != r
+        XT = X[:, selector].dot(theta[selector, r])
+        objective += np.sum(np.log(np.exp(XT) + np.exp(-XT)) - X[:, r] * XT)
+    assert_almost_equal(loss(X, theta), objective / n_samples)
+
+    # node r contributes row r of the gradient, theta is symmetric
+    grad = _gradient_ising(X, theta, n_samples)
+    eps = 1e-6
+    for r in range(n_features):
+        for j in range(r + 1, n_features):
+            delta = np.zeros_like(theta)
+            delta[r, j] = delta[j, r] = eps
+            numerical = (loss(X, theta + delta) -
+                         loss(X, theta - delta)) / (2 * eps)
+            assert_almost_equal(grad[r, j] + grad[j, r], numerical)
+
+    # the pseudo-likelihood is only defined for symmetric parameters
+    theta[0, 1] += 1
+    assert loss(X, theta) == np.inf
+
+
+def test_ising_sgd():
+    """The stochastic solver reaches the full-batch objective."""
+    rng = np.random.RandomState(0)
+    X = rng.choice([-1., 1.], size=(2000, 5))
+    X[:, 1] = np.where(rng.rand(2000) < .2, -X[:, 0], X[:, 0])
+    theta_gd = _fit(X, alpha=.01, gamma=.5, tol=1e-8, max_iter=1000)[0]
+    theta_sgd = _fit(X, alpha=.01, gamma=.1, tol=1e-8, max_iter=30,
+                     solver='sgd', random_state=0)[0]
+    assert_almost_equal(
+        objective(X, theta_sgd, .01), objective(X, theta_gd, .01), decimal=5)
+
+
+def test_ising_sparse():
+    """Sparse and dense data give the same model."""
+    rng = np.random.RandomState(0)
+    X = rng.choice([-1., 1.], size=(200, 5))
+    X[:, 1] = np.where(rng.rand(200) < .2, -X[:, 0], X[:, 0])
+    # spins in {-1, 1}, and {0, 1} data for the logistic regressions
+    for mode, data in (('symmetric_fbs', X),
+                       ('logistic_regression', (X + 1) / 2)):
+        precision = IsingGraphicalModel(
+            alpha=.01, gamma=.5, mode=mode).fit(data).precision_
+        for fmt in (sparse.csr_matrix, sparse.csc_matrix):
+            assert_almost_equal(
+                IsingGraphicalModel(
+                    alpha=.01, gamma=.5, mode=mode).fit(fmt(data)).precision_,
+                precision)
+
+
+def test_ising_n_jobs():
+    """Parallel and sequential logistic regressions give the same model."""
+    rng = np.random.RandomState(0)
+    X = rng.choice([0., 1.], size=(200, 5))
+    X[:, 1] = np.where(rng.rand(200) < .2, 1 - X[:, 0], X[:, 0])
+    for data in (X, sparse.csr_matrix(X)):
+        assert_almost_equal(
+            IsingGraphicalModel(
+                alpha=.01, mode='logistic_regression',
+                n_jobs=2).fit(data).precision_,
+            IsingGraphicalModel(
+                alpha=.01, mode='logistic_regression',
+                n_jobs=1).fit(data).precision_)
+
+
+def test_ising_sparse_duplicates():
+    """Duplicate entries of sparse data are summed in the gradient."""
+    rng = np.random.RandomState(0)
+    X = rng.choice([-1., 1.], size=(40, 5))
+    theta = rng.randn(5, 5)
+    theta += theta.T
+    # each spin split in two entries with the same coordinates
+    row, col = np.nonzero(X)
+    X_dup = sparse.coo_matrix(
+        (np.tile(X[row, col] / 2, 2), (np.tile(row, 2), np.tile(col, 2))),
+        shape=X.shape)
+    for fmt in (sparse.coo_matrix, sparse.csr_matrix):
+        assert_almost_equal(
+            _gradient_ising(fmt(X_dup), theta, 40),
+            _gradient_ising(X, theta, 40))
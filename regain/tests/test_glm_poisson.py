@@ -0,0 +1,166 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test PoissonGraphicalModel."""
+import warnings
+
+import numpy as np
+from numpy.testing import assert_almost_equal, assert_array_almost_equal
+from scipy import sparse
+
+from regain.generalized_linear_model import glm_poisson
+from regain.generalized_linear_model.glm_poisson import (
+    PoissonGraphicalModel, fit_each_variable, loss, loss_single_variable,
+    objective_single_variable)
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def test_poisson_loss():
+    """Check the pseudo-likelihood against the sample-by-sample computation."""
+    rng = np.random.RandomState(0)
+    n_samples, n_features = 40, 5
+    X = rng.poisson(1., size=(n_samples, n_features)).astype(float)
+    theta = .1 * rng.randn(n_features, n_features)
+
+    objective = 0
+    for r in range(n_features):
+        selector = [i for i in range(n_features) if i != r]
+        objective_r = 0
+        for x in X:
+            XT = x[selector].dot(theta[r, selector])
+            objective_r += np.exp(XT) - x[r] * XT
+        assert_almost_equal(
+            loss_single_variable(
+                X, theta[r, selector], n_samples, r, selector),
+            objective_r / n_samples)
+        objective += objective_r
+    assert_almost_equal(loss(X, theta), objective / n_samples)
+
+
+def test_poisson_line_search():
+    """The objective does not increase along the iterations."""
+    rng = np.random.RandomState(0)
+    X = rng.poisson(1., size=(100, 5)).astype(float)
+    _, _, checks = fit_each_variable(X, 0, alpha=.05, gamma=1., tol=1e-8)
+    obj = np.array([c.obj for c in checks])
+    assert np.all(np.diff(obj) <= 1e-12)
+
+
+def test_poisson_sgd():
+    """The stochastic solver reaches the full-batch objective."""
+    rng = np.random.RandomState(0)
+    X = rng.poisson(1., size=(2000, 5)).astype(float)
+    X[:, 1] = rng.poisson(X[:, 0] + .5)
+    selector = [1, 2, 3, 4]
+    theta_gd = fit_each_variable(X, 0, alpha=.01, tol=1e-10, max_iter=2000)[0]
+    obj_gd = objective_single_variable(X, theta_gd, 2000, 0, selector, .01)
+    for gamma in (.1, 1.):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            theta_sgd = fit_each_variable(
+                X, 0, alpha=.01, gamma=gamma, tol=1e-8, max_iter=30,
+                solver='sgd', random_state=0)[0]
+        assert_almost_equal(
+            objective_single_variable(X, theta_sgd, 2000, 0, selector, .01),
+            obj_gd, decimal=5)
+        # too large a step diverges, and it is reduced with a warning
+        assert any('diverged' in str(warning.message) for warning in w) == \
+            (gamma == 1.)
+
+
+def test_poisson_sparse():
+    """Sparse and dense counts give the same model."""
+    rng = np.random.RandomState(0)
+    X = rng.poisson(.1, size=(200, 5)).astype(float)
+    precision = PoissonGraphicalModel(alpha=.01).fit(X).precision_
+    for fmt in (sparse.csr_matrix, sparse.csc_matrix):
+        assert_almost_equal(
+            PoissonGraphicalModel(alpha=.01).fit(fmt(X)).precision_,
+            precision)
+
+
+def _strongest(gradient, alpha):
+    """Keep only the feature with the largest gradient."""
+    gradient = np.abs(gradient)
+    return gradient == np.max(gradient)
+
+
+def _assert_same_regression(X, theta_screening, theta, alpha):
+    """Same support, objective and, to the solver accuracy, coefficients."""
+    selector = list(range(1, X.shape[1]))
+    assert np.array_equal(theta_screening != 0, theta != 0)
+    assert_almost_equal(
+        objective_single_variable(X, theta_screening, X.shape[0], 0,
+                                  selector, alpha),
+        objective_single_variable(X, theta, X.shape[0], 0, selector, alpha),
+        decimal=12)
+    # the solver stops on the norm of the step, not on the distance to the
+    # solution, so the coefficients of different paths agree to ~1e-8
+    assert_array_almost_equal(theta_screening, theta, decimal=6)
+
+
+def test_poisson_screening():
+    """The strong rule does not change the node regressions."""
+    rng = np.random.RandomState(0)
+    X = rng.poisson(1., size=(200, 20)).astype(float)
+    X[:, 1] = rng.poisson(X[:, 0] + .5)
+    alpha_max = np.max(np.abs(X[:, 1:].T.dot(X[:, 0] - 1))) / X.shape[0]
+    for alpha in (.8 * alpha_max, .1 * alpha_max):
+        theta = fit_each_variable(X, 0, alpha=alpha, tol=1e-10,
+                                  max_iter=2000)[0]
+        theta_screening, _, checks = fit_each_variable(
+            X, 0, alpha=alpha, tol=1e-10, max_iter=2000, screening='strong')
+        _assert_same_regression(X, theta_screening, theta, alpha)
+        if alpha == .8 * alpha_max:
+            assert checks[-1].n_screened > 0
+
+    # the features discarded by the strong rule are re-added
+    with mock.patch.object(glm_poisson, '_strong_rule',
+                           side_effect=_strongest), \
+            mock.patch.object(glm_poisson, 'fit_each_variable',
+                              wraps=fit_each_variable) as fit:
+        theta_screening = fit_each_variable(
+            X, 0, alpha=alpha, tol=1e-10, max_iter=2000,
+            screening='strong')[0]
+    assert fit.call_count > 1
+    _assert_same_regression(X, theta_screening, theta, alpha)
+
+
+def test_poisson_n_jobs():
+    """Parallel and sequential node regressions give the same model."""
+    rng = np.random.RandomState(0)
+    X = rng.poisson(.1, size=(200, 5)).astype(float)
+    for data in (X, sparse.csc_matrix(X)):
+        assert_array_almost_equal(
+            PoissonGraphicalModel(alpha=.01, n_jobs=2).fit(data).precision_,
+            PoissonGraphicalModel(alpha=.01, n_jobs=1).fit(data).precision_)
@@ -0,0 +1,93 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test the temporal Poisson graphical model."""
+import warnings
+
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+from regain.generalized_linear_model import glm_time_poisson
+from regain.generalized_linear_model.glm_poisson import fit_each_variable
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def _poisson_data():
+    rng = np.random.RandomState(0)
+    X = rng.poisson(1., size=(3, 100, 4)).astype(float)
+    X[:, :, 1] = rng.poisson(X[:, :, 0] + .5)
+    return X
+
+
+def test_time_poisson_n_cores():
+    """Parallel and sequential time point fits give the same model."""
+    X = _poisson_data()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        K = glm_time_poisson._fit_time_poisson_model(
+            X, alpha=.01, kernel=np.ones((3, 3)), n_cores=1)[0]
+        assert_array_almost_equal(
+            glm_time_poisson._fit_time_poisson_model(
+                X, alpha=.01, kernel=np.ones((3, 3)), n_cores=2)[0], K)
+
+
+def test_time_poisson_warm_start():
+    """Warm and cold started node fits reach the same solution."""
+    X = _poisson_data()[0]
+    rng = np.random.RandomState(0)
+    A = .1 * rng.randn(4, 4)
+    A += A.T
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for ix in range(X.shape[1]):
+            params = dict(alpha=.01, tol=1e-10, max_iter=5000, A=A, T=3,
+                          rho=1.)
+            assert_array_almost_equal(
+                fit_each_variable(
+                    X, ix, warm_start=np.delete(A[ix], ix), **params)[0],
+                fit_each_variable(X, ix, **params)[0])
+
+
+def test_time_poisson_inner_tol():
+    """The time point fits get more accurate, up to the final tolerance."""
+    X = _poisson_data()
+    with mock.patch.object(glm_time_poisson, '_fit_time_point',
+                           wraps=glm_time_poisson._fit_time_point) as fit, \
+            warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        glm_time_poisson._fit_time_poisson_model(
+            X, alpha=.01, kernel=np.ones((3, 3)), tol=1e-4, rtol=1e-4)
+    inner_tol = np.array([kwargs['tol'] for _, kwargs in fit.call_args_list])
+    assert np.all(np.diff(inner_tol) <= 0)
+    assert inner_tol[0] > 1e-4
+    assert inner_tol[-1] == 1e-4
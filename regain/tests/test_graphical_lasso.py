@@ -38,7 +38,7 @@ except ImportError:
     # sklean < 0.20
     from sklearn.covariance import GraphLasso as GL
 
-from regain.covariance.graphical_lasso_ import GraphicalLasso
+from regain.covariance.graphical_lasso_ import GraphicalLasso, graphical_lasso
 
 
 def test_gl():
@@ -49,3 +49,43 @@ def test_gl():
     p2 = GraphicalLasso().fit(X).precision_
 
     assert_array_almost_equal(p1, p2, 1)
+
+
+def test_gl_covariance():
+    """Check that covariance_ is computed only when needed."""
+    np.random.seed(2)
+    X = np.random.multivariate_normal(np.zeros(3), np.eye(3), size=100)
+    mdl = GraphicalLasso().fit(X)
+    assert mdl._covariance is None
+
+    assert_array_almost_equal(
+        mdl.covariance_, np.linalg.inv(mdl.precision_))
+    assert mdl._covariance is not None
+
+
+def test_gl_warm_start():
+    """Check that a warm start from a solution stops immediately."""
+    rs = np.random.RandomState(0)
+    emp_cov = np.cov(rs.randn(50, 5).T)
+    precision, _, n_iter, state = graphical_lasso(
+        emp_cov, alpha=0.1, tol=1e-6, rtol=1e-6, max_iter=500,
+        return_state=True)
+    assert sorted(state) == ['U', 'Z', 'rho']
+
+    precision_warm, _, n_iter_warm, state_warm = graphical_lasso(
+        emp_cov, alpha=0.1, tol=1e-6, rtol=1e-6, max_iter=500,
+        warm_start=state, return_state=True)
+    assert n_iter_warm < n_iter
+    assert_array_almost_equal(precision, precision_warm, decimal=4)
+
+    # the state is resumed, not modified
+    assert state['Z'] is not state_warm['Z']
+    assert_array_almost_equal(state['Z'], precision)
+
+    # a close problem is solved faster from the previous solution
+    _, _, n_iter_close = graphical_lasso(
+        emp_cov, alpha=0.12, tol=1e-6, rtol=1e-6, max_iter=500)
+    _, _, n_iter_close_warm = graphical_lasso(
+        emp_cov, alpha=0.12, tol=1e-6, rtol=1e-6, max_iter=500,
+        warm_start=state)
+    assert n_iter_close_warm < n_iter_close
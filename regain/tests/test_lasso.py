@@ -0,0 +1,79 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test the lasso."""
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+from regain.linear_model import lasso_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def _strongest(correlations, lamda):
+    """Keep only the most correlated feature, to trigger the KKT checks."""
+    correlations = np.abs(correlations)
+    return correlations == np.max(correlations)
+
+
+def test_lasso_screening():
+    """Screening does not change the solution."""
+    rng = np.random.RandomState(0)
+    A = rng.randn(50, 30)
+    A[:, 1] += A[:, 0]
+    A[:, 2:8] += .5 * A[:, :1]
+    b = A[:, :3].dot([1., -1., .5]) + .1 * rng.randn(50)
+    lamda_max = np.max(np.abs(A.T.dot(b)))
+    for lamda in (.8 * lamda_max, .5 * lamda_max):
+        x, history = lasso_.lasso(
+            A, b, lamda=lamda, rho=50, tol=1e-10, rtol=1e-10, max_iter=20000,
+            return_history=True)
+        assert len(history) > 1
+        for screening in ('strong', 'safe'):
+            x_screening, n_screened = lasso_.lasso(
+                A, b, lamda=lamda, rho=50, tol=1e-10, rtol=1e-10,
+                max_iter=20000, screening=screening, return_n_screened=True)
+            assert_array_almost_equal(x_screening, x, decimal=8)
+            if lamda == .8 * lamda_max:
+                assert n_screened > 0
+
+    # without history, the solution is returned alone
+    assert lasso_.lasso(A, b, lamda=lamda, screening='safe').shape == (30,)
+
+    # the features discarded by the strong rule are re-added
+    with mock.patch.object(lasso_, '_strong_rule', side_effect=_strongest), \
+            mock.patch.object(lasso_, 'lasso', wraps=lasso_.lasso) as solve:
+        x_screening = lasso_.lasso(
+            A, b, lamda=lamda, rho=50, tol=1e-10, rtol=1e-10, max_iter=20000,
+            screening='strong')
+    assert solve.call_count > 2
+    assert_array_almost_equal(x_screening, x, decimal=8)
@@ -0,0 +1,150 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test MissingGraphicalLasso."""
+import warnings
+
+import numpy as np
+
+from numpy.testing import assert_almost_equal, assert_array_almost_equal
+from scipy.linalg import pinvh
+
+from regain.covariance.missing_graphical_lasso_ import (
+    _compute_cs, _compute_empirical_covariance, _inexact_tol,
+    _latent_regression, _n_inexact)
+from regain.covariance.missing_time_graphical_lasso import (
+    TwoLayersTimeGraphicalLasso)
+
+
+def test_missing_expectation():
+    """Check the E step against the sample-by-sample computation."""
+    rng = np.random.RandomState(0)
+    n_samples, n_features = 30, 5
+    A = rng.randn(n_features, n_features)
+    K = A.dot(A.T) + n_features * np.eye(n_features)
+    X = rng.randn(n_samples, n_features)
+    X[rng.rand(n_samples, n_features) < .2] = np.nan
+    X[0] = np.nan
+    means = rng.randn(n_features)
+
+    cs = np.zeros_like(X)
+    emp_cov = np.zeros((n_features, n_features))
+    for i, x in enumerate(X):
+        missing = np.isnan(x)
+        inv = np.linalg.pinv(K[np.ix_(missing, missing)])
+        cs[i, missing] = means[missing] - inv.dot(
+            K[np.ix_(missing, ~missing)]).dot(x[~missing] - means[~missing])
+    cs /= max(np.max(np.abs(cs)), 1)
+    for i, x in enumerate(X):
+        missing = np.isnan(x)
+        aux = np.where(missing, cs[i], x)
+        emp_cov += np.outer(aux, aux)
+        emp_cov[np.ix_(missing, missing)] += np.linalg.pinv(
+            K[np.ix_(missing, missing)])
+    emp_cov /= np.max(emp_cov)
+
+    assert_array_almost_equal(_compute_cs(means, K, X), cs)
+    assert_array_almost_equal(
+        _compute_empirical_covariance(X, K, cs), emp_cov)
+
+
+def test_inexact_tol():
+    """Check the tolerances of the inexact M steps."""
+    assert _n_inexact() == 2
+    assert_almost_equal(_inexact_tol(1e-4, 0), 1e-2)
+    assert_almost_equal(_inexact_tol(1e-4, 1), 1e-3)
+    # exact from the second iteration, despite the rounding of 100 * .1 ** 2
+    assert _inexact_tol(1e-4, 2) == 1e-4
+    assert _inexact_tol(1e-4, 10) == 1e-4
+
+    assert _n_inexact(start=50.) == 2
+    assert_almost_equal(_inexact_tol(1e-4, 1, start=50.), 5e-4)
+    assert _n_inexact(start=1.) == 0
+    assert _inexact_tol(1e-4, 0, start=1.) == 1e-4
+
+
+def test_latent_expectation():
+    """Check the latent E step against the inversion of the whole K."""
+    rng = np.random.RandomState(0)
+    h, n_features = 2, 6
+    A = rng.randn(h + n_features, h + n_features)
+    K = A.dot(A.T) + np.eye(h + n_features)
+    emp_cov = np.cov(rng.randn(50, n_features).T)
+
+    sigma = pinvh(K)
+    sigma_o_inv = pinvh(sigma[h:, h:])
+    sigma_ho = sigma[:h, h:]
+    emp_cov_H = sigma[:h, :h] - sigma_ho.dot(sigma_o_inv).dot(sigma_ho.T) + \
+        np.linalg.multi_dot(
+            (sigma_ho, sigma_o_inv, emp_cov, sigma_o_inv, sigma_ho.T))
+    emp_cov_OH = emp_cov.dot(sigma_o_inv).dot(sigma_ho.T)
+
+    K_hh_inv, coef = _latent_regression(K, h)
+    assert_array_almost_equal(K_hh_inv, np.linalg.inv(K[:h, :h]))
+    assert_array_almost_equal(-emp_cov.dot(coef.T), emp_cov_OH)
+    assert_array_almost_equal(
+        K_hh_inv + coef.dot(emp_cov).dot(coef.T), emp_cov_H)
+
+
+def test_latent_regression_not_positive_definite():
+    """Check the pinvh fallback when the latent block is not definite."""
+    rng = np.random.RandomState(0)
+    h, n_features = 2, 4
+    K = rng.randn(h + n_features, h + n_features)
+    K += K.T
+    emp_cov = np.cov(rng.randn(50, n_features).T)
+    for K_hh in (np.diag([1., -1.]), np.ones((h, h))):
+        K[:h, :h] = K_hh
+        K_inv = np.linalg.pinv(K_hh)
+        K_hh_inv, coef = _latent_regression(K, h)
+        assert_array_almost_equal(K_hh_inv, K_inv)
+        assert_array_almost_equal(coef, K_inv.dot(K[:h, h:]))
+
+        # E step of the time-varying model
+        assert_array_almost_equal(
+            K_hh_inv + coef.dot(emp_cov).dot(coef.T),
+            K_inv + K_inv.dot(K[:h, h:]).dot(emp_cov).dot(
+                K[h:, :h]).dot(K_inv))
+
+
+def test_two_layers_observed_precision():
+    """Check the observed precision and the score of a fitted model."""
+    rng = np.random.RandomState(0)
+    X = rng.randn(90, 4)
+    y = np.repeat(np.arange(3), 30)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        mdl = TwoLayersTimeGraphicalLasso(h=2, max_iter=20).fit(X, y)
+
+    assert mdl.n_latent_ == 2
+    observed = mdl.get_observed_precision()
+    assert observed.shape == (3, 4, 4)
+    for p, o in zip(mdl.precision_, observed):
+        assert_array_almost_equal(o, np.linalg.inv(np.linalg.inv(p)[2:, 2:]))
+    assert np.isfinite(mdl.score(X, y))
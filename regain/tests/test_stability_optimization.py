@@ -0,0 +1,215 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2019, regain authors
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Test GraphicalModelStabilitySelection."""
+from unittest import SkipTest
+
+import numpy as np
+from numpy.testing import (assert_almost_equal, assert_array_almost_equal,
+                           assert_array_equal)
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    import matplotlib  # noqa: F401
+except ImportError:
+    raise SkipTest("matplotlib is required by the stability selection")
+
+from regain.covariance import GraphicalLasso  # noqa: E402
+from regain.generalized_linear_model.glm_poisson import (  # noqa: E402
+    PoissonGraphicalModel)
+from regain.model_selection import stability_optimization  # noqa: E402
+from regain.model_selection.stability_optimization import (  # noqa: E402
+    GraphicalModelStabilitySelection, _edge_bits, _edge_frequencies,
+    _graphlet_instability, _instability, global_instability,
+    graphlet_instability, upper_bound)
+
+
+class _Fitted(object):
+    """Stand-in for a fitted graphical model."""
+
+    def __init__(self, precision):
+        self.precision_ = precision
+
+    def get_precision(self):
+        return self.precision_
+
+
+def _random_precisions(rng, shape, n_features, density=.3):
+    """Random symmetric precisions with a sparse support."""
+    support = rng.rand(*(shape + (n_features, n_features))) < density
+    precisions = np.triu(support, 1) * rng.randn(*support.shape)
+    return precisions + np.swapaxes(precisions, -1, -2) + np.eye(n_features)
+
+
+def test_global_instability():
+    """The packed instabilities match the loop over the edges."""
+    rng = np.random.RandomState(0)
+    for shape in ((10,), (10, 3)):
+        precisions = _random_precisions(rng, shape, 7)
+        estimators = [_Fitted(p) for p in precisions]
+
+        n_times = int(np.prod(shape[1:]))
+        triu_idx = np.triu_indices(7, 1)
+        mean_connectivity = np.zeros((n_times, triu_idx[0].size))
+        for p in precisions:
+            for t, p_t in enumerate(p.reshape(n_times, 7, 7)):
+                mean_connectivity[t] += p_t[triu_idx] != 0
+        mean_connectivity /= len(estimators)
+        assert_array_equal(
+            _edge_frequencies([_edge_bits(p) for p in precisions], 7),
+            mean_connectivity.reshape(shape[1:] + (-1,)))
+        xi_matrix = 2 * mean_connectivity * (1 - mean_connectivity)
+        expected = np.sum(xi_matrix) / (n_times * 7 * 6 / 2)
+
+        assert_almost_equal(global_instability(estimators), expected)
+        assert_almost_equal(
+            upper_bound(estimators), 4 * expected * (1 - expected))
+
+
+class _RecordedPoisson(PoissonGraphicalModel):
+    """Poisson graphical model which records the precision of its fits."""
+
+    precisions = []
+
+    def fit(self, X, y=None):
+        super(_RecordedPoisson, self).fit(X, y)
+        self.precisions.append(self.precision_)
+        return self
+
+
+def test_instability_nodes():
+    """The instabilities use the nodes of the graphs, not the features."""
+    rng = np.random.RandomState(0)
+    X = rng.poisson(1., size=(100, 4)).astype(float)
+    X[:, 1] = rng.poisson(X[:, 0] + .5)
+    del _RecordedPoisson.precisions[:]
+    # the intercept is an additional node of the graph
+    model = GraphicalModelStabilitySelection(
+        _RecordedPoisson(intercept=True),
+        param_grid={'alpha': np.logspace(-2, -.5, 5)}, n_repetitions=5,
+        sampling_size=50).fit(X)
+
+    # the fits are ordered by candidate, then by subsample, then the refit
+    precisions = np.array(_RecordedPoisson.precisions[:25])
+    assert precisions.shape[-1] == 5
+    triu_idx = np.triu_indices(5, 1)
+    mean_connectivity = np.mean(
+        precisions[:, triu_idx[0], triu_idx[1]].reshape(5, 5, -1) != 0,
+        axis=1)
+    assert_almost_equal(
+        model.cv_results_['raw_test_instability'],
+        [_instability(m) for m in mean_connectivity])
+
+
+def test_scheduling():
+    """Fitting the grid as a path on each subsample changes no result."""
+    rng = np.random.RandomState(0)
+    precision = np.eye(8) + .4 * (np.eye(8, k=1) + np.eye(8, k=-1))
+    X = rng.multivariate_normal(
+        np.zeros(8), np.linalg.inv(precision), size=100)
+
+    # initialisation of each fit
+    inits = []
+    fit_and_score = stability_optimization._fit_and_score
+
+    def _fit_and_score(estimator, *args, **kwargs):
+        inits.append(estimator.get_params()['init'])
+        return fit_and_score(estimator, *args, **kwargs)
+
+    models = {}
+    for scheduling in ('grid', 'path'):
+        del inits[:]
+        # same subsamples for both
+        np.random.seed(0)
+        with mock.patch.object(stability_optimization, '_fit_and_score',
+                               side_effect=_fit_and_score):
+            models[scheduling] = GraphicalModelStabilitySelection(
+                GraphicalLasso(tol=1e-6, max_iter=500),
+                param_grid={'alpha': np.logspace(-1.3, 0, 8)},
+                n_repetitions=5, sampling_size=50,
+                scheduling=scheduling).fit(X)
+
+    # the path warm-starts all the fits but the first of each subsample
+    assert sum(isinstance(init, np.ndarray) for init in inits) == 5 * 7
+
+    grid, path = models['grid'], models['path']
+    assert path.best_params_ == grid.best_params_
+    assert path.cv_results_['params'] == grid.cv_results_['params']
+    assert_array_equal(path.cv_results_['rank_test_instability'],
+                       grid.cv_results_['rank_test_instability'])
+    assert_array_equal(path.cv_results_['mean_test_instability'],
+                       grid.cv_results_['mean_test_instability'])
+    # the warm-started fits stop at a slightly different point
+    assert_array_almost_equal(path.cv_results_['mean_test_score'],
+                              grid.cv_results_['mean_test_score'], decimal=3)
+
+
+def test_graphlet_instability():
+    """The graphlet instability is the average GCD of the graphs."""
+    try:
+        from netanalytics import graphlets
+    except ImportError:
+        raise SkipTest("netanalytics is required by the graphlet instability")
+    rng = np.random.RandomState(0)
+    precisions = _random_precisions(rng, (4, 3), 8)
+    # a repeated graph, as at high regularisation
+    precisions[1] = precisions[0]
+
+    n = precisions.shape[0]
+    for estimators in (precisions, precisions[:, 0]):
+        gdvs = []
+        for times in estimators.reshape(n, -1, 8, 8):
+            gdvs.append([])
+            for p in times:
+                rows, cols = np.nonzero(np.triu(p, 1))
+                gdvs[-1].append(graphlets.graphlet_degree_vectors(
+                    list(range(8)), list(zip(rows.tolist(), cols.tolist())),
+                    graphlet_size=4))
+        distances = []
+        for i in range(n):
+            for j in range(i + 1, n):
+                distances.append(np.mean([
+                    graphlets.GCD(gdv_i, gdv_j)[1]
+                    for gdv_i, gdv_j in zip(gdvs[i], gdvs[j])]))
+        expected = 2 / (n * (n - 1)) * np.sum(distances)
+
+        assert_almost_equal(
+            graphlet_instability([_Fitted(p) for p in estimators]),
+            expected)
+
+        # the cached graphs and distances give the same value
+        edges = [_edge_bits(p) for p in estimators]
+        cache = {}
+        _graphlet_instability(edges, 8, cache=cache)
+        assert_almost_equal(
+            _graphlet_instability(edges, 8, cache=cache), expected)
@@ -30,9 +30,22 @@
 """Test LatentTimeGraphicalLasso."""
 import numpy as np
 import warnings
-from numpy.testing import assert_array_equal
 
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+from scipy import sparse
+
+from regain.covariance import graphical_lasso_, kernel_time_graphical_lasso_
+from regain.covariance import time_graphical_lasso_
+from regain.covariance.kernel_time_graphical_lasso_ import (
+    KernelTimeGraphicalLasso, _kernel_matrix, kernel_time_graphical_lasso,
+    objective_kernel, psi_distances)
 from regain.covariance.time_graphical_lasso_ import TimeGraphicalLasso
+from regain.validation import check_norm_prox
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
 
 def test_ltgl_zero():
@@ -51,3 +64,225 @@ def test_ltgl_zero():
     assert_array_equal(mdl.precision_, np.zeros((3, 3, 3)))
     assert_array_equal(mdl.get_observed_precision(),
                        mdl.precision_)
+
+
+def test_tgl_compact():
+    """Check that compact storage gives the same solution."""
+    rs = np.random.RandomState(0)
+    x = rs.randn(60, 5)
+    y = np.repeat(np.arange(3), 20)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        mdl = TimeGraphicalLasso(alpha=0.1, max_iter=50).fit(x, y)
+        mdl_compact = TimeGraphicalLasso(
+            alpha=0.1, max_iter=50, compact=True).fit(x, y)
+
+    assert_array_almost_equal(mdl.precision_, mdl_compact.precision_)
+    assert mdl.n_iter_ == mdl_compact.n_iter_
+
+
+def test_objective_eigvals():
+    """Check that the objectives from the eigenvalues match slogdet."""
+    rs = np.random.RandomState(0)
+    n_times, n_features = 4, 5
+    S = np.array([np.cov(rs.randn(20, n_features), rowvar=False)
+                  for _ in range(n_times)])
+    K = np.linalg.inv(S)
+    Z_0 = K + .1 * rs.randn(*K.shape)
+    eigvals = np.linalg.eigvalsh(K)
+    n_samples = np.full(n_times, 20.)
+    psi = check_norm_prox('laplacian')[0]
+
+    assert np.allclose(
+        graphical_lasso_.objective(S[0], K[0], Z_0[0], .1,
+                                   eigvals=eigvals[0]),
+        graphical_lasso_.objective(S[0], K[0], Z_0[0], .1))
+    assert np.allclose(
+        time_graphical_lasso_.objective(
+            n_samples, S, K, Z_0, Z_0[:-1], Z_0[1:], .1, 1., psi,
+            eigvals=eigvals),
+        time_graphical_lasso_.objective(
+            n_samples, S, K, Z_0, Z_0[:-1], Z_0[1:], .1, 1., psi))
+    weights = rs.rand(n_times - 1)
+    assert np.allclose(
+        kernel_time_graphical_lasso_.objective(
+            n_samples, S, K, Z_0, (Z_0[:-1], Z_0[1:]), .1, weights, psi,
+            eigvals=eigvals),
+        kernel_time_graphical_lasso_.objective(
+            n_samples, S, K, Z_0, (Z_0[:-1], Z_0[1:]), .1, weights, psi))
+
+
+def test_ktgl_banded_kernel():
+    """Check that lags with zero weight do not change the solution."""
+    rs = np.random.RandomState(0)
+    x = rs.randn(100, 4)
+    y = np.repeat(np.arange(5), 20)
+    kernel = np.eye(5) + np.diag(np.full(4, .5), 1) + \
+        np.diag(np.full(4, .5), -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        mdl = KernelTimeGraphicalLasso(
+            alpha=0.1, kernel=kernel, tol=1e-6, rtol=1e-6,
+            max_iter=500).fit(x, y)
+        mdl_sparse = KernelTimeGraphicalLasso(
+            alpha=0.1, kernel=sparse.csr_matrix(kernel), tol=1e-6,
+            rtol=1e-6, max_iter=500, max_lag=1).fit(x, y)
+        emp_cov = np.array([np.cov(x[y == i].T, bias=True) for i in range(5)])
+        precision = kernel_time_graphical_lasso(
+            emp_cov, alpha=0.1, kernel=kernel, n_samples=np.full(5, 20),
+            tol=1e-6, rtol=1e-6, max_iter=500, kernel_tol=-1)[0]
+
+    assert_array_almost_equal(mdl.precision_, mdl_sparse.precision_)
+    assert_array_almost_equal(mdl.precision_, precision, decimal=3)
+
+
+def test_ktgl_warm_start():
+    """Check that a warm start from a solution stops immediately."""
+    rs = np.random.RandomState(0)
+    emp_cov = np.array([np.cov(rs.randn(20, 4).T) for _ in range(5)])
+    kernel = np.exp(-np.subtract.outer(np.arange(5), np.arange(5)) ** 2.)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        precision, _, n_iter, state = kernel_time_graphical_lasso(
+            emp_cov, alpha=0.1, kernel=kernel, tol=1e-6, rtol=1e-6,
+            max_iter=500, return_state=True)
+        precision_warm, _, n_iter_warm = kernel_time_graphical_lasso(
+            emp_cov, alpha=0.1, kernel=kernel, tol=1e-6, rtol=1e-6,
+            max_iter=500, warm_start=state)
+
+    assert n_iter_warm < n_iter
+    assert_array_almost_equal(precision, precision_warm, decimal=4)
+
+
+def test_ktgl_warm_start_kernel_change():
+    """Check that duals are resumed when the kernel changes, as in EM."""
+    rs = np.random.RandomState(0)
+    emp_cov = np.array([np.cov(rs.randn(30, 5).T) for _ in range(10)])
+    lags = np.subtract.outer(np.arange(10), np.arange(10)) ** 2.
+    n_iter_warm, n_iter_primal, n_iter_cold = 0, 0, 0
+    state = None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for theta in (3., 2., 1.5, 1.):
+            kernel = np.exp(-lags / (2 * theta ** 2))
+            if state is not None:
+                # resume only the precisions
+                n_iter_primal += kernel_time_graphical_lasso(
+                    emp_cov, alpha=0.1, kernel=kernel, tol=1e-5, rtol=1e-5,
+                    max_iter=500, init=state['Z_0'], rho=state['rho'])[-1]
+            precision, _, n_iter, state = kernel_time_graphical_lasso(
+                emp_cov, alpha=0.1, kernel=kernel, tol=1e-5, rtol=1e-5,
+                max_iter=500, warm_start=state, return_state=True)
+            precision_cold, _, n_iter_c = kernel_time_graphical_lasso(
+                emp_cov, alpha=0.1, kernel=kernel, tol=1e-5, rtol=1e-5,
+                max_iter=500)
+            assert_array_almost_equal(precision, precision_cold, decimal=3)
+            if theta < 3:
+                n_iter_warm += n_iter
+                n_iter_cold += n_iter_c
+
+    assert n_iter_warm < n_iter_primal
+    assert n_iter_warm < n_iter_cold
+
+
+class _BumpKernel(object):
+    """Consecutive times kernel, whose best parameter depends on the data.
+
+    The first and the second half of the times are coupled with weights
+    which vanish at `length_scale` 1 and 3 respectively.
+    """
+
+    def __init__(self, length_scale):
+        self.length_scale = length_scale
+
+    def __call__(self, times):
+        n_times = times.shape[0]
+        kernel = np.eye(n_times)
+        for t in range(n_times - 1):
+            centre = 1. if t < (n_times - 1) / 2. else 3.
+            kernel[t, t + 1] = kernel[t + 1, t] = 1 - np.exp(
+                -(self.length_scale - centre) ** 2)
+        return kernel
+
+
+def _fit_counting_iterations(mdl, x, y, warm_start=True):
+    """Fit mdl, returning the iterations of each inner ADMM run."""
+    n_iter = []
+
+    def counting(*args, **kwargs):
+        if not warm_start:
+            kwargs.update(warm_start=None, init='empirical')
+        out = kernel_time_graphical_lasso(*args, **kwargs)
+        n_iter.append(out[-2])
+        return out
+
+    with mock.patch.object(kernel_time_graphical_lasso_,
+                           'kernel_time_graphical_lasso', counting):
+        mdl.fit(x, y)
+    return n_iter
+
+
+def test_ktgl_auto_warm_start():
+    """Check that the kernel EM costs close to a single fit."""
+    rs = np.random.RandomState(0)
+    x = rs.randn(100, 4)
+    y = np.repeat(np.arange(5), 20)
+    params = dict(
+        alpha=0.1, kernel=_BumpKernel, ker_param='auto', tol=1e-5,
+        rtol=1e-5, max_iter=1000)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        n_iter = _fit_counting_iterations(
+            KernelTimeGraphicalLasso(**params), x, y)
+        n_iter_cold = _fit_counting_iterations(
+            KernelTimeGraphicalLasso(**params), x, y, warm_start=False)
+
+    assert len(n_iter) > 1
+    assert sum(n_iter) < sum(n_iter_cold)
+    assert sum(n_iter) < 1.5 * n_iter_cold[-1]
+
+
+def test_ktgl_kernel_param_grid():
+    """Check the kernel parameter selection over a grid."""
+    rs = np.random.RandomState(0)
+    x = rs.randn(100, 4)
+    y = np.repeat(np.arange(5), 20)
+    times = np.arange(5)[:, None]
+    grid = [1., 2., 3.]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        mdl = KernelTimeGraphicalLasso(
+            alpha=0.1, kernel=_BumpKernel, ker_param='auto',
+            ker_param_grid=grid, tol=1e-5, rtol=1e-5, max_iter=1000).fit(x, y)
+        mdl_parallel = KernelTimeGraphicalLasso(
+            alpha=0.1, kernel=_BumpKernel, ker_param='auto',
+            ker_param_grid=grid, tol=1e-5, rtol=1e-5, max_iter=1000,
+            n_jobs=2).fit(x, y)
+
+        # the selected parameter is the best of the grid for the solution
+        distances = psi_distances(
+            mdl.precision_, check_norm_prox('laplacian')[0])
+        best = grid[np.argmin([
+            objective_kernel(theta, distances, _BumpKernel, times)
+            for theta in grid])]
+        mdl_fixed = KernelTimeGraphicalLasso(
+            alpha=0.1, kernel=_BumpKernel, ker_param=best, tol=1e-5,
+            rtol=1e-5, max_iter=1000).fit(x, y)
+
+    assert_array_equal(mdl.precision_, mdl_parallel.precision_)
+    assert_array_almost_equal(mdl.precision_, mdl_fixed.precision_, decimal=3)
+
+
+def test_kernel_matrix_cache():
+    """Check that kernel matrices are memoized by parameter."""
+    times = np.arange(5)[:, None]
+    cache = {}
+    with mock.patch.object(
+            _BumpKernel, '__call__', autospec=True,
+            side_effect=lambda self, t: np.eye(t.shape[0])) as call:
+        matrix = _kernel_matrix(_BumpKernel, 2., times, cache)
+        assert _kernel_matrix(_BumpKernel, 2., times, cache) is matrix
+        _kernel_matrix(_BumpKernel, 3., times, cache)
+        _kernel_matrix(_BumpKernel, 3., times)
+    assert call.call_count == 3
+    assert sorted(cache) == [2., 3.]
@@ -29,7 +29,9 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """Test utils module."""
 import numpy as np
-from numpy.testing import assert_array_equal, assert_equal
+from numpy.testing import (
+    assert_array_almost_equal, assert_array_equal, assert_equal)
+from six.moves import cPickle as pkl
 
 from regain import utils
 
@@ -60,6 +62,29 @@ def test_upper_to_full():
     assert_array_equal(utils.upper_to_full(upper), a)
 
 
+def test_packed_symmetric():
+    """Test PackedSymmetric class."""
+    a = np.random.RandomState(0).randn(4, 3, 3)
+    a += a.transpose(0, 2, 1)
+    packed = utils.PackedSymmetric.from_dense(a)
+    assert_equal(packed.data.shape, (4, 6))
+    assert_equal(packed.shape, a.shape)
+    assert_array_equal(packed.to_dense(), a)
+    unpickled = pkl.loads(pkl.dumps(packed))
+    assert isinstance(unpickled, utils.PackedSymmetric)
+    assert_array_equal(unpickled.to_dense(), a)
+
+    assert_array_equal(np.abs(packed[1:]).to_dense(), np.abs(a[1:]))
+    assert_array_almost_equal((2 * packed - packed).to_dense(), a)
+    assert_array_almost_equal(packed.squared_norm(), np.sum(a ** 2))
+    assert_array_almost_equal(
+        packed.l1_norm(off_diagonal=True, per_matrix=True),
+        [np.abs(x).sum() - np.abs(np.diag(x)).sum() for x in a])
+
+    packed[0] = np.eye(3)
+    assert_array_equal(packed.to_dense()[0], np.eye(3))
+
+
 def test_error_rank():
     """Test error_rank function."""
     a = np.arange(27).reshape(3, 3, 3)
@@ -135,3 +160,18 @@ def test_structure_error():
 
     assert_equal(utils.structure_error(a, b, thresholding=True, eps=1e-2),
                  result)
+
+
+def test_lag_pairs():
+    """Test lag_pairs and segment_sum functions."""
+    left, right = utils.lag_pairs(4, [1, 3])
+    assert_array_equal(left, [0, 1, 2, 0])
+    assert_array_equal(right, [1, 2, 3, 3])
+
+    a = np.arange(8.).reshape(4, 2)
+    expected = np.zeros((4, 2))
+    np.add.at(expected, right, a)
+    assert_array_equal(utils.segment_sum(a, right, 4), expected)
+    assert_array_equal(
+        utils.segment_sum(np.empty((0, 2)), np.empty(0, int), 4),
+        np.zeros((4, 2)))
@@ -41,8 +41,9 @@ from contextlib import contextmanager
 
 import numpy as np
 import six
+from numpy.lib.mixins import NDArrayOperatorsMixin
 from numpy.linalg.linalg import LinAlgError
-from scipy import stats
+from scipy import sparse, stats
 from scipy.spatial.distance import squareform
 from six.moves import cPickle as pkl
 from sklearn.metrics import average_precision_score, matthews_corrcoef
@@ -253,6 +254,145 @@ def upper_to_full(a):
     return A
 
 
+class PackedSymmetric(NDArrayOperatorsMixin):
+    """Stack of symmetric matrices stored as their upper triangles.
+
+    Only the n_features * (n_features + 1) / 2 entries of the upper triangle
+    (diagonal included) of each matrix are stored, in the order given by
+    `np.triu_indices`. Numpy ufuncs and arithmetic operators act elementwise
+    on the packed values, so that elementwise steps (such as soft
+    thresholding or averaging) can be performed directly on the packed
+    representation. Non-packed arrays in such operations are broadcast
+    against the packed values, i.e. with shape (..., 1) for one value per
+    matrix. Indexing acts on the leading (stack) dimensions only.
+
+    Parameters
+    ----------
+    data : ndarray, shape (..., n_features * (n_features + 1) / 2)
+        Packed upper triangles. It is not copied, so it can be a `np.memmap`.
+        Instances pickle as `PackedSymmetric` objects, not as plain arrays;
+        use `to_dense` to obtain an ndarray.
+    n_features : int, optional
+        Size of each matrix. If None, it is inferred from `data`.
+
+    """
+
+    def __init__(self, data, n_features=None):
+        data = np.asanyarray(data)
+        if n_features is None:
+            n_features = int((np.sqrt(1 + 8 * data.shape[-1]) - 1) / 2)
+        if data.ndim < 1 or \
+                data.shape[-1] != n_features * (n_features + 1) // 2:
+            raise ValueError(
+                "Data of shape %s cannot be the upper triangle of matrices "
+                "with %d features." % (data.shape, n_features))
+        self.data = data
+        self.n_features = n_features
+
+    @classmethod
+    def from_dense(cls, a):
+        """Pack the upper triangles of `a`, of shape (..., d, d)."""
+        a = np.asanyarray(a)
+        idx = np.triu_indices(a.shape[-1])
+        return cls(a[..., idx[0], idx[1]], n_features=a.shape[-1])
+
+    def to_dense(self, out=None):
+        """Full symmetric matrices, of shape (..., d, d)."""
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+        idx = np.triu_indices(self.n_features)
+        out[..., idx[0], idx[1]] = self.data
+        out[..., idx[1], idx[0]] = self.data
+        return out
+
+    @property
+    def shape(self):
+        """Shape of the equivalent dense array."""
+        return self.data.shape[:-1] + (self.n_features, self.n_features)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def ndim(self):
+        return self.data.ndim + 1
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return "%s(n_features=%d, shape=%s)" % (
+            self.__class__.__name__, self.n_features, self.shape)
+
+    def __array__(self, dtype=None):
+        out = self.to_dense()
+        return out if dtype is None else out.astype(dtype)
+
+    def _leading_key(self, key):
+        if key is Ellipsis:
+            return key
+        key_ = key if isinstance(key, tuple) else (key, )
+        if len(key_) >= self.data.ndim or any(
+                k is Ellipsis or k is None for k in key_):
+            raise IndexError(
+                "Only the stack dimensions of packed matrices can be indexed.")
+        return key
+
+    def __getitem__(self, key):
+        return self.__class__(
+            self.data[self._leading_key(key)], n_features=self.n_features)
+
+    def __setitem__(self, key, value):
+        if isinstance(value, PackedSymmetric):
+            value = value.data
+        elif np.ndim(value) > 0:
+            value = PackedSymmetric.from_dense(value).data
+        self.data[self._leading_key(key)] = value
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__':
+            return NotImplemented
+        inputs = tuple(
+            x.data if isinstance(x, PackedSymmetric) else x for x in inputs)
+        out = kwargs.get('out', ())
+        if out:
+            kwargs['out'] = tuple(
+                x.data if isinstance(x, PackedSymmetric) else x for x in out)
+        result = getattr(ufunc, method)(*inputs, **kwargs)
+        if out:
+            return out[0] if len(out) == 1 else out
+        if isinstance(result, tuple):
+            return tuple(
+                self.__class__(r, n_features=self.n_features) for r in result)
+        return self.__class__(result, n_features=self.n_features)
+
+    def copy(self):
+        return self.__class__(self.data.copy(), n_features=self.n_features)
+
+    def _weights(self, diagonal=1.):
+        # multiplicity of each packed value in the dense matrix
+        idx = np.triu_indices(self.n_features)
+        return np.where(idx[0] == idx[1], diagonal, 2.)
+
+    def inner(self, other):
+        """Frobenius inner product of each matrix with the ones of `other`."""
+        other = other.data if isinstance(other, PackedSymmetric) else other
+        return np.einsum(
+            '...i,i,...i->...', self.data, self._weights(), other)
+
+    def squared_norm(self, per_matrix=False):
+        """Squared Frobenius norm, of the whole stack or of each matrix."""
+        res = self.inner(self)
+        return res if per_matrix else np.sum(res)
+
+    def l1_norm(self, off_diagonal=False, per_matrix=False):
+        """Sum of absolute values, of the whole stack or of each matrix."""
+        res = np.dot(
+            np.abs(self.data), self._weights(0. if off_diagonal else 1.))
+        return res if per_matrix else np.sum(res)
+
+
 def compose(*functions):
     """Compose two or more functions."""
     def compose2(f, g):
@@ -589,6 +729,48 @@ def mean_structure_error(true, preds, multiple=True):
     return res
 
 
+def batch_pinvh(a):
+    """Pseudo-inverse of a symmetric matrix or of a stack of them.
+
+    All matrices are decomposed with a single call to `np.linalg.eigh`,
+    with the same cutoff on small eigenvalues as `scipy.linalg.pinvh`.
+    """
+    es, Q = np.linalg.eigh(a)
+    cond = es.shape[-1] * np.finfo(es.dtype).eps * np.max(
+        np.abs(es), axis=-1, keepdims=True)
+    above_cutoff = np.abs(es) > cond
+    psigma = np.zeros_like(es)
+    psigma[above_cutoff] = 1. / es[above_cutoff]
+    return np.matmul(Q * psigma[..., None, :], np.swapaxes(Q, -1, -2))
+
+
+def lag_pairs(n_times, lags):
+    """Indices of the pairs of time points separated by each of `lags`.
+
+    Pairs are ordered by lag, then by time, so that the pairs of lag `m`
+    are ``(t, t + m)`` for ``t = 0, ..., n_times - m - 1``.
+    """
+    lags = np.asarray(lags, dtype=int)
+    n_pairs = n_times - lags
+    offsets = np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+    left = np.arange(np.sum(n_pairs)) - offsets
+    right = left + np.repeat(lags, n_pairs)
+    return left, right
+
+
+def segment_sum(a, index, n_segments):
+    """Sum the slices of `a` along the first axis which share an `index`.
+
+    Equivalent to ``np.add.at(out, index, a)`` on a zero-filled `out`, but
+    computed as a single sparse matrix product.
+    """
+    incidence = sparse.csr_matrix(
+        (np.ones(index.size), (index, np.arange(index.size))),
+        shape=(n_segments, index.size))
+    out = incidence.dot(a.reshape(index.size, int(np.prod(a.shape[1:]))))
+    return out.reshape((n_segments, ) + a.shape[1:])
+
+
 def is_pos_semidef(x, tol=1e-15):
     """Check if x is positive semi-definite."""
     eigs = np.linalg.eigvalsh(x)
@@ -65,6 +65,49 @@ def check_norm_prox(function):
     return norm, prox, function == 'node'
 
 
+def check_kernel(kernel, n_times, tol=1e-8, max_lag=None):
+    """Validate a temporal kernel and return the lags it effectively uses.
+
+    Parameters
+    ----------
+    kernel : ndarray or sparse matrix, shape (n_times, n_times), or None
+        Temporal kernel. If None, it is interpreted as an identity matrix.
+    n_times : int
+        Number of time points.
+    tol : float, optional
+        Lags whose weights are all below `tol` (in absolute value) are
+        considered negligible and discarded.
+    max_lag : int, optional
+        Bandwidth of the kernel. Lags higher than `max_lag` are discarded,
+        regardless of their weight.
+
+    Returns
+    -------
+    kernel : ndarray, shape (n_times, n_times)
+        Dense kernel.
+    lags : ndarray of int
+        Lags `m` in 1..n_times-1 with non-negligible weight.
+
+    """
+    if kernel is None:
+        kernel = np.eye(n_times)
+    elif sp.issparse(kernel):
+        kernel = kernel.toarray()
+    kernel = np.asarray(kernel, dtype=float)
+    if kernel.shape != (n_times, n_times):
+        raise ValueError(
+            "Kernel should have shape %s, found %s." %
+            ((n_times, n_times), kernel.shape))
+
+    max_lag = n_times - 1 if max_lag is None else min(max_lag, n_times - 1)
+    lags = np.array(
+        [
+            m for m in range(1, max_lag + 1)
+            if np.max(np.abs(np.diag(kernel, m))) > tol
+        ], dtype=int)
+    return kernel, lags
+
+
 def check_array_dimensions(
         X, n_dimensions=3, time_on_axis='first', suppress_warn_list=False):
     """Validate input matrix."""
@@ -62,6 +62,6 @@ setup(
     packages=find_packages(exclude=["*.__old", "*.tests"]),
     include_package_data=True,
     requires=[
-        'numpy (>=1.11)', 'scipy (>=0.16.1,>=1.0)', 'sklearn (>=0.17)', 'six'
+        'numpy (>=1.13)', 'scipy (>=0.16.1,>=1.0)', 'sklearn (>=0.17)', 'six'
     ],
 )